@@ -1,11 +1,24 @@
 import os
 import json
 import re
-from typing import Dict, List
-from rapidfuzz import fuzz
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from scipy import sparse
 
 ROOT_DIR = "../../clean"
 AUTO_THRESHOLD = 0.80
+N_JOBS = -1  # folders labeled in parallel, -1 = one worker process per core
+USE_BLOCKING = True  # score only pairs that can still reach the threshold (see blocked_score_matrix)
+RUN_BENCHMARK = False  # report evaluated vs pruned pairs (blocking vs full matrix) instead of labeling
+
+# Per-folder (parsed x crawled) final_score matrix; reused while the two source files are
+# unchanged, so a new AUTO_THRESHOLD only re-reads the matrix
+SCORES_FILE = "auto_label_scores.npz"
+SCORE_VERSION = "title0.5-author0.4-year0.1"
 
 LATEX_ACCENT_RE = re.compile(
     r"""
@@ -65,7 +78,246 @@ def final_score(p: Dict, c: Dict) -> float:
         0.1 * year_score(p.get("year", 0), c.get("year", 0))
     )
 
-def main():
+def _author_matrix(refs: List[Dict], vocab: Dict[str, int]) -> sparse.csr_matrix:
+    # Binary (entry x cleaned author) incidence; every author string is cleaned once per entry
+    indptr, indices = [0], []
+    for r in refs:
+        ids = {vocab.setdefault(a, len(vocab)) for a in post_clean_authors(r.get("authors", []))}
+        indices.extend(sorted(ids))
+        indptr.append(len(indices))
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(refs), max(1, len(vocab))))
+
+def _years(refs: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    # (values, valid) with the int() conversion year_score uses
+    values = np.zeros(len(refs), dtype=np.int64)
+    valid = np.zeros(len(refs), dtype=bool)
+    for i, r in enumerate(refs):
+        try:
+            values[i] = int(r.get("year", 0))
+            valid[i] = True
+        except (TypeError, ValueError):
+            pass
+    return values, valid
+
+def score_matrix(parsed: List[Dict], crawled: List[Dict]) -> np.ndarray:
+    """final_score of every (parsed, crawled) pair as one (len(parsed) x len(crawled)) matrix."""
+    if not parsed or not crawled:
+        return np.zeros((len(parsed), len(crawled)))
+
+    # processor=None: same raw-string scores as the per-pair fuzz.token_set_ratio in title_score
+    title = process.cdist([p["title"] for p in parsed], [c["title"] for c in crawled],
+                          scorer=fuzz.token_set_ratio, processor=None, dtype=np.float64) / 100.0
+
+    vocab: Dict[str, int] = {}
+    A_p = _author_matrix(parsed, vocab)
+    A_c = _author_matrix(crawled, vocab)
+    A_p.resize((len(parsed), max(1, len(vocab))))
+    A_c.resize((len(crawled), max(1, len(vocab))))
+    inter = (A_p @ A_c.T).toarray()
+    smaller = np.minimum(np.diff(A_p.indptr)[:, None], np.diff(A_c.indptr)[None, :]).astype(np.float64)
+    author = np.divide(inter, smaller, out=np.zeros_like(inter), where=smaller > 0)
+
+    yp, vp = _years(parsed)
+    yc, vc = _years(crawled)
+    diff = np.abs(yp[:, None] - yc[None, :])
+    valid = vp[:, None] & vc[None, :]
+    year = np.where(valid & (diff == 0), 1.0, np.where(valid & (diff == 1), 0.5, 0.0))
+
+    return 0.5 * title + 0.4 * author + 0.1 * year
+
+def blocked_score_matrix(parsed: List[Dict], crawled: List[Dict], threshold: float = AUTO_THRESHOLD,
+                         stats: Optional[Dict[str, int]] = None) -> np.ndarray:
+    """
+    score_matrix restricted to pairs that can reach `threshold`: exact wherever
+    final_score >= threshold, 0 elsewhere, so labels_from_scores gives the same labels.
+    Without a shared cleaned author a pair scores at most 0.5 + 0.1 = 0.6, so above that
+    only pairs found through the author inverted lists are candidates. Their author and
+    year terms are exact and cheap; the title score they still need becomes the
+    token_set_ratio score_cutoff, and pairs that would need more than 100 are skipped.
+    (Title tokens cannot prune: token_set_ratio scores e.g. "network"/"networks" 93
+    without a shared token.)
+    """
+    stats = stats if stats is not None else {}
+    n_pairs = len(parsed) * len(crawled)
+    for key in ("pairs", "no_shared_author", "year_bound", "title_evaluated", "above_threshold"):
+        stats.setdefault(key, 0)
+    stats["pairs"] += n_pairs
+    if threshold <= 0.6 or not parsed or not crawled:
+        stats["title_evaluated"] += n_pairs
+        scores = score_matrix(parsed, crawled)
+        stats["above_threshold"] += int((scores >= threshold).sum())
+        return scores
+
+    vocab: Dict[str, int] = {}
+    A_p = _author_matrix(parsed, vocab)
+    A_c = _author_matrix(crawled, vocab)
+    A_p.resize((len(parsed), max(1, len(vocab))))
+    A_c.resize((len(crawled), max(1, len(vocab))))
+    shared = (A_p @ A_c.T).tocoo()
+    rows, cols = shared.row, shared.col
+    author = shared.data / np.minimum(np.diff(A_p.indptr)[rows], np.diff(A_c.indptr)[cols])
+
+    yp, vp = _years(parsed)
+    yc, vc = _years(crawled)
+    diff = np.abs(yp[rows] - yc[cols])
+    valid = vp[rows] & vc[cols]
+    year = np.where(valid & (diff == 0), 1.0, np.where(valid & (diff == 1), 0.5, 0.0))
+
+    # smallest token_set_ratio that still reaches the threshold (small margin against rounding;
+    # the final comparison below uses the exact score)
+    cutoff = 100.0 * (threshold - 0.4 * author - 0.1 * year) / 0.5 - 1e-6
+    reachable = cutoff <= 100.0
+    stats["no_shared_author"] += n_pairs - len(rows)
+    stats["year_bound"] += int((~reachable).sum())
+    stats["title_evaluated"] += int(reachable.sum())
+
+    scores = np.zeros((len(parsed), len(crawled)))
+    titles_p = [p["title"] for p in parsed]
+    titles_c = [c["title"] for c in crawled]
+    for i, j, a, y, cut in zip(rows[reachable], cols[reachable], author[reachable], year[reachable], cutoff[reachable]):
+        ratio = fuzz.token_set_ratio(titles_p[i], titles_c[j], score_cutoff=max(0.0, cut))
+        score = 0.5 * (ratio / 100.0) + 0.4 * a + 0.1 * y
+        if score >= threshold:
+            scores[i, j] = score
+            stats["above_threshold"] += 1
+    return scores
+
+def labels_from_scores(scores: np.ndarray, parsed_keys: List[str], crawled_keys: List[str],
+                       threshold: float = AUTO_THRESHOLD) -> Dict[str, str]:
+    # Best crawled entry per parsed entry (first one on ties, as in the pairwise loop)
+    labels: Dict[str, str] = {}
+    if scores.size == 0:
+        return labels
+    best = scores.argmax(axis=1)
+    best_score = scores[np.arange(len(best)), best]
+    for i in np.flatnonzero((best_score >= threshold) & (best_score > 0)):
+        labels[parsed_keys[i]] = crawled_keys[best[i]]
+    return labels
+
+def _source_signature(parsed_path: str, crawled_path: str) -> str:
+    sig = [SCORE_VERSION]
+    for path in (parsed_path, crawled_path):
+        st = os.stat(path)
+        sig.append([os.path.basename(path), st.st_mtime_ns, st.st_size])
+    return json.dumps(sig)
+
+def load_scores(folder_path: str, signature: Optional[str] = None, threshold: float = 0.0):
+    # (scores, parsed_keys, crawled_keys) from SCORES_FILE, or None if missing/stale. A blocked
+    # matrix is only exact from the threshold it was built for (valid_from) upwards
+    path = os.path.join(folder_path, SCORES_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            if signature is not None and str(z["signature"]) != signature:
+                return None
+            if threshold < float(z["valid_from"]):
+                return None
+            return z["scores"], z["parsed_keys"].tolist(), z["crawled_keys"].tolist()
+    except Exception as e:
+        print(f"[WARN] ignoring unreadable {path}: {e}")
+        return None
+
+def save_scores(folder_path: str, scores: np.ndarray, parsed_keys: List[str], crawled_keys: List[str], signature: str,
+                valid_from: float = 0.0):
+    path = os.path.join(folder_path, SCORES_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, scores=scores, parsed_keys=np.asarray(parsed_keys, dtype=str),
+             crawled_keys=np.asarray(crawled_keys, dtype=str), signature=np.array(signature),
+             valid_from=np.array(valid_from))
+    os.replace(tmp, path)
+
+def label_folder(folder_path: str, threshold: float = AUTO_THRESHOLD, reuse_scores: bool = True,
+                 use_blocking: bool = USE_BLOCKING) -> Optional[Dict[str, str]]:
+    """Labels of one folder (None if it has no parsed/crawled references); writes label.json if non-empty."""
+    parsed_path = os.path.join(folder_path, "parsed_reference.json")
+    crawled_path = os.path.join(folder_path, "crawled_reference.json")
+    if not os.path.exists(parsed_path) or not os.path.exists(crawled_path):
+        return None
+
+    signature = _source_signature(parsed_path, crawled_path)
+    cached = load_scores(folder_path, signature, threshold) if reuse_scores else None
+    if cached is not None:
+        scores, parsed_keys, crawled_keys = cached
+    else:
+        with open(parsed_path, "r", encoding="utf-8") as f:
+            parsed_refs = json.load(f)
+        with open(crawled_path, "r", encoding="utf-8") as f:
+            crawled_refs = json.load(f)
+        parsed_keys, crawled_keys = list(parsed_refs.keys()), list(crawled_refs.keys())
+        if use_blocking:
+            scores = blocked_score_matrix(list(parsed_refs.values()), list(crawled_refs.values()), threshold)
+        else:
+            scores = score_matrix(list(parsed_refs.values()), list(crawled_refs.values()))
+        save_scores(folder_path, scores, parsed_keys, crawled_keys, signature, threshold if use_blocking else 0.0)
+
+    labels = labels_from_scores(scores, parsed_keys, crawled_keys, threshold)
+    if labels:
+        label_path = os.path.join(folder_path, "label.json")
+        with open(label_path, "w", encoding="utf-8") as f:
+            json.dump(labels, f, indent=4, ensure_ascii=False)
+    return labels
+
+def _label_folder_task(args):
+    return label_folder(*args)
+
+def main(root_dir: str = ROOT_DIR, threshold: float = AUTO_THRESHOLD, n_jobs: int = N_JOBS, reuse_scores: bool = True,
+         use_blocking: bool = USE_BLOCKING):
+    folders = [f for f in os.listdir(root_dir) if os.path.isdir(os.path.join(root_dir, f))]
+    tasks = [(os.path.join(root_dir, f), threshold, reuse_scores, use_blocking) for f in folders]
+    n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs) if n_jobs < 0 else max(1, n_jobs)
+
+    if n_jobs == 1 or len(tasks) <= 1:
+        results = map(_label_folder_task, tasks)
+    else:
+        ex = ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)))
+        results = ex.map(_label_folder_task, tasks, chunksize=4)
+    try:
+        for folder, labels in zip(folders, results):
+            if labels:
+                print(f"[OK] {folder}: labeled {len(labels)} pairs")
+    finally:
+        if n_jobs > 1 and len(tasks) > 1:
+            ex.shutdown()
+
+    print("[DONE] Auto labeling finished.")
+
+def benchmark_blocking(root_dir: str = ROOT_DIR, threshold: float = AUTO_THRESHOLD) -> Dict:
+    """Full score matrix vs blocked scoring over every folder: time, pairs evaluated/pruned, same labels."""
+    stats: Dict[str, int] = {}
+    t_full = t_blocked = 0.0
+    mismatched = []
+    for folder in sorted(os.listdir(root_dir)):
+        folder_path = os.path.join(root_dir, folder)
+        parsed_path = os.path.join(folder_path, "parsed_reference.json")
+        crawled_path = os.path.join(folder_path, "crawled_reference.json")
+        if not os.path.exists(parsed_path) or not os.path.exists(crawled_path):
+            continue
+        with open(parsed_path, "r", encoding="utf-8") as f:
+            parsed_refs = json.load(f)
+        with open(crawled_path, "r", encoding="utf-8") as f:
+            crawled_refs = json.load(f)
+        keys = (list(parsed_refs.keys()), list(crawled_refs.keys()))
+
+        t0 = time.perf_counter()
+        full = labels_from_scores(score_matrix(list(parsed_refs.values()), list(crawled_refs.values())), *keys, threshold)
+        t_full += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        blocked = labels_from_scores(blocked_score_matrix(list(parsed_refs.values()), list(crawled_refs.values()),
+                                                          threshold, stats), *keys, threshold)
+        t_blocked += time.perf_counter() - t0
+        if full != blocked:
+            mismatched.append(folder)
+
+    pruned = stats.get("pairs", 0) - stats.get("title_evaluated", 0)
+    print(f"[BENCH] blocking: {stats.get('pairs', 0)} pairs | title scored {stats.get('title_evaluated', 0)} | "
+          f"pruned {pruned} (no shared author {stats.get('no_shared_author', 0)}, year bound {stats.get('year_bound', 0)}) | "
+          f"full {t_full:.2f}s vs blocked {t_blocked:.2f}s | labels identical: {not mismatched}")
+    return {"stats": stats, "pruned": pruned, "full_seconds": t_full, "blocked_seconds": t_blocked,
+            "mismatched_folders": mismatched}
+
+def main_pairwise():
+    # Original per-pair labeler (final_score for every pair); kept as the reference implementation
     for folder in os.listdir(ROOT_DIR):
         folder_path = os.path.join(ROOT_DIR, folder)
         if not os.path.isdir(folder_path):
@@ -110,6 +362,9 @@ def main():
     print("[DONE] Auto labeling finished.")
 
 if __name__ == "__main__":
+    if RUN_BENCHMARK:
+        benchmark_blocking(ROOT_DIR)
+        raise SystemExit
     for folder in os.listdir(ROOT_DIR):
         folder_path = os.path.join(ROOT_DIR, folder)
         if not os.path.isdir(folder_path):
@@ -119,4 +374,4 @@ if __name__ == "__main__":
         if os.path.exists(label_path):
             os.remove(label_path)
             print(f"[CLEAN] Removed old label.json in {folder}")
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,12 @@
 import os
+import functools
 import json
+import mmap
 import shutil
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 SRC_DIR = "../../few-data"
 DST_DIR = "../../selected"
@@ -10,96 +15,205 @@ TARGET_COUNT = 2500
 MIN_RICH_REF = 20
 MAX_RICH_REF = 500
 
-os.makedirs(DST_DIR, exist_ok=True)
-
-selected = []
-rich_candidates = []
-
-summary = {
-    "total_scanned": 0,
-    "valid_publications": 0,
-    "selected": 0,
-    "rich_candidates": 0
-}
+# How selected publications land in DST_DIR:
+#   copy      full copies (shutil.copytree)
+#   hardlink  same tree, files hard-linked (no extra disk; falls back to copying across filesystems)
+#   symlink   one directory symlink per publication
+#   manifest  nothing is copied; DST_DIR/manifest.json lists the selected source folders
+#             (process_selected_data reads it)
+MODE = "hardlink"
+N_JOBS = -1  # publications scanned in parallel, -1 = one worker process per core
+MANIFEST_FILE = "manifest.json"
 
 bib_entry_pattern = re.compile(r'^@\w+\{', re.MULTILINE)
+# Byte-level prefilter for entry starts (text mode also treats a lone \r as a line break);
+# every hit is confirmed with bib_entry_pattern on the decoded match
+bib_entry_candidate = re.compile(rb'(?:^|(?<=\r))@[^\s{]*\{', re.MULTILINE)
+
+def count_bib_entries(bib_path: str) -> int:
+    # bib_entry_pattern.findall count over the decoded file without reading it into memory. Equal
+    # for valid UTF-8; invalid bytes between a line break and "@" (dropped by errors="ignore"
+    # in text mode) make that entry not count here
+    if os.path.getsize(bib_path) == 0:
+        return 0
+    with open(bib_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return sum(
+            1 for m in bib_entry_candidate.finditer(mm)
+            if bib_entry_pattern.fullmatch(m.group().decode("utf-8", errors="ignore"))
+        )
 
-for pub_id in sorted(os.listdir(SRC_DIR)):
-    if len(selected) >= TARGET_COUNT:
-        break
-
-    pub_path = os.path.join(SRC_DIR, pub_id)
-    if not os.path.isdir(pub_path):
-        continue
-
-    summary["total_scanned"] += 1
-
+def scan_publication(pub_path: str) -> Optional[Tuple[int, int]]:
+    """(bib_count, ref_count) of a valid publication, None if it is not one."""
     ref_json_path = os.path.join(pub_path, "references.json")
     bib_path = os.path.join(pub_path, "refs.bib")
 
     if not os.path.exists(ref_json_path) or not os.path.exists(bib_path):
-        continue
+        return None
 
     # Load references
     try:
         with open(ref_json_path, encoding="utf-8") as f:
             ref_json = json.load(f)
     except Exception:
-        continue
+        return None
 
     if not isinstance(ref_json, dict) or len(ref_json) == 0:
-        continue
+        return None
 
     # Count Bibitex entries
     try:
-        with open(bib_path, encoding="utf-8", errors="ignore") as f:
-            bib_content = f.read()
+        bib_count = count_bib_entries(bib_path)
     except Exception:
-        continue
-
-    bib_count = len(bib_entry_pattern.findall(bib_content))
-    ref_count = len(ref_json)
+        return None
 
     if bib_count == 0:
-        continue
-
-    # Valiadation publication
-    summary["valid_publications"] += 1
-
-    # Copy folder
-    shutil.copytree(
-        pub_path,
-        os.path.join(DST_DIR, pub_id),
-        dirs_exist_ok=True
-    )
-
-    selected.append(pub_id)
-    summary["selected"] += 1
-
-    # Rich candidate
-    if bib_count >= MIN_RICH_REF and ref_count >= MIN_RICH_REF and ref_count <= MAX_RICH_REF:
-        rich_candidates.append({
-            "pub_id": pub_id,
-            "bib_entries": bib_count,
-            "references": ref_count
-        })
-        summary["rich_candidates"] += 1
-
-print("Selection finished")
-
-# ---- Save artifacts ----
-with open("selection_summary.json", "w", encoding="utf-8") as f:
-    json.dump(summary, f, indent=2, ensure_ascii=False)
-
-with open("rich_candidates.txt", "w", encoding="utf-8") as f:
-    for item in rich_candidates:
-        f.write(
-            f"{item['pub_id']}\t"
-            f"bib={item['bib_entries']}\t"
-            f"refs={item['references']}\n"
-        )
-
-print("Saved selection_summary.json")
-print("Saved rich_candidates.txt")
-print(f"Selected publications: {len(selected)}")
-print(f"Rich candidates (>=25 refs): {len(rich_candidates)}")
+        return None
+    return bib_count, len(ref_json)
+
+def _within(path: str, root: str) -> bool:
+    root = os.path.realpath(root)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+def _remove_existing(dst: str, src_root: str):
+    # a symlink is removed itself; anything else must not resolve into the source publication
+    if not os.path.lexists(dst):
+        return
+    if not os.path.islink(dst) and _within(dst, src_root):
+        raise RuntimeError(f"refusing to remove {dst}: it resolves into the source {src_root}")
+    os.remove(dst)
+
+def _hardlink_or_copy(src: str, dst: str, src_root: str):
+    _remove_existing(dst, src_root)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _copy(src: str, dst: str, src_root: str):
+    # replaced rather than overwritten in place: dst may be a hard link of src from a hardlink run
+    _remove_existing(dst, src_root)
+    shutil.copy2(src, dst)
+
+def _clear_dst(pub_path: str, dst_path: str, mode: str):
+    # A publication left by a run in another mode is replaced, never written through: copytree
+    # follows a directory symlink (hardlinking over it would delete the source files), and
+    # os.symlink fails on an existing directory
+    if os.path.islink(dst_path):
+        if mode == "symlink" and os.path.realpath(dst_path) == os.path.realpath(pub_path):
+            return
+        os.unlink(dst_path)  # the link only, not its target
+    elif os.path.isdir(dst_path):
+        if _within(dst_path, pub_path):
+            raise RuntimeError(f"refusing to write to {dst_path}: it resolves into the source {pub_path}")
+        if mode == "symlink":
+            shutil.rmtree(dst_path)  # does not follow symlinks inside the tree
+    elif os.path.lexists(dst_path):
+        os.remove(dst_path)
+
+def materialize(pub_path: str, dst_path: str, mode: str = MODE):
+    if mode not in ("copy", "hardlink", "symlink"):
+        raise ValueError(f"unknown materialization mode: {mode!r}")
+    _clear_dst(pub_path, dst_path, mode)
+    if mode == "symlink":
+        if not os.path.islink(dst_path):
+            os.symlink(os.path.abspath(pub_path), dst_path, target_is_directory=True)
+        return
+    copy_function = functools.partial(_hardlink_or_copy if mode == "hardlink" else _copy, src_root=pub_path)
+    shutil.copytree(pub_path, dst_path, copy_function=copy_function, dirs_exist_ok=True)
+
+def select_publications(src_dir: str = SRC_DIR, dst_dir: str = DST_DIR, target_count: int = TARGET_COUNT,
+                        mode: str = MODE, n_jobs: int = N_JOBS) -> Tuple[List[str], List[Dict], Dict]:
+    """
+    First `target_count` valid publications of src_dir in sorted order (as the serial scan),
+    scanned in parallel batches that stop once enough are found.
+    """
+    if mode not in ("copy", "hardlink", "symlink", "manifest"):
+        raise ValueError(f"unknown materialization mode: {mode!r}")
+    os.makedirs(dst_dir, exist_ok=True)
+    t0 = time.perf_counter()
+
+    selected = []
+    rich_candidates = []
+    summary = {
+        "total_scanned": 0,
+        "valid_publications": 0,
+        "selected": 0,
+        "rich_candidates": 0
+    }
+
+    pub_ids = [p for p in sorted(os.listdir(src_dir)) if os.path.isdir(os.path.join(src_dir, p))]
+    n_jobs = max(1, (os.cpu_count() or 1) + 1 + n_jobs) if n_jobs < 0 else max(1, n_jobs)
+    batch = max(64, 8 * n_jobs)
+    ex = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        for start in range(0, len(pub_ids), batch):
+            if len(selected) >= target_count:
+                break
+            chunk = pub_ids[start:start + batch]
+            paths = [os.path.join(src_dir, p) for p in chunk]
+            results = ex.map(scan_publication, paths, chunksize=8) if ex is not None else map(scan_publication, paths)
+            for pub_id, pub_path, counts in zip(chunk, paths, results):
+                if len(selected) >= target_count:
+                    break
+                summary["total_scanned"] += 1
+                if counts is None:
+                    continue
+                bib_count, ref_count = counts
+
+                # Valiadation publication
+                summary["valid_publications"] += 1
+
+                if mode != "manifest":
+                    materialize(pub_path, os.path.join(dst_dir, pub_id), mode)
+
+                selected.append(pub_id)
+                summary["selected"] += 1
+
+                # Rich candidate
+                if bib_count >= MIN_RICH_REF and ref_count >= MIN_RICH_REF and ref_count <= MAX_RICH_REF:
+                    rich_candidates.append({
+                        "pub_id": pub_id,
+                        "bib_entries": bib_count,
+                        "references": ref_count
+                    })
+                    summary["rich_candidates"] += 1
+    finally:
+        if ex is not None:
+            ex.shutdown(cancel_futures=True)
+
+    manifest_path = os.path.join(dst_dir, MANIFEST_FILE)
+    if mode == "manifest":
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"src_dir": os.path.abspath(src_dir), "publications": selected}, f, indent=2, ensure_ascii=False)
+    elif os.path.exists(manifest_path):
+        # process_selected_data prefers a manifest; one left by an earlier manifest run is stale now
+        os.remove(manifest_path)
+
+    summary["mode"] = mode
+    summary["seconds"] = round(time.perf_counter() - t0, 3)
+    return selected, rich_candidates, summary
+
+def main():
+    selected, rich_candidates, summary = select_publications(SRC_DIR, DST_DIR, TARGET_COUNT, MODE, N_JOBS)
+
+    print("Selection finished")
+
+    # ---- Save artifacts ----
+    with open("selection_summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    with open("rich_candidates.txt", "w", encoding="utf-8") as f:
+        for item in rich_candidates:
+            f.write(
+                f"{item['pub_id']}\t"
+                f"bib={item['bib_entries']}\t"
+                f"refs={item['references']}\n"
+            )
+
+    print("Saved selection_summary.json")
+    print("Saved rich_candidates.txt")
+    print(f"Selected publications: {len(selected)} ({summary['mode']}, {summary['seconds']:.1f}s)")
+    print(f"Rich candidates (>=25 refs): {len(rich_candidates)}")
+
+if __name__ == "__main__":
+    main()
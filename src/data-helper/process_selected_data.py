@@ -1,7 +1,7 @@
 import os
 import re
 import json
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import bibtexparser
 
 def normalize_text(s: str) -> str:
@@ -96,15 +96,25 @@ def clean_references_json(path: str) -> Dict:
 
     return cleaned
 
+def selected_paper_dirs(input_root: str, manifest: str = None) -> List[Tuple[str, str]]:
+    # (paper_id, paper_dir) of the selection: the folders of input_root, or the source folders
+    # listed in a filter_dataset manifest (given, or input_root/manifest.json if present)
+    manifest = manifest or os.path.join(input_root, "manifest.json")
+    if os.path.exists(manifest):
+        with open(manifest, encoding="utf-8") as f:
+            m = json.load(f)
+        return [(p, os.path.join(m["src_dir"], p)) for p in sorted(m["publications"])]
+    return [(p, os.path.join(input_root, p)) for p in sorted(os.listdir(input_root))]
+
 # Process all papers
 def process_all_papers(
     input_root="../../selected",
-    output_root="../../clean"
+    output_root="../../clean",
+    manifest=None
 ):
     os.makedirs(output_root, exist_ok=True)
 
-    for paper_id in sorted(os.listdir(input_root)):
-        paper_dir = os.path.join(input_root, paper_id)
+    for paper_id, paper_dir in selected_paper_dirs(input_root, manifest):
         if not os.path.isdir(paper_dir):
             continue
 
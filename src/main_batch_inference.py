@@ -0,0 +1,137 @@
+import argparse
+import csv
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from model.build_model import predict_topk_for_publication_with_scores
+from model.helpers import list_publications, load_model_bundle
+from model.label_filter import clean_and_filter_labels, has_usable_label
+from model.load_data import load_publication
+from model.parallel import parallel_imap
+
+GROUPS = ("manual", "non-manual")
+
+def _predict_publication(task: Tuple[str, str], state: Dict) -> Dict:
+    group, pub_id = task
+    pub_dir = os.path.join(state["data_root"], group, pub_id)
+    t0 = time.perf_counter()
+    record = {"group": group, "pub_id": pub_id}
+    try:
+        bib_entries, ref_entries, raw_label = load_publication(pub_dir)
+    except (OSError, ValueError) as e:
+        record.update({"skipped": True, "reason": f"unreadable: {e}"})
+        return record
+
+    label = {}
+    if state["predict_only_labeled"]:
+        if not has_usable_label(raw_label):
+            record.update({"skipped": True, "reason": "empty_label"})
+            return record
+        label, st = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=False)
+        if not label:
+            record.update({"skipped": True, "reason": "no_valid_labels_after_filtering"})
+            return record
+        record["filter_stats"] = dict(st)
+
+    pred_ids, pred_scored = predict_topk_for_publication_with_scores(
+        state["clf"], bib_entries, ref_entries, label, state["vectorizer"], k=state["k"],
+        predict_only_labeled=state["predict_only_labeled"], memory_budget_mb=state["memory_budget_mb"],
+    )
+    record.update({
+        "skipped": False,
+        "parsed_bibkeys": len(bib_entries),
+        "candidates": len(ref_entries),
+        "pred": pred_ids,
+        "scores": pred_scored,
+        "seconds": time.perf_counter() - t0,
+    })
+    return record
+
+class PredictionWriter:
+    """
+    Appends one publication at a time to a single output file:
+      .jsonl -> one JSON object per publication
+      .csv   -> one row per (pub, bibkey, rank) with arxiv_id and score (columnar/flat)
+    """
+
+    CSV_COLUMNS = ["group", "pub_id", "bibkey", "rank", "arxiv_id", "score"]
+
+    def __init__(self, out_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+        self.out_path = out_path
+        self.is_csv = out_path.lower().endswith(".csv")
+        self.f = open(out_path, "w", encoding="utf-8", newline="" if self.is_csv else None)
+        if self.is_csv:
+            self.csv = csv.writer(self.f)
+            self.csv.writerow(self.CSV_COLUMNS)
+
+    def write(self, record: Dict):
+        if not self.is_csv:
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        for bibkey, scored in (record.get("scores") or {}).items():
+            for rank, (arxiv_id, score) in enumerate(scored, start=1):
+                self.csv.writerow([record["group"], record["pub_id"], bibkey, rank, arxiv_id, f"{score:.6g}"])
+
+    def close(self):
+        self.f.close()
+
+def main(
+    DATA_ROOT: str,
+    MODEL_DIR: str,
+    out_path: str,
+    k: int = 5,
+    predict_only_labeled: bool = False,
+    n_jobs: int = -1,
+    groups: Tuple[str, ...] = GROUPS,
+    memory_budget_mb: Optional[float] = None,
+):
+    clf, vectorizer = load_model_bundle(MODEL_DIR)
+    tasks: List[Tuple[str, str]] = []
+    for group in groups:
+        pubs = list_publications(os.path.join(DATA_ROOT, group))
+        print(f"[INFO] found {group} pubs: {len(pubs)}")
+        tasks.extend((group, p) for p in pubs)
+
+    state = {
+        "data_root": DATA_ROOT, "clf": clf, "vectorizer": vectorizer, "k": k,
+        "predict_only_labeled": predict_only_labeled, "memory_budget_mb": memory_budget_mb,
+    }
+    writer = PredictionWriter(out_path)
+    done = skipped = bibs = 0
+    t0 = time.perf_counter()
+    try:
+        # results arrive in input order and are written as they come; parallel_imap keeps only a
+        # bounded window of them in flight
+        for record in parallel_imap(_predict_publication, tasks, n_jobs=n_jobs, desc="Predicting", state=state):
+            writer.write(record)
+            if record.get("skipped"):
+                skipped += 1
+                continue
+            done += 1
+            bibs += len(record["pred"])
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    rate = (done + skipped) / elapsed if elapsed > 0 else float("inf")
+    print(f"[INFO] predicted {done} pubs ({bibs} bibkeys), skipped {skipped} in {elapsed:.1f}s "
+          f"-> {rate:.2f} pubs/sec")
+    print(f"[INFO] predictions: {out_path}")
+    return {"publications": done, "skipped": skipped, "bibkeys": bibs, "seconds": elapsed, "pubs_per_sec": rate}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Top-k reference matching for every publication under a data root.")
+    ap.add_argument("--data-root", default="./clean-data")
+    ap.add_argument("--model-dir", default="./outputs/model_ckpt")
+    ap.add_argument("--out", default="./outputs/batch_predictions.jsonl", help=".jsonl or .csv")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--only-labeled", action="store_true", help="predict only bibkeys present in label.json")
+    ap.add_argument("--n-jobs", type=int, default=-1, help="-1 = one worker process per core")
+    ap.add_argument("--groups", nargs="+", default=list(GROUPS))
+    ap.add_argument("--memory-budget-mb", type=float, default=None)
+    args = ap.parse_args()
+    main(args.data_root, args.model_dir, args.out, k=args.k, predict_only_labeled=args.only_labeled,
+         n_jobs=args.n_jobs, groups=tuple(args.groups), memory_budget_mb=args.memory_budget_mb)
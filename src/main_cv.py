@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model.build_model import train_classifier
+from model.eval_engine import PredictionLogWriter, evaluate_partition
+from model.feature_engineering import fit_vectorizer_from_train, train_pairs_for_pub
+from model.helpers import list_publications, make_folds
+from model.label_filter import filter_pubs_with_nonempty_label
+from model.parallel import parallel_imap
+from model.publication_store import PublicationStore
+from model.tfidf_cache import CachedTfidfVectorizer
+
+def _run_fold(task: Tuple[int, List[Tuple[str, str]], List[Tuple[str, str]]], state: Dict) -> Dict:
+    # Full pipeline for one fold, serial inside the worker: fit TF-IDF, build pairs, train, evaluate held-out pubs
+    fold, train_pubs, test_pubs = task
+    t0 = time.perf_counter()
+    store = state["store"]
+    vectorizer = fit_vectorizer_from_train(train_pubs, state["manual_dir"], state["nonmanual_dir"], store=store)
+    tfidf = CachedTfidfVectorizer(vectorizer, os.path.join(state["cache_dir"], "tfidf"))
+
+    pair_state = {
+        "store": store, "vectorizer": tfidf, "topn_neg": state["topn_neg"],
+        "manual_dir": state["manual_dir"], "nonmanual_dir": state["nonmanual_dir"],
+    }
+    frames = [df for df in (train_pairs_for_pub(pub, pair_state) for pub in train_pubs) if df is not None]
+    if not frames:
+        raise ValueError(f"[ERROR] fold {fold}: no usable TRAIN pairs. Check labels & candidates.")
+    train_df = pd.concat(frames, ignore_index=True)
+    clf = train_classifier(train_df)
+
+    eval_state = {"clf": clf, "vectorizer": tfidf, "store": store,
+                  "manual_dir": state["manual_dir"], "nonmanual_dir": state["nonmanual_dir"]}
+    writer = PredictionLogWriter(os.path.join(state["cv_dir"], f"fold_{fold}_predictions.jsonl"))
+    try:
+        metrics, details = evaluate_partition(test_pubs, "test", eval_state, writer)
+    finally:
+        writer.close()
+
+    return {
+        "fold": fold,
+        "train_pubs": [{"group": g, "pub_id": p} for g, p in train_pubs],
+        "test_pubs": [{"group": g, "pub_id": p} for g, p in test_pubs],
+        "mrr@5": metrics["mrr@5"],
+        "metrics": metrics,
+        "per_publication": details,
+        "train_pairs": int(len(train_df)),
+        "train_positives": int(train_df["y"].sum()),
+        "seconds": time.perf_counter() - t0,
+    }
+
+def main(DATA_ROOT: str, OUTPUTS_DIR: str, k: int = 5, topn_neg: int = 50, seed: Optional[int] = None,
+         cache_dir: str = None, n_jobs: int = -1):
+    """
+    k-fold cross-validation over publications: every fold is held out once and the model is
+    trained on the other k-1 folds. Folds run in parallel worker processes; all of them read
+    publications through the same on-disk PublicationStore cache, which is warmed once here.
+    """
+    cache_dir = cache_dir or os.path.join(OUTPUTS_DIR, "cache")
+    store = PublicationStore(cache_dir=os.path.join(cache_dir, "publications"))
+    manual_dir = os.path.join(DATA_ROOT, "manual")
+    nonmanual_dir = os.path.join(DATA_ROOT, "non-manual")
+    # loading every pub here parses/normalizes it once and persists it for the fold workers
+    manual_usable = filter_pubs_with_nonempty_label(manual_dir, list_publications(manual_dir), "manual", store=store, n_jobs=n_jobs)
+    nonmanual_usable = filter_pubs_with_nonempty_label(nonmanual_dir, list_publications(nonmanual_dir), "non-manual", store=store, n_jobs=n_jobs)
+
+    folds = make_folds(manual_usable, nonmanual_usable, k=k, seed=seed)
+    tasks = []
+    for i, test_pubs in enumerate(folds):
+        train_pubs = [pub for j, fold in enumerate(folds) if j != i for pub in fold]
+        tasks.append((i, train_pubs, test_pubs))
+    print(f"[INFO] {k}-fold CV over {sum(len(f) for f in folds)} pubs | fold sizes = {[len(f) for f in folds]}")
+
+    cv_dir = os.path.join(OUTPUTS_DIR, "cv")
+    os.makedirs(cv_dir, exist_ok=True)
+    state = {
+        "store": store, "topn_neg": topn_neg, "cache_dir": cache_dir, "cv_dir": cv_dir,
+        "manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir,
+    }
+    t0 = time.perf_counter()
+    results = list(parallel_imap(_run_fold, tasks, n_jobs=n_jobs, desc="Cross-validation", state=state))
+    elapsed = time.perf_counter() - t0
+
+    mrrs = np.array([r["mrr@5"] for r in results])
+    print(f"\n[CV] {k} folds in {elapsed:.1f}s")
+    for r in results:
+        print(f"  fold {r['fold']}: MRR@5 = {r['mrr@5']:.4f} | test pubs = {[p['pub_id'] for p in r['test_pubs']]}")
+    print(f"[CV] mean MRR@5 = {mrrs.mean():.4f} (std {mrrs.std():.4f})")
+
+    out_path = os.path.join(cv_dir, "cv_results.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"data_root": os.path.abspath(DATA_ROOT), "k": k, "seed": seed, "topn_neg": topn_neg,
+                   "mean_mrr@5": float(mrrs.mean()), "std_mrr@5": float(mrrs.std()),
+                   "seconds": elapsed, "folds": results}, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] exported cross-validation results to {out_path}")
+    return results
+
+if __name__ == "__main__":
+    DATA_ROOT = r"./clean-data"
+    OUTPUTS_DIR = r"./outputs"
+    N_JOBS = -1  # folds run in parallel, one worker process per core
+    main(DATA_ROOT, OUTPUTS_DIR, k=5, topn_neg=50, n_jobs=N_JOBS)
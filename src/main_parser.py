@@ -1,5 +1,9 @@
+import argparse
 import os
+import queue
 import shutil
+import threading
+import time
 from parser.Publication_Parser import Publication_Parser
 import stat
 
@@ -12,30 +16,27 @@ def force_remove(func, path, excinfo):
 
 dataset_path = "../2301.751-1500"
 
-all_pub_success_rates = []
+# Staged pipeline (reader -> parser -> writer) connected by bounded queues; opt-in
+# (here or with --pipeline), the serial loop stays the default
+PIPELINE_MODE = False
+QUEUE_SIZE = 4          # max publications waiting between two stages
+NUM_READERS = 2
+NUM_PARSERS = 1
+NUM_WRITERS = 1
 
-# Go through every publication folder
-for pub_folder in os.listdir(dataset_path):
-    pub_path = os.path.join(dataset_path, pub_folder)
-    if not os.path.isdir(pub_path):
-        continue
+def list_publication_folders(dataset_path):
+    with os.scandir(dataset_path) as it:
+        return [(e.name, e.path) for e in it if e.is_dir()]
 
-    print(f"\n=== Processing publication {pub_folder} ===")
-
-    # Initialize parser
-    parser = Publication_Parser(pub_id=pub_folder, pub_path=pub_path)
-    parser.parse_dataset()  # build trees, merge, extract refs
-
-    # Success rate of publication
-    all_pub_success_rates.append(parser.success_rate)
-    print(f"[INFO] Publication '{pub_folder}' parsing success rate: {parser.success_rate:.2f}%")
-
-    # Export JSON và bib
+# Export JSON, citation index and bib, then delete the tex folder
+def export_publication(parser, pub_path):
     json_file = os.path.join(pub_path, f"hierarchy.json")
+    cite_file = os.path.join(pub_path, f"citations.json")
     bib_file = os.path.join(pub_path, f"refs.bib")
     parser.export_json(json_file)
+    parser.export_citations(cite_file)
     parser.export_bib(bib_file)
-    print(f"Exported: {json_file} and {bib_file}")
+    print(f"Exported: {json_file}, {cite_file} and {bib_file}")
 
     # Delete folder tex
     tex_path = os.path.join(pub_path, "tex")
@@ -46,9 +47,162 @@ for pub_folder in os.listdir(dataset_path):
         except Exception as e:
             print(f"[WARN] Failed to delete tex folder {tex_path}: {e}")
 
-# Calculate success rate
-if all_pub_success_rates:
-    overall_rate = sum(all_pub_success_rates) / len(all_pub_success_rates)
-    print(f"\n=== Overall parsing success rate across all publications: {overall_rate:.2f}% ===")
-else:
-    print("\n=== No publications were processed. ===")
+def run_serial(dataset_path):
+    all_pub_success_rates = []
+
+    # Go through every publication folder
+    for pub_folder, pub_path in list_publication_folders(dataset_path):
+        print(f"\n=== Processing publication {pub_folder} ===")
+
+        # Initialize parser
+        parser = Publication_Parser(pub_id=pub_folder, pub_path=pub_path)
+        parser.parse_dataset()  # build trees, merge, extract refs
+
+        # Success rate of publication
+        all_pub_success_rates.append(parser.success_rate)
+        print(f"[INFO] Publication '{pub_folder}' parsing success rate: {parser.success_rate:.2f}%")
+
+        export_publication(parser, pub_path)
+
+    return all_pub_success_rates
+
+# Busy time and output-queue depth of one pipeline stage
+class Stage_Stats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.depth_samples = 0
+        self.lock = threading.Lock()
+
+    def record(self, busy: float, out_queue=None):
+        with self.lock:
+            self.busy += busy
+            self.items += 1
+            if out_queue is not None:
+                depth = out_queue.qsize()
+                self.depth_sum += depth
+                self.depth_max = max(self.depth_max, depth)
+                self.depth_samples += 1
+
+    def report(self, wall: float):
+        util = self.busy / (wall * self.workers) * 100 if wall > 0 else 0.0
+        line = f"[PIPELINE] {self.name:<7} workers={self.workers} items={self.items} busy={self.busy:.2f}s utilization={util:.1f}%"
+        if self.depth_samples:
+            line += f" | out queue depth avg={self.depth_sum / self.depth_samples:.2f} max={self.depth_max}"
+        print(line)
+
+def run_pipeline(dataset_path, queue_size=QUEUE_SIZE, num_readers=NUM_READERS,
+                 num_parsers=NUM_PARSERS, num_writers=NUM_WRITERS):
+    folders = queue.Queue()
+    for item in list_publication_folders(dataset_path):
+        folders.put(item)
+
+    # Bounded queues give backpressure: a fast stage blocks instead of piling up publications in memory
+    read_q = queue.Queue(maxsize=queue_size)
+    parsed_q = queue.Queue(maxsize=queue_size)
+
+    read_stats = Stage_Stats("read", num_readers)
+    parse_stats = Stage_Stats("parse", num_parsers)
+    write_stats = Stage_Stats("write", num_writers)
+
+    results = {}
+    results_lock = threading.Lock()
+
+    def reader():
+        while True:
+            try:
+                pub_folder, pub_path = folders.get_nowait()
+            except queue.Empty:
+                return
+            t0 = time.perf_counter()
+            parser = Publication_Parser(pub_id=pub_folder, pub_path=pub_path)
+            try:
+                loaded = parser.load_sources()
+            except Exception as e:
+                print(f"[ERROR] Failed to read {pub_folder}: {e}")
+                continue
+            busy = time.perf_counter() - t0
+            read_q.put((pub_folder, pub_path, parser, loaded))
+            read_stats.record(busy, read_q)
+
+    def parse_worker():
+        while True:
+            item = read_q.get()
+            if item is None:
+                return
+            pub_folder, pub_path, parser, loaded = item
+            print(f"\n=== Processing publication {pub_folder} ===")
+            t0 = time.perf_counter()
+            try:
+                parser.parse_sources(loaded)  # build trees, merge, extract refs
+            except Exception as e:
+                print(f"[ERROR] Failed to parse {pub_folder}: {e}")
+                continue
+            busy = time.perf_counter() - t0
+            print(f"[INFO] Publication '{pub_folder}' parsing success rate: {parser.success_rate:.2f}%")
+            parsed_q.put((pub_folder, pub_path, parser))
+            parse_stats.record(busy, parsed_q)
+
+    def writer():
+        while True:
+            item = parsed_q.get()
+            if item is None:
+                return
+            pub_folder, pub_path, parser = item
+            t0 = time.perf_counter()
+            try:
+                export_publication(parser, pub_path)
+            except Exception as e:
+                print(f"[ERROR] Failed to export {pub_folder}: {e}")
+                continue
+            with results_lock:
+                results[pub_folder] = parser.success_rate
+            write_stats.record(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    readers = [threading.Thread(target=reader, daemon=True) for _ in range(num_readers)]
+    parsers = [threading.Thread(target=parse_worker, daemon=True) for _ in range(num_parsers)]
+    writers = [threading.Thread(target=writer, daemon=True) for _ in range(num_writers)]
+    for t in readers + parsers + writers:
+        t.start()
+
+    # Shut the stages down in order, one sentinel per downstream worker
+    for t in readers:
+        t.join()
+    for _ in parsers:
+        read_q.put(None)
+    for t in parsers:
+        t.join()
+    for _ in writers:
+        parsed_q.put(None)
+    for t in writers:
+        t.join()
+    wall = time.perf_counter() - start
+
+    print(f"\n[PIPELINE] wall time: {wall:.2f}s for {len(results)} publications")
+    for s in (read_stats, parse_stats, write_stats):
+        s.report(wall)
+
+    return [results[k] for k in sorted(results)]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parse every publication of dataset_path.")
+    ap.add_argument("--pipeline", action="store_true", default=PIPELINE_MODE,
+                    help="overlap reading, parsing and writing in threads (run_pipeline)")
+    opts = ap.parse_args()
+
+    if opts.pipeline:
+        all_pub_success_rates = run_pipeline(dataset_path)
+    else:
+        all_pub_success_rates = run_serial(dataset_path)
+
+    # Calculate success rate
+    if all_pub_success_rates:
+        overall_rate = sum(all_pub_success_rates) / len(all_pub_success_rates)
+        print(f"\n=== Overall parsing success rate across all publications: {overall_rate:.2f}% ===")
+    else:
+        print("\n=== No publications were processed. ===")
@@ -0,0 +1,153 @@
+import itertools
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from model.build_model import train_classifier
+from model.evaluation import mrr_at_k
+from model.feature_engineering import (
+    ALL_FEATURE_COLS,
+    FEATURE_COLS,
+    fit_vectorizer_from_train,
+    pair_feature_matrix,
+    train_pairs_for_pub,
+)
+from model.feature_store import PairFeatureStore, concat_pair_frames
+from model.helpers import list_publications, pick_splits
+from model.label_filter import clean_and_filter_labels, filter_pubs_with_nonempty_label, has_usable_label
+from model.parallel import parallel_imap, parallel_map
+from model.publication_store import PublicationStore
+from model.similarity import topk_indices
+from model.tfidf_cache import CachedTfidfVectorizer
+
+DEFAULT_GRID = {
+    "topn_neg": [10, 25, 50],
+    "C": [0.1, 1.0, 10.0],
+    "class_weight": ["balanced", None],
+    "feature_cols": [
+        FEATURE_COLS,
+        FEATURE_COLS + ["title_jaccard"],
+        FEATURE_COLS + ["year_match", "first_author_match"],
+        ALL_FEATURE_COLS,
+    ],
+}
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def _valid_features_for_pub(task: Tuple[str, str], state: Dict) -> Optional[Dict]:
+    # Full (labeled bibs x candidates) grid of every feature, computed once for all trials
+    group, pub_id = task
+    base_dir = state["manual_dir"] if group == "manual" else state["nonmanual_dir"]
+    bib_entries, ref_entries, raw_label = state["store"].load(os.path.join(base_dir, pub_id))
+    if not has_usable_label(raw_label):
+        return None
+    label, _ = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=False)
+    bibs = [b for b in bib_entries if b.bibkey in label]
+    if not bibs or not ref_entries:
+        return None
+    vec = state["vectorizer"]
+    sim = cosine_similarity(vec.transform([b.title_norm for b in bibs]), vec.transform([r.title_norm for r in ref_entries]))
+    return {
+        "pub_id": pub_id,
+        "label": label,
+        "bibkeys": [b.bibkey for b in bibs],
+        "arxiv_ids": [r.arxiv_id for r in ref_entries],
+        "X": pair_feature_matrix(bibs, ref_entries, sim, ALL_FEATURE_COLS),
+    }
+
+def _run_trial(task: Tuple[int, Dict], state: Dict) -> Dict:
+    trial_id, params = task
+    t0 = time.perf_counter()
+    train_df = state["train_df"]
+    # pairs were built with the largest topn_neg; the first n negatives of a bibkey are the topn_neg=n set
+    keep = (train_df["y"].to_numpy() == 1) | (state["neg_rank"] < params["topn_neg"])
+    feature_cols = list(params["feature_cols"])
+    clf = train_classifier(train_df[keep], feature_cols=feature_cols, C=params["C"], class_weight=params["class_weight"])
+
+    col_idx = [ALL_FEATURE_COLS.index(c) for c in feature_cols]
+    mrrs = []
+    for pub in state["valid"]:
+        nb, nr = len(pub["bibkeys"]), len(pub["arxiv_ids"])
+        proba = clf.predict_proba(pub["X"][:, col_idx])[:, 1].reshape(nb, nr)
+        pred = {key: [pub["arxiv_ids"][j] for j in topk_indices(proba[i], 5)] for i, key in enumerate(pub["bibkeys"])}
+        mrrs.append(mrr_at_k(pub["label"], pred, k=5))
+
+    return {
+        "trial": trial_id,
+        "params": {**params, "feature_cols": feature_cols},
+        "valid_mrr@5": float(np.mean(mrrs)) if mrrs else 0.0,
+        "valid_pub_mrr@5": mrrs,
+        "train_pairs": int(keep.sum()),
+        "seconds": time.perf_counter() - t0,
+    }
+
+def main(DATA_ROOT: str, OUTPUTS_DIR: str, grid: Dict[str, List] = None, cache_dir: str = None, n_jobs: int = -1):
+    grid = grid or DEFAULT_GRID
+    unknown = {c for cols in grid["feature_cols"] for c in cols} - set(ALL_FEATURE_COLS)
+    if unknown:
+        raise ValueError(f"[ERROR] unknown feature columns in grid: {sorted(unknown)}")
+    trials = expand_grid(grid)
+
+    cache_dir = cache_dir or os.path.join(OUTPUTS_DIR, "cache")
+    store = PublicationStore(cache_dir=os.path.join(cache_dir, "publications"))
+    manual_dir = os.path.join(DATA_ROOT, "manual")
+    nonmanual_dir = os.path.join(DATA_ROOT, "non-manual")
+    manual_usable = filter_pubs_with_nonempty_label(manual_dir, list_publications(manual_dir), "manual", store=store, n_jobs=n_jobs)
+    nonmanual_usable = filter_pubs_with_nonempty_label(nonmanual_dir, list_publications(nonmanual_dir), "non-manual", store=store, n_jobs=n_jobs)
+    train_pubs, valid_pubs, _ = pick_splits(manual_usable, nonmanual_usable)
+
+    vectorizer = fit_vectorizer_from_train(train_pubs, manual_dir, nonmanual_dir, store=store, n_jobs=n_jobs)
+    tfidf = CachedTfidfVectorizer(vectorizer, os.path.join(cache_dir, "tfidf"))
+
+    # features are generated once (and reused across sweeps) for the largest topn_neg and every feature
+    max_topn = max(grid["topn_neg"])
+    pair_store = PairFeatureStore(os.path.join(cache_dir, "feature_store"), tfidf.fingerprint, max_topn, ALL_FEATURE_COLS)
+    pair_state = {
+        "store": store, "vectorizer": tfidf, "topn_neg": max_topn, "pair_store": pair_store,
+        "manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir,
+    }
+    frames = [df for df in parallel_imap(train_pairs_for_pub, train_pubs, n_jobs=n_jobs,
+                                         desc="Loading TRAIN pairs", state=pair_state) if df is not None]
+    if not frames:
+        raise ValueError("[ERROR] No usable TRAIN pairs. Check labels & candidates.")
+    train_df = concat_pair_frames(frames)
+    neg = train_df["y"].to_numpy() == 0
+    neg_rank = np.full(len(train_df), -1, dtype=np.int64)
+    neg_rank[neg] = train_df[neg].groupby(["pub_id", "bibkey"], observed=True, sort=False).cumcount().to_numpy()
+
+    valid_state = {"store": store, "vectorizer": tfidf, "manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir}
+    valid = [v for v in parallel_map(_valid_features_for_pub, valid_pubs, n_jobs=n_jobs,
+                                     desc="Valid features", state=valid_state) if v is not None]
+
+    print(f"[INFO] sweep: {len(trials)} trials | {len(train_df)} cached train pairs | {len(valid)} valid pubs")
+    t0 = time.perf_counter()
+    results = parallel_map(_run_trial, list(enumerate(trials)), n_jobs=n_jobs, desc="Sweep",
+                           state={"train_df": train_df, "neg_rank": neg_rank, "valid": valid})
+    elapsed = time.perf_counter() - t0
+
+    ranked = sorted(results, key=lambda r: (-r["valid_mrr@5"], r["trial"]))
+    print(f"\n[SWEEP] {len(trials)} trials in {elapsed:.1f}s, ranked by valid MRR@5:")
+    for r in ranked[:10]:
+        p = r["params"]
+        print(f"  {r['valid_mrr@5']:.4f} | topn_neg={p['topn_neg']} C={p['C']} class_weight={p['class_weight']} "
+              f"features={p['feature_cols']}")
+
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
+    out_path = os.path.join(OUTPUTS_DIR, "sweep_results.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"grid": grid, "valid_pubs": [p for _, p in valid_pubs], "seconds": elapsed, "trials": ranked},
+                  f, ensure_ascii=False, indent=2)
+    print(f"[INFO] exported sweep results to {out_path}")
+    return ranked
+
+if __name__ == "__main__":
+    DATA_ROOT = r"./clean-data"
+    OUTPUTS_DIR = r"./outputs"
+    N_JOBS = -1  # trials run in parallel, one worker process per core
+    main(DATA_ROOT, OUTPUTS_DIR, grid=DEFAULT_GRID, n_jobs=N_JOBS)
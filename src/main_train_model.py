@@ -1,25 +1,32 @@
 import os
-from typing import List, Tuple
+from typing import Optional
 
-import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
-from model.build_model import predict_topk_for_publication_with_scores, train_classifier
-from model.evaluation import mrr_at_k
-from model.feature_engineering import build_pairs_hardneg, fit_vectorizer_from_train
+from model.build_model import train_classifier
+from model.compact_bundle import save_compact_bundle
+from model.eval_engine import PredictionLogWriter, derive_pred_files, evaluate_partition
+from model.feature_engineering import fit_vectorizer_from_train, train_pairs_for_pub
+from model.feature_store import PairFeatureStore, concat_pair_frames
 from model.helpers import (
-    export_pred_json,
     list_publications,
     pick_splits,
     save_model_bundle,
-    export_pred_json_score,
     export_summary_results_json
 )
-from model.label_filter import clean_and_filter_labels, filter_pubs_with_nonempty_label, has_usable_label
-from model.load_data import load_publication
+from model.label_filter import filter_pubs_with_nonempty_label
+from model.out_of_core import PairChunkWriter, train_classifier_out_of_core
+from model.parallel import parallel_imap
+from model.publication_store import PublicationStore
+from model.tfidf_cache import CachedTfidfVectorizer
+
+def main(DATA_ROOT: str, OUTPUTS_DIR: str, topn_neg: int = 50, cache_dir: str = None, n_jobs: int = 1,
+         memory_budget_mb: Optional[float] = None, streaming_vectorizer: bool = False,
+         out_of_core: bool = False, use_feature_store: bool = False, export_pred_files: bool = False):
+    # every stage reads publications through one store: loaded/normalized once, cached on disk
+    cache_dir = cache_dir or os.path.join(OUTPUTS_DIR, "cache")
+    store = PublicationStore(cache_dir=os.path.join(cache_dir, "publications"))
 
-def main(DATA_ROOT: str, OUTPUTS_DIR: str, topn_neg: int = 50):
     manual_dir = os.path.join(DATA_ROOT, "manual")
     nonmanual_dir = os.path.join(DATA_ROOT, "non-manual")
 
@@ -30,8 +37,8 @@ def main(DATA_ROOT: str, OUTPUTS_DIR: str, topn_neg: int = 50):
     print(f"[INFO] found non-manual pubs: {len(nonmanual_pubs)}")
 
     print(f"[INFO] filtering pubs with non-empty label.json")
-    manual_usable = filter_pubs_with_nonempty_label(manual_dir, manual_pubs, "manual")
-    nonmanual_usable = filter_pubs_with_nonempty_label(nonmanual_dir, nonmanual_pubs, "non-manual")
+    manual_usable = filter_pubs_with_nonempty_label(manual_dir, manual_pubs, "manual", store=store, n_jobs=n_jobs)
+    nonmanual_usable = filter_pubs_with_nonempty_label(nonmanual_dir, nonmanual_pubs, "non-manual", store=store, n_jobs=n_jobs)
 
     if len(manual_usable) < 5:
         print(f"[WARN] manual pubs with non-empty label.json = {len(manual_usable)} < 5")
@@ -53,137 +60,95 @@ def main(DATA_ROOT: str, OUTPUTS_DIR: str, topn_neg: int = 50):
     os.makedirs(model_dir, exist_ok=True)
 
     # 1) Fit vectorizer on TRAIN only
-    vectorizer = fit_vectorizer_from_train(train_pubs, manual_dir, nonmanual_dir)
+    vectorizer = fit_vectorizer_from_train(train_pubs, manual_dir, nonmanual_dir, store=store, n_jobs=n_jobs,
+                                           streaming=streaming_vectorizer)
+    # per-publication TF-IDF matrices are persisted and shared by pair building and evaluation
+    tfidf = CachedTfidfVectorizer(vectorizer, os.path.join(cache_dir, "tfidf"))
 
     # 2) Build train pairs with hard negatives
     train_rows = []
     train_used_pubs = 0
-
-    for group, pub_id in tqdm(train_pubs, desc="Building TRAIN pairs"):
-        base_dir = manual_dir if group == "manual" else nonmanual_dir
-        pub_dir = os.path.join(base_dir, pub_id)
-
-        bib_entries, ref_entries, raw_label = load_publication(pub_dir)
-        if not has_usable_label(raw_label):
-            continue
-        label, st = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=False)
-        if not label:
-            print(f"[WARN] skip train pub {pub_id}: no valid labels after filtering. stats={st}")
+    # out-of-core: pairs are spilled to disk chunks as they are built, never concatenated
+    writer = PairChunkWriter(os.path.join(cache_dir, "pairs")) if out_of_core else None
+
+    # feature store: float32/categorical pair shards reused across runs (model.feature_store)
+    pair_store = PairFeatureStore(os.path.join(cache_dir, "feature_store"), tfidf.fingerprint, topn_neg) if use_feature_store else None
+
+    pair_state = {
+        "store": store, "vectorizer": tfidf, "topn_neg": topn_neg, "memory_budget_mb": memory_budget_mb,
+        "manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir, "pair_store": pair_store,
+    }
+    for df in parallel_imap(train_pairs_for_pub, train_pubs, n_jobs=n_jobs,
+                            desc="Building TRAIN pairs", state=pair_state):
+        if df is None:
             continue
-
-        df = build_pairs_hardneg(bib_entries, ref_entries, label, vectorizer, topn_neg=topn_neg)
-        if len(df) == 0:
-            continue
-        df["pub_id"] = pub_id
-        df["group"] = group
-        df["partition"] = "train"
-        train_rows.append(df)
+        if writer is not None:
+            writer.write(df)
+        else:
+            train_rows.append(df)
         train_used_pubs += 1
 
-    if not train_rows:
+    if not train_used_pubs:
         raise ValueError("[ERROR] No usable TRAIN pairs. Check labels & candidates.")
 
-    train_df = pd.concat(train_rows, ignore_index=True)
+    if writer is not None:
+        writer.flush()
+        n_train_pairs, n_train_pos = writer.n_pairs, writer.n_pos
+    else:
+        train_df = concat_pair_frames(train_rows) if pair_store is not None else pd.concat(train_rows, ignore_index=True)
+        n_train_pairs, n_train_pos = len(train_df), int(train_df["y"].sum())
     print(f"[INFO] train pubs used = {train_used_pubs}")
-    print(f"[INFO] Train pairs = {len(train_df)} | positives = {int(train_df['y'].sum())}")
+    print(f"[INFO] Train pairs = {n_train_pairs} | positives = {n_train_pos}")
 
-    clf = train_classifier(train_df)
+    if writer is not None:
+        clf, ooc_stats = train_classifier_out_of_core(writer.paths, writer.class_counts)
+        print(f"[INFO] out-of-core training: {ooc_stats}")
+    else:
+        clf = train_classifier(train_df)
     save_model_bundle(model_dir, clf, vectorizer)
-
-    # 3) Eval on valid and test pubs
-    def eval_partition(pubs: List[Tuple[str,str]], name: str):
-        mrrs = []
-        details = []
-
-        for group, pub_id in pubs:
-            base_dir = manual_dir if group == "manual" else nonmanual_dir
-            pub_dir = os.path.join(base_dir, pub_id)
-
-            bib_entries, ref_entries, raw_label = load_publication(pub_dir)
-            if not has_usable_label(raw_label):
-                print(f"[WARN] skip {name} pub {pub_id}: empty label")
-                details.append({
-                    "partition": name, "group": group, "pub_id": pub_id,
-                    "skipped": True, "reason": "empty_label"
-                })
-                continue
-
-            label, st = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=True)
-            if not label:
-                print(f"[WARN] skip {name} pub {pub_id}: no valid labels after filtering. stats={st}")
-                details.append({
-                    "partition": name, "group": group, "pub_id": pub_id,
-                    "skipped": True, "reason": "no_valid_labels_after_filtering",
-                    "filter_stats": dict(st),
-                    "parsed_bibkeys": int(len(bib_entries)),
-                    "candidates": int(len(ref_entries)),
-                })
-                continue
-
-            pred_ids, pred_scored = predict_topk_for_publication_with_scores(
-                clf, bib_entries, ref_entries, label, vectorizer, k=5, predict_only_labeled=True
-            )
-
-            extra = set(pred_ids.keys()) - set(label.keys())
-            miss = set(label.keys()) - set(pred_ids.keys())
-            if extra or miss:
-                print(f"[SANITY] key mismatch pub={pub_id} extra={len(extra)} missing={len(miss)}")
-
-            mrr = mrr_at_k(label, pred_ids, k=5)
-            print(f"\n[RESULT] pub={pub_id} partition={name} MRR@5={mrr:.4f} (label_kept={len(label)})")
-
-            out_path = os.path.join(outputs_dir, f"{name}_{pub_id}_pred.json")
-            out_path_score = os.path.join(outputs_dir_score, f"{name}_{pub_id}_pred_with_scores.json")
-
-            stats = dict(st)
-            stats.update({
-                "label_kept": int(len(label)),
-                "pred_keys": int(len(pred_ids)),
-                "candidates": int(len(ref_entries)),
-                "parsed_bibkeys": int(len(bib_entries)),
-            })
-
-            export_pred_json_score(out_path_score, name, pub_id, label, pred_ids, pred_scored, stats)
-            print(f"[INFO] exported predictions to {out_path_score}")
-
-            export_pred_json(out_path, name, label, pred_ids)
-            print(f"[INFO] exported predictions to {out_path}")
-
-            mrrs.append(mrr)
-
-            details.append({
-                "partition": name,
-                "group": group,
-                "pub_id": pub_id,
-                "skipped": False,
-                "mrr@5": float(mrr),
-                "label_kept": int(len(label)),
-                "pred_keys": int(len(pred_ids)),
-                "candidates": int(len(ref_entries)),
-                "parsed_bibkeys": int(len(bib_entries)),
-                "filter_stats": dict(st),
-                "pred_json": out_path,
-                "pred_json_with_scores": out_path_score,
-                "sanity": {"extra_keys": int(len(extra)), "missing_keys": int(len(miss))}
-            })
-
-        mean_mrr = float(np.mean(mrrs)) if mrrs else 0.0
-        return mean_mrr, details
-
-
-    train_mrr, train_details = eval_partition(train_pubs, "train")
-    valid_mrr, valid_details = eval_partition(valid_pubs, "valid")
-    test_mrr, test_details = eval_partition(test_pubs, "test")
+    if not streaming_vectorizer:
+        # same model as plain .npy arrays for fast-starting NumPy-only scoring (model.compact_bundle)
+        save_compact_bundle(os.path.join(OUTPUTS_DIR, "model_ckpt_compact"), clf, vectorizer)
+
+    # 3) Eval on train, valid and test pubs: one scoring pass per publication, every metric from the
+    #    gt ranks; predictions go to one consolidated log, the pred.json files are derived from it
+    eval_state = {
+        "clf": clf, "vectorizer": tfidf, "store": store, "memory_budget_mb": memory_budget_mb,
+        "manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir,
+    }
+    predictions_path = os.path.join(OUTPUTS_DIR, "predictions.jsonl")
+    pred_writer = PredictionLogWriter(predictions_path)
+    try:
+        train_metrics, train_details = evaluate_partition(train_pubs, "train", eval_state, pred_writer, n_jobs=n_jobs)
+        valid_metrics, valid_details = evaluate_partition(valid_pubs, "valid", eval_state, pred_writer, n_jobs=n_jobs)
+        test_metrics, test_details = evaluate_partition(test_pubs, "test", eval_state, pred_writer, n_jobs=n_jobs)
+    finally:
+        pred_writer.close()
+    train_mrr, valid_mrr, test_mrr = (m["mrr@5"] for m in (train_metrics, valid_metrics, test_metrics))
+
+    print(f"[INFO] exported predictions to {predictions_path}")
+    # per-publication pred.json files only on request; derive_pred_files can also write them later
+    if export_pred_files:
+        derive_pred_files(predictions_path, outputs_dir, outputs_dir_score)
+        for details in (train_details, valid_details, test_details):
+            for d in details:
+                if not d["skipped"]:
+                    d["pred_json"] = os.path.join(outputs_dir, f"{d['partition']}_{d['pub_id']}_pred.json")
+                    d["pred_json_with_scores"] = os.path.join(outputs_dir_score, f"{d['partition']}_{d['pub_id']}_pred_with_scores.json")
+        print(f"[INFO] exported per-publication pred.json files to {outputs_dir} and {outputs_dir_score}")
 
     print("\n[FINAL RESULTS]")
     print(f"[FINAL] Train MRR@5 = {train_mrr:.4f}")
     print(f"\n[FINAL] Valid MRR@5 = {valid_mrr:.4f}")
     print(f"[FINAL] Test  MRR@5 = {test_mrr:.4f}")
+    for name, m in (("Train", train_metrics), ("Valid", valid_metrics), ("Test", test_metrics)):
+        print(f"[FINAL] {name:<5} " + " ".join(f"{key}={v:.4f}" for key, v in m.items()))
     print(f"[INFO] outputs: {outputs_dir}")
     print(f"[INFO] model bundle: {model_dir}")
-    print(f"[INFO] Size of dataset used to train the model: {len(train_df)} pairs from {train_used_pubs} publications.")
+    print(f"[INFO] Size of dataset used to train the model: {n_train_pairs} pairs from {train_used_pubs} publications.")
     print(f"[INFO] Size of data valid: {len(valid_pubs)} publications.")
     print(f"[INFO] Size of data test: {len(test_pubs)} publications.")
+    print(f"[INFO] Publication store: {store.stats}")
     summary_path = export_summary_results_json(
         outputs_dir=outputs_dir, 
         DATA_ROOT=DATA_ROOT,
@@ -197,9 +162,10 @@ def main(DATA_ROOT: str, OUTPUTS_DIR: str, topn_neg: int = 50):
         valid_details=valid_details,
         test_details=test_details,
         train_used_pubs=train_used_pubs,
-        train_df_len=len(train_df),
-        train_positives=int(train_df["y"].sum()),
+        train_df_len=n_train_pairs,
+        train_positives=n_train_pos,
         topn_neg=topn_neg,
+        metrics_at_k={"train": train_metrics, "valid": valid_metrics, "test": test_metrics},
     )
     print(f"[INFO] exported overall summary to {summary_path}")
 
@@ -207,4 +173,8 @@ if __name__ == "__main__":
     DATA_ROOT = r"./clean-data"
     OUTPUTS_DIR = r"./outputs"
     os.makedirs(OUTPUTS_DIR, exist_ok=True)
-    main(DATA_ROOT, OUTPUTS_DIR, topn_neg=50)
\ No newline at end of file
+    N_JOBS = 1  # -1 = one worker process per core; results are identical to the serial run
+    MEMORY_BUDGET_MB = None  # e.g. 256: score pairs in blocks instead of full #bibs x #refs matrices
+    EXPORT_PRED_FILES = False  # True: also write the per-publication pred.json files (python -m model.eval_engine does it later)
+    main(DATA_ROOT, OUTPUTS_DIR, topn_neg=50, n_jobs=N_JOBS, memory_budget_mb=MEMORY_BUDGET_MB,
+         export_pred_files=EXPORT_PRED_FILES)
\ No newline at end of file
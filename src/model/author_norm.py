@@ -1,7 +1,14 @@
 import re
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from model.text_norm import normalize_text
 
+@lru_cache(maxsize=1 << 18)
+def _last_name(name: str) -> str:
+    # normalized last token of one author name ("" if nothing is left)
+    toks = normalize_text(name).split()
+    return toks[-1] if toks else ""
+
 def normalize_author_list(authors) -> List[str]:
     if authors is None:
         return []
@@ -27,11 +34,9 @@ def normalize_author_list(authors) -> List[str]:
 
     last_names = []
     for p in parts:
-        p = normalize_text(p)
-        if not p:
-            continue
-        toks = p.split()
-        last_names.append(toks[-1])
+        ln = _last_name(p)
+        if ln:
+            last_names.append(ln)
 
     seen, out = set(), []
     for ln in last_names:
@@ -0,0 +1,223 @@
+import os
+import random
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from model.build_model import predict_topk_for_publication_with_scores
+from model.feature_engineering import FEATURE_COLS
+from model.load_data import BibEntry, RefEntry, load_publication
+
+WORDS = [
+    "graph", "neural", "network", "learning", "deep", "privacy", "social", "model", "robust",
+    "attention", "transformer", "language", "vision", "federated", "optimization", "sparse",
+    "retrieval", "citation", "matching", "bayesian", "inference", "kernel", "causal", "data",
+]
+NAMES = ["nguyen", "tran", "le", "pham", "smith", "wang", "li", "zhang", "kim", "garcia", "muller", "rossi"]
+
+def synthetic_publication(n_bibs: int, n_refs: int, seed: int = 0) -> Tuple[List[BibEntry], List[RefEntry], Dict[str, str]]:
+    # Random titles/authors/years; every bib entry is labeled with a noisy copy among the candidates
+    rng = random.Random(seed)
+    refs = []
+    for j in range(n_refs):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10)))
+        refs.append(RefEntry(
+            arxiv_id=f"2301.{j:05d}", title=title, title_norm=title,
+            authors_last=rng.sample(NAMES, rng.randint(1, 4)),
+            year=rng.choice([None, 2018, 2019, 2020, 2021, 2022]),
+        ))
+    bibs, label = [], {}
+    for i in range(n_bibs):
+        r = rng.choice(refs)
+        toks = r.title_norm.split()
+        toks[rng.randrange(len(toks))] = rng.choice(WORDS)
+        title = " ".join(toks)
+        bibs.append(BibEntry(
+            bibkey=f"bib{i}", title=title, title_norm=title,
+            authors_last=r.authors_last[: rng.randint(1, len(r.authors_last))],
+            year=r.year,
+        ))
+        label[f"bib{i}"] = r.arxiv_id
+    return bibs, refs, label
+
+def synthetic_model(bibs: List[BibEntry], refs: List[RefEntry], seed: int = 0) -> Tuple[LogisticRegression, TfidfVectorizer]:
+    vec = TfidfVectorizer(ngram_range=(1, 2), min_df=1)
+    vec.fit([b.title_norm for b in bibs] + [r.title_norm for r in refs])
+    rng = np.random.default_rng(seed)
+    X = rng.random((200, len(FEATURE_COLS)))
+    y = (X[:, 0] + 0.3 * rng.random(200) > 0.6).astype(int)
+    clf = LogisticRegression(max_iter=3000, class_weight="balanced", solver="lbfgs").fit(X, y)
+    return clf, vec
+
+def benchmark_predict_topk(
+    pub_dir: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    n_bibs: int = 200,
+    n_refs: int = 400,
+    repeats: int = 3,
+    k: int = 5,
+) -> Dict[str, float]:
+    """
+    Latency of predict_topk_for_publication_with_scores, row-wise vs batched.
+    Uses a real publication + model bundle when given, synthetic data otherwise,
+    and checks that both paths return the same rankings.
+    """
+    if pub_dir:
+        bibs, refs, label = load_publication(pub_dir)
+    else:
+        bibs, refs, label = synthetic_publication(n_bibs, n_refs)
+    if model_dir:
+        clf = joblib.load(os.path.join(model_dir, "lr_model.joblib"))
+        vec = joblib.load(os.path.join(model_dir, "tfidf_vectorizer.joblib"))
+    else:
+        clf, vec = synthetic_model(bibs, refs)
+
+    timings = {}
+    results = {}
+    for batched in (False, True):
+        name = "batched" if batched else "rowwise"
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            results[name] = predict_topk_for_publication_with_scores(
+                clf, bibs, refs, label, vec, k=k, predict_only_labeled=False, batched=batched
+            )
+            best = min(best, time.perf_counter() - t0)
+        timings[name] = best
+
+    ids_row, scored_row = results["rowwise"]
+    _, scored_bat = results["batched"]
+    # The row-wise path sorts with an unstable sort, so candidates with tied scores may swap
+    mismatches = 0
+    for key, row in scored_row.items():
+        bat = scored_bat.get(key, [])
+        scores_row = [s for _, s in row]
+        if scores_row != [s for _, s in bat]:
+            mismatches += 1
+            continue
+        for (id_a, s), (id_b, _) in zip(row, bat):
+            if id_a != id_b and scores_row.count(s) == 1:
+                mismatches += 1
+                break
+
+    report = {
+        "pairs": float(len(ids_row) * len(refs)),
+        "rowwise_s": timings["rowwise"],
+        "batched_s": timings["batched"],
+        "speedup": timings["rowwise"] / timings["batched"] if timings["batched"] > 0 else float("inf"),
+        "ranking_mismatches": float(mismatches),
+    }
+    print(f"[BENCH] predict_topk: {int(report['pairs'])} pairs | rowwise={report['rowwise_s']*1000:.1f}ms "
+          f"batched={report['batched_s']*1000:.1f}ms speedup={report['speedup']:.1f}x mismatches={mismatches}")
+    return report
+
+def _traced(fn):
+    # (result, seconds, peak MB allocated while fn ran)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    out = fn()
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, seconds, max(0, peak - base) / (1024 * 1024)
+
+def benchmark_blockwise_similarity(
+    n_bibs: int = 1000,
+    n_refs: int = 3000,
+    memory_budget_mb: float = 16.0,
+    k: int = 5,
+) -> Dict[str, float]:
+    """
+    Peak traced memory and time of predict_topk / build_pairs_hardneg with the full
+    cosine matrix vs blockwise under memory_budget_mb, checking identical results.
+    """
+    from model.feature_engineering import build_pairs_hardneg
+
+    bibs, refs, label = synthetic_publication(n_bibs, n_refs)
+    clf, vec = synthetic_model(bibs, refs)
+
+    report = {"pairs": float(n_bibs * n_refs), "memory_budget_mb": memory_budget_mb}
+    runs = {
+        "predict": lambda budget: predict_topk_for_publication_with_scores(
+            clf, bibs, refs, label, vec, k=k, predict_only_labeled=False, memory_budget_mb=budget),
+        "hardneg": lambda budget: build_pairs_hardneg(bibs, refs, label, vec, memory_budget_mb=budget),
+    }
+    for name, run in runs.items():
+        full, t_full, mb_full = _traced(lambda: run(None))
+        block, t_block, mb_block = _traced(lambda: run(memory_budget_mb))
+        same = full[1] == block[1] if name == "predict" else full.equals(block)
+        report.update({
+            f"{name}_full_s": t_full, f"{name}_full_peak_mb": mb_full,
+            f"{name}_blockwise_s": t_block, f"{name}_blockwise_peak_mb": mb_block,
+            f"{name}_identical": float(same),
+        })
+        print(f"[BENCH] {name}: full={t_full*1000:.0f}ms/{mb_full:.1f}MB "
+              f"blockwise={t_block*1000:.0f}ms/{mb_block:.1f}MB identical={same}")
+    return report
+
+def _synthetic_pair_frames(n_pubs: int, pairs_per_pub: int, seed: int = 0):
+    # pair frames shaped like build_pairs_hardneg output: ~1 positive per 51 pairs
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    for _ in range(n_pubs):
+        y = (rng.random(pairs_per_pub) < 1 / 51).astype(np.int8)
+        X = rng.random((pairs_per_pub, len(FEATURE_COLS)))
+        X[:, 0] = np.clip(0.6 * rng.random(pairs_per_pub) + 0.3 * y, 0, 1)
+        df = pd.DataFrame(X, columns=FEATURE_COLS)
+        df["y"] = y
+        yield df
+
+def benchmark_out_of_core(
+    n_pubs: int = 200,
+    pairs_per_pub: int = 2550,
+    chunk_rows: int = 100_000,
+    chunk_dir: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    In-memory (pd.concat + train_classifier) vs out-of-core (PairChunkWriter +
+    train_classifier_out_of_core): wall time, pairs/sec, tracemalloc peak and AUC.
+    """
+    import tempfile
+
+    import pandas as pd
+    from sklearn.metrics import roc_auc_score
+
+    from model.build_model import train_classifier
+    from model.out_of_core import PairChunkWriter, train_classifier_out_of_core
+
+    n_pairs = n_pubs * pairs_per_pub
+
+    def in_memory():
+        train_df = pd.concat(list(_synthetic_pair_frames(n_pubs, pairs_per_pub)), ignore_index=True)
+        return train_classifier(train_df)
+
+    def out_of_core():
+        writer = PairChunkWriter(chunk_dir or tempfile.mkdtemp(prefix="pairs_"), chunk_rows=chunk_rows)
+        for df in _synthetic_pair_frames(n_pubs, pairs_per_pub):
+            writer.write(df)
+        writer.flush()
+        return train_classifier_out_of_core(writer.paths, writer.class_counts, report_memory=False)[0]
+
+    report = {"pairs": float(n_pairs)}
+    holdout = next(_synthetic_pair_frames(1, 50_000, seed=1))
+    for name, run in (("in_memory", in_memory), ("out_of_core", out_of_core)):
+        clf, seconds, peak_mb = _traced(run)
+        auc = roc_auc_score(holdout["y"], clf.predict_proba(holdout[FEATURE_COLS].values)[:, 1])
+        report.update({f"{name}_s": seconds, f"{name}_pairs_per_sec": n_pairs / seconds,
+                       f"{name}_peak_mb": peak_mb, f"{name}_auc": auc})
+        print(f"[BENCH] {name}: {n_pairs} pairs in {seconds:.2f}s ({n_pairs / seconds:,.0f} pairs/s) "
+              f"peak={peak_mb:.1f}MB holdout AUC={auc:.4f}")
+    return report
+
+if __name__ == "__main__":
+    benchmark_predict_topk()
+    benchmark_blockwise_similarity()
+    benchmark_out_of_core()
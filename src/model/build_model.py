@@ -1,21 +1,28 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics.pairwise import cosine_similarity
 
-from model.feature_engineering import FEATURE_COLS, pair_feature_row
+from model.feature_engineering import FEATURE_COLS, pair_feature_matrix, pair_feature_row
 from model.load_data import BibEntry, RefEntry
+from model.publication_frame import PublicationFrame
+from model.similarity import blockwise_topk, topk_indices
 
-
-
-def train_classifier(train_df: pd.DataFrame) -> LogisticRegression:
-    X = train_df[FEATURE_COLS].values
+def train_classifier(
+    train_df: pd.DataFrame,
+    feature_cols: List[str] = FEATURE_COLS,
+    C: float = 1.0,
+    class_weight: Optional[str] = "balanced",
+) -> LogisticRegression:
+    X = train_df[feature_cols].values
     y = train_df["y"].values
     clf = LogisticRegression(
+        C=C,
         max_iter=3000,
-        class_weight="balanced",
+        class_weight=class_weight,
         solver="lbfgs",
     )
     clf.fit(X, y)
@@ -29,8 +36,17 @@ def predict_topk_for_publication_with_scores(
     vectorizer: TfidfVectorizer,
     k: int = 5,
     predict_only_labeled: bool = True,
+    batched: bool = True,
+    memory_budget_mb: Optional[float] = None,
+    sim_dtype=np.float64,
+    feature_cols: List[str] = FEATURE_COLS,
 ) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, float]]]]:
-    
+    """
+    feature_cols: the columns the classifier was trained on (train_classifier's feature_cols).
+    memory_budget_mb: if set, pairs are scored in bib x ref blocks sized to the budget and
+    only the running top-k per bib is kept, instead of the full #bibs x #refs matrices.
+    The rankings are the same as the full computation.
+    """
     if predict_only_labeled:
         keys = set(label.keys())
         bib_entries = [b for b in bib_entries if b.bibkey in keys]
@@ -41,8 +57,14 @@ def predict_topk_for_publication_with_scores(
     
     X_bib = vectorizer.transform([b.title_norm for b in bib_entries])
     X_ref = vectorizer.transform([r.title_norm for r in ref_entries])
+    if memory_budget_mb is not None:
+        return _predict_topk_blockwise(clf, bib_entries, ref_entries, X_bib, X_ref, k, memory_budget_mb, sim_dtype,
+                                       feature_cols)
     sim = cosine_similarity(X_bib, X_ref)
 
+    if batched:
+        return _predict_topk_batched(clf, bib_entries, ref_entries, sim, k, feature_cols)
+
     topk_ids = {}
     topk_scored = {}
 
@@ -55,7 +77,7 @@ def predict_topk_for_publication_with_scores(
             rows.append(pair_feature_row(b, r, float(sim[i, j]), y=0))
         df_pairs = pd.DataFrame(rows)
 
-        X = df_pairs[FEATURE_COLS].values
+        X = df_pairs[feature_cols].values
         proba = clf.predict_proba(X)[:, 1]
         df_pairs["score"] = proba
 
@@ -65,6 +87,72 @@ def predict_topk_for_publication_with_scores(
 
     return topk_ids, topk_scored
 
+def score_pairs(
+    clf: LogisticRegression,
+    bib_entries: List[BibEntry],
+    ref_entries: List[RefEntry],
+    sim: np.ndarray,
+    feature_cols: List[str] = FEATURE_COLS,
+) -> np.ndarray:
+    # (#bibs x #refs) classifier scores; all pairs go through a single predict_proba call
+    nb, nr = sim.shape
+    X = pair_feature_matrix(bib_entries, ref_entries, sim, feature_cols)
+    return clf.predict_proba(X)[:, 1].reshape(nb, nr)
+
+def _predict_topk_batched(
+    clf: LogisticRegression,
+    bib_entries: List[BibEntry],
+    ref_entries: List[RefEntry],
+    sim: np.ndarray,
+    k: int,
+    feature_cols: List[str] = FEATURE_COLS,
+) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, float]]]]:
+    proba = score_pairs(clf, bib_entries, ref_entries, sim, feature_cols)
+
+    topk_ids = {}
+    topk_scored = {}
+    for i, b in enumerate(bib_entries):
+        top = topk_indices(proba[i], k)
+        ids = [ref_entries[j].arxiv_id for j in top]
+        topk_ids[b.bibkey] = ids
+        topk_scored[b.bibkey] = list(zip(ids, proba[i, top].astype(float).tolist()))
+
+    return topk_ids, topk_scored
+
+def _predict_topk_blockwise(
+    clf: LogisticRegression,
+    bib_entries: List[BibEntry],
+    ref_entries: List[RefEntry],
+    X_bib,
+    X_ref,
+    k: int,
+    memory_budget_mb: float,
+    sim_dtype=np.float64,
+    feature_cols: List[str] = FEATURE_COLS,
+) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, float]]]]:
+    # titles/authors are turned into columns once; every block takes row/column slices of them
+    frame = PublicationFrame.from_entries(bib_entries, ref_entries, {})
+
+    def score_block(sim, r0, r1, c0, c1):
+        X = frame.block_pair_features(sim, feature_cols, r0, r1, c0, c1)
+        return clf.predict_proba(X)[:, 1].reshape(r1 - r0, c1 - c0)
+
+    # per pair: cosine, feature row, proba (+ temporaries of predict_proba)
+    bytes_per_pair = 8 * (len(feature_cols) + 4)
+    top_idx, top_score, _, _ = blockwise_topk(
+        X_bib, X_ref, k, score_block=score_block, memory_budget_mb=memory_budget_mb,
+        dtype=sim_dtype, bytes_per_pair=bytes_per_pair,
+    )
+
+    topk_ids = {}
+    topk_scored = {}
+    for i, b in enumerate(bib_entries):
+        ids = [ref_entries[j].arxiv_id for j in top_idx[i]]
+        topk_ids[b.bibkey] = ids
+        topk_scored[b.bibkey] = list(zip(ids, top_score[i].tolist()))
+
+    return topk_ids, topk_scored
+
 
 def debug_one_bibkey(label: Dict[str, str], pred_ids: Dict[str, List[str]], pred_scored: Dict[str, List[Tuple[str,float]]], bibkey: str):
     gt = label.get(bibkey)
@@ -0,0 +1,144 @@
+import os
+import pickle
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+
+from model.feature_engineering import FEATURE_COLS, pair_feature_matrix
+from model.load_data import BibEntry, RefEntry
+from model.similarity import topk_indices
+
+class CandidateIndex:
+    """
+    Corpus-wide retrieval over normalized titles (e.g. all crawled arXiv records),
+    independent of a publication's own crawled_reference.json.
+
+    The index stores the l2-normalized TF-IDF rows of every record transposed into a
+    (term x record) CSR matrix, i.e. one posting list per term. A batch of bib titles
+    is scored with a sparse dot product that only touches the posting lists of the
+    query terms, then the top-N records per bib entry are kept.
+    """
+
+    def __init__(self, vectorizer, postings: sparse.csr_matrix, entries: List[RefEntry]):
+        self.vectorizer = vectorizer
+        self.postings = postings
+        self.entries = entries
+        self.posting_len = np.diff(postings.indptr)
+
+    @classmethod
+    def build(cls, vectorizer, entries: Iterable[RefEntry], chunk_size: int = 100_000) -> "CandidateIndex":
+        kept: List[RefEntry] = []
+        blocks = []
+        chunk: List[RefEntry] = []
+
+        def flush():
+            if chunk:
+                blocks.append(sparse.csr_matrix(vectorizer.transform([r.title_norm for r in chunk]), dtype=np.float32))
+                kept.extend(chunk)
+                chunk.clear()
+
+        # transform in chunks so the raw titles of the whole corpus are never held twice
+        for r in entries:
+            chunk.append(r)
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+
+        n_terms = vectorizer.transform([""]).shape[1]
+        X = sparse.vstack(blocks, format="csr") if blocks else sparse.csr_matrix((0, n_terms), dtype=np.float32)
+        return cls(vectorizer, X.T.tocsr(), kept)
+
+    def save(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        sparse.save_npz(os.path.join(out_dir, "postings.npz"), self.postings, compressed=False)
+        with open(os.path.join(out_dir, "entries.pkl"), "wb") as f:
+            pickle.dump(self.entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"[INFO] Saved candidate index ({len(self.entries)} records) to: {out_dir}")
+
+    @classmethod
+    def load(cls, index_dir: str, vectorizer) -> "CandidateIndex":
+        postings = sparse.load_npz(os.path.join(index_dir, "postings.npz")).tocsr()
+        with open(os.path.join(index_dir, "entries.pkl"), "rb") as f:
+            entries = pickle.load(f)
+        return cls(vectorizer, postings, entries)
+
+    def search(
+        self,
+        titles: List[str],
+        topn: int = 100,
+        max_postings: Optional[int] = None,
+        batch_size: int = 256,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-N records by TF-IDF cosine for every title: a list of (record indices, scores),
+        best first. Terms whose posting list is longer than max_postings (near stop words)
+        are ignored to bound the work per query; None keeps the exact cosine.
+        """
+        results = []
+        for start in range(0, len(titles), batch_size):
+            Q = sparse.csr_matrix(self.vectorizer.transform(titles[start:start + batch_size]), dtype=np.float32)
+            if max_postings is not None:
+                keep = (self.posting_len <= max_postings).astype(np.float32)
+                Q = sparse.csr_matrix(Q.multiply(keep[None, :]))
+                Q.eliminate_zeros()
+            S = (Q @ self.postings).tocsr()
+            for i in range(S.shape[0]):
+                lo, hi = S.indptr[i], S.indptr[i + 1]
+                cols, vals = S.indices[lo:hi], S.data[lo:hi]
+                top = topk_indices(vals, topn)
+                results.append((cols[top], vals[top].astype(np.float64)))
+        return results
+
+def predict_topk_with_index(
+    clf: LogisticRegression,
+    bib_entries: List[BibEntry],
+    index: CandidateIndex,
+    k: int = 5,
+    topn: int = 100,
+    max_postings: Optional[int] = None,
+) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, float]]]]:
+    """
+    Same output as predict_topk_for_publication_with_scores, but the candidates of each
+    bib entry are the top-N records retrieved from the corpus-wide index; they are then
+    scored with the usual pair features and classifier.
+    """
+    if not bib_entries or not index.entries:
+        return {}, {}
+
+    t0 = time.perf_counter()
+    hits = index.search([b.title_norm for b in bib_entries], topn=topn, max_postings=max_postings)
+    t_search = time.perf_counter() - t0
+
+    # one feature matrix over all retrieved (bib, record) pairs
+    uniq = np.unique(np.concatenate([idx for idx, _ in hits])) if hits else np.empty(0, dtype=np.int64)
+    local = {int(g): j for j, g in enumerate(uniq)}
+    cand_list = [index.entries[int(g)] for g in uniq]
+    rows = np.concatenate([np.full(len(idx), i, dtype=np.int64) for i, (idx, _) in enumerate(hits)])
+    cols = np.array([local[int(g)] for idx, _ in hits for g in idx], dtype=np.int64)
+    sims = np.concatenate([vals for _, vals in hits])
+
+    topk_ids = {}
+    topk_scored = {}
+    if len(rows) == 0:
+        return {b.bibkey: [] for b in bib_entries}, {b.bibkey: [] for b in bib_entries}
+
+    # cosine comes from the float32 index, so it can differ from the per-publication path in the last digits
+    X = pair_feature_matrix(bib_entries, cand_list, sims, FEATURE_COLS, rows=rows, cols=cols)
+    proba = clf.predict_proba(X)[:, 1]
+
+    offset = 0
+    for i, b in enumerate(bib_entries):
+        n = len(hits[i][0])
+        scores = proba[offset:offset + n]
+        top = topk_indices(scores, k)
+        ids = [cand_list[cols[offset + j]].arxiv_id for j in top]
+        topk_ids[b.bibkey] = ids
+        topk_scored[b.bibkey] = list(zip(ids, scores[top].astype(float).tolist()))
+        offset += n
+
+    print(f"[INFO] index retrieval: {len(bib_entries)} queries in {t_search * 1000:.1f}ms "
+          f"({t_search / len(bib_entries) * 1000:.2f}ms/query), {len(rows)} pairs scored")
+    return topk_ids, topk_scored
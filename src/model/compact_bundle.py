@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from model.load_data import BibEntry, RefEntry
+
+# Kept free of sklearn/scipy imports: the scorer only needs numpy, so a worker that
+# loads a compact bundle starts in milliseconds instead of unpickling the vectorizer.
+
+def term_hash(term: str) -> int:
+    # Stable 64-bit id of a vocabulary term (python's hash() is salted per process)
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+def save_compact_bundle(out_dir: str, clf, vectorizer):
+    """
+    Write the LR + TF-IDF bundle as plain arrays:
+      vocab_hash.npy / vocab_col.npy  sorted 64-bit term hashes and their TF-IDF column
+      idf.npy                         idf weights
+      coef.npy                        [coef..., intercept] of the classifier
+      meta.json                       tokenizer settings, feature columns, fingerprint
+    Only the plain word-analyzer settings used by fit_vectorizer_from_train are supported.
+    """
+    from model.feature_engineering import FEATURE_COLS
+    from model.tfidf_cache import vectorizer_fingerprint
+
+    p = vectorizer.get_params()
+    unsupported = {k: p[k] for k in ("preprocessor", "tokenizer", "stop_words", "strip_accents", "vocabulary") if p.get(k)}
+    if p.get("analyzer") != "word" or unsupported:
+        raise ValueError(f"compact bundle supports the plain word analyzer only, got analyzer={p.get('analyzer')} {unsupported}")
+    if not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError("compact bundle needs a vocabulary-based TfidfVectorizer")
+    if len(getattr(clf, "classes_", [])) != 2:
+        raise ValueError("compact bundle supports binary classifiers only")
+
+    terms = list(vectorizer.vocabulary_.keys())
+    hashes = np.fromiter((term_hash(t) for t in terms), dtype=np.uint64, count=len(terms))
+    cols = np.fromiter((vectorizer.vocabulary_[t] for t in terms), dtype=np.int64, count=len(terms))
+    order = np.argsort(hashes, kind="stable")
+    hashes, cols = hashes[order], cols[order]
+    if len(hashes) > 1 and np.any(hashes[1:] == hashes[:-1]):
+        raise ValueError("64-bit term hash collision in the vocabulary")
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "vocab_hash.npy"), hashes)
+    np.save(os.path.join(out_dir, "vocab_col.npy"), cols)
+    idf = vectorizer.idf_ if p.get("use_idf", True) else np.ones(len(terms))
+    np.save(os.path.join(out_dir, "idf.npy"), np.asarray(idf, dtype=np.float64))
+    coef = np.concatenate([np.asarray(clf.coef_, dtype=np.float64).ravel(), np.asarray(clf.intercept_, dtype=np.float64).ravel()])
+    np.save(os.path.join(out_dir, "coef.npy"), coef)
+    meta = {
+        "format": "compact-v1",
+        "feature_cols": FEATURE_COLS,
+        "vectorizer_fingerprint": vectorizer_fingerprint(vectorizer),
+        "ngram_range": list(p["ngram_range"]),
+        "lowercase": bool(p["lowercase"]),
+        "token_pattern": p["token_pattern"],
+        "binary": bool(p["binary"]),
+        "sublinear_tf": bool(p["sublinear_tf"]),
+        "norm": p["norm"],
+        "n_terms": len(terms),
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Saved compact model bundle to: {out_dir}")
+
+def _normalize(w: np.ndarray, norm: Optional[str]) -> np.ndarray:
+    if norm == "l2":
+        n = np.sqrt(np.dot(w, w))
+    elif norm == "l1":
+        n = np.abs(w).sum()
+    else:
+        return w
+    return w / n if n > 0 else w
+
+def _shared_incidence(lists_a: List[Iterable], lists_b: List[Iterable]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Dense 0/1 incidence restricted to items present on both sides (the only ones that
+    # can intersect), plus the number of distinct items of every entry
+    sets_a = [set(x) for x in lists_a]
+    sets_b = [set(x) for x in lists_b]
+    shared = sorted(set().union(*sets_a) & set().union(*sets_b)) if sets_a and sets_b else []
+    pos = {t: i for i, t in enumerate(shared)}
+    A = np.zeros((len(sets_a), len(shared)), dtype=np.float32)
+    B = np.zeros((len(sets_b), len(shared)), dtype=np.float32)
+    for M, sets in ((A, sets_a), (B, sets_b)):
+        for i, s in enumerate(sets):
+            M[i, [pos[t] for t in s if t in pos]] = 1.0
+    na = np.array([len(s) for s in sets_a], dtype=np.float64)
+    nb = np.array([len(s) for s in sets_b], dtype=np.float64)
+    return A, B, na, nb
+
+def grid_pair_features(bib_list: List[BibEntry], ref_list: List[RefEntry], sim: np.ndarray, feature_cols: List[str]) -> np.ndarray:
+    """
+    NumPy-only equivalent of feature_engineering.pair_feature_matrix for the full
+    (#bibs x #refs) grid in row-major order.
+    """
+    nb, nr = len(bib_list), len(ref_list)
+    feats: Dict[str, np.ndarray] = {}
+    need = set(feature_cols)
+
+    if "title_tfidf_cosine" in need:
+        feats["title_tfidf_cosine"] = np.asarray(sim, dtype=np.float64).ravel()
+
+    if need & {"year_abs_diff", "year_match"}:
+        yb = np.array([np.nan if b.year is None else b.year for b in bib_list], dtype=np.float64)
+        yr = np.array([np.nan if r.year is None else r.year for r in ref_list], dtype=np.float64)
+        diff = np.abs(yb[:, None] - yr[None, :]).ravel()
+        missing = np.isnan(diff)
+        feats["year_abs_diff"] = np.where(missing, 10.0, diff)
+        feats["year_match"] = ((diff == 0) & ~missing).astype(np.float64)
+
+    if "author_overlap_ratio" in need:
+        A, B, n_auth, _ = _shared_incidence([b.author_set for b in bib_list], [r.author_set for r in ref_list])
+        inter = (A @ B.T).astype(np.float64)
+        feats["author_overlap_ratio"] = (inter / np.maximum(1.0, n_auth)[:, None]).ravel()
+
+    if "first_author_match" in need:
+        fb = np.array([b.authors_last[0] if b.authors_last else None for b in bib_list], dtype=object)
+        fr = np.array([r.authors_last[0] if r.authors_last else None for r in ref_list], dtype=object)
+        match = (fb[:, None] == fr[None, :]) & (fb != None)[:, None]  # noqa: E711
+        feats["first_author_match"] = match.astype(np.float64).ravel()
+
+    if need & {"title_jaccard", "title_len_diff"}:
+        if "title_jaccard" in need:
+            A, B, nb_tok, nr_tok = _shared_incidence([b.title_token_set for b in bib_list], [r.title_token_set for r in ref_list])
+            inter = (A @ B.T).astype(np.float64)
+            union = nb_tok[:, None] + nr_tok[None, :] - inter
+            jac = np.where(union > 0, inter / np.maximum(union, 1.0), 1.0)
+            one_empty = (nb_tok == 0)[:, None] ^ (nr_tok == 0)[None, :]
+            feats["title_jaccard"] = np.where(one_empty, 0.0, jac).ravel()
+        if "title_len_diff" in need:
+            lb = np.array([b.n_title_tokens for b in bib_list], dtype=np.float64)
+            lr = np.array([r.n_title_tokens for r in ref_list], dtype=np.float64)
+            feats["title_len_diff"] = np.abs(lb[:, None] - lr[None, :]).ravel()
+
+    out = np.empty((nb * nr, len(feature_cols)), dtype=np.float64)
+    for c, name in enumerate(feature_cols):
+        out[:, c] = feats[name]
+    return out
+
+class CompactScorer:
+    """
+    Scores (bib, candidate) pairs from a compact bundle with NumPy only. The arrays are
+    memory-mapped, so processes that load the same bundle share its pages.
+    predict_topk gives the same rankings and scores (up to float rounding in the last
+    digits) as predict_topk_for_publication_with_scores with the sklearn bundle.
+    """
+
+    def __init__(self, bundle_dir: str, mmap: bool = True):
+        mode = "r" if mmap else None
+        self.vocab_hash = np.load(os.path.join(bundle_dir, "vocab_hash.npy"), mmap_mode=mode)
+        self.vocab_col = np.load(os.path.join(bundle_dir, "vocab_col.npy"), mmap_mode=mode)
+        self.idf = np.load(os.path.join(bundle_dir, "idf.npy"), mmap_mode=mode)
+        coef = np.load(os.path.join(bundle_dir, "coef.npy"))
+        self.coef, self.intercept = coef[:-1], float(coef[-1])
+        with open(os.path.join(bundle_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.feature_cols = self.meta["feature_cols"]
+        self.ngram_range = tuple(self.meta["ngram_range"])
+        self.token_re = re.compile(self.meta["token_pattern"])
+
+    def _analyze(self, text: str) -> List[str]:
+        # word n-grams in the order of sklearn's word analyzer
+        if self.meta["lowercase"]:
+            text = text.lower()
+        tokens = self.token_re.findall(text)
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _doc_weights(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        # (TF-IDF columns, weights) of one document, normalized as TfidfVectorizer does
+        terms = self._analyze(text)
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        h = np.fromiter((term_hash(t) for t in terms), dtype=np.uint64, count=len(terms))
+        pos = np.searchsorted(self.vocab_hash, h)
+        pos = np.minimum(pos, len(self.vocab_hash) - 1)
+        found = self.vocab_hash[pos] == h
+        cols, tf = np.unique(self.vocab_col[pos[found]], return_counts=True)
+        tf = tf.astype(np.float64)
+        if self.meta["binary"]:
+            tf[:] = 1.0
+        if self.meta["sublinear_tf"]:
+            tf = np.log(tf) + 1.0
+        return cols, _normalize(tf * self.idf[cols], self.meta["norm"])
+
+    def cosine(self, bib_titles: List[str], ref_titles: List[str]) -> np.ndarray:
+        """(#bibs x #refs) TF-IDF cosine, computed over the terms shared by both sides."""
+        docs_b = [self._doc_weights(t) for t in bib_titles]
+        docs_r = [self._doc_weights(t) for t in ref_titles]
+        cols_b = np.unique(np.concatenate([c for c, _ in docs_b])) if docs_b else np.empty(0, dtype=np.int64)
+        cols_r = np.unique(np.concatenate([c for c, _ in docs_r])) if docs_r else np.empty(0, dtype=np.int64)
+        shared = np.intersect1d(cols_b, cols_r)
+
+        def dense(docs):
+            M = np.zeros((len(docs), len(shared)), dtype=np.float64)
+            for i, (c, w) in enumerate(docs):
+                # cosine_similarity re-normalizes the rows, so do the same here
+                w = _normalize(w, "l2")
+                keep = np.isin(c, shared)
+                M[i, np.searchsorted(shared, c[keep])] = w[keep]
+            return M
+
+        return dense(docs_b) @ dense(docs_r).T
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        z = X @ self.coef + self.intercept
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def predict_topk(
+        self,
+        bib_entries: List[BibEntry],
+        ref_entries: List[RefEntry],
+        k: int = 5,
+    ) -> Tuple[Dict[str, List[str]], Dict[str, List[Tuple[str, float]]]]:
+        if not bib_entries or not ref_entries:
+            return {}, {}
+        sim = self.cosine([b.title_norm for b in bib_entries], [r.title_norm for r in ref_entries])
+        X = grid_pair_features(bib_entries, ref_entries, sim, self.feature_cols)
+        proba = self.predict_proba(X).reshape(len(bib_entries), len(ref_entries))
+
+        topk_ids = {}
+        topk_scored = {}
+        for i, b in enumerate(bib_entries):
+            row = proba[i]
+            # best first, ties keep candidate order (same as similarity.topk_indices)
+            top = np.lexsort((np.arange(len(row)), -row))[:k]
+            ids = [ref_entries[j].arxiv_id for j in top]
+            topk_ids[b.bibkey] = ids
+            topk_scored[b.bibkey] = list(zip(ids, row[top].astype(float).tolist()))
+        return topk_ids, topk_scored
+
+def convert_bundle(model_dir: str, out_dir: str):
+    # model_ckpt (joblib) -> compact bundle
+    from model.helpers import load_model_bundle
+
+    clf, vectorizer = load_model_bundle(model_dir)
+    save_compact_bundle(out_dir, clf, vectorizer)
+
+if __name__ == "__main__":
+    DATA_ROOT = "./clean-data"
+    MODEL_DIR = os.path.join(DATA_ROOT, "model_ckpt_v2")
+    convert_bundle(MODEL_DIR, MODEL_DIR + "_compact")
@@ -0,0 +1,208 @@
+import json
+import os
+import queue
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model.build_model import predict_topk_for_publication_with_scores
+from model.helpers import export_pred_json, export_pred_json_score
+from model.label_filter import clean_and_filter_labels, has_usable_label
+from model.parallel import parallel_imap
+
+EVAL_KS = (1, 3, 5, 10)
+
+def topk_ranks(gt_ids: Sequence[Optional[str]], top_ids: Sequence[Sequence[str]]) -> np.ndarray:
+    # 1-based position of each ground truth in its top-k list (0 = not among the top k)
+    return np.array([ids.index(g) + 1 if g in ids else 0 for g, ids in zip(gt_ids, top_ids)], dtype=np.int64)
+
+def rank_metrics(ranks: np.ndarray, ks: Sequence[int] = EVAL_KS) -> Dict[str, float]:
+    # MRR@k and hit/recall@k of one set of ranks (one labeled gt per bibkey)
+    out = {}
+    found = ranks > 0
+    for k in ks:
+        hit = found & (ranks <= k)
+        out[f"mrr@{k}"] = float(np.where(hit, 1.0 / np.maximum(ranks, 1), 0.0).mean()) if len(ranks) else 0.0
+        out[f"recall@{k}"] = float(hit.mean()) if len(ranks) else 0.0
+    return out
+
+def partition_metrics(per_pub_ranks: List[np.ndarray], ks: Sequence[int] = EVAL_KS) -> Dict[str, float]:
+    """
+    mrr@k      mean over publications of the per-publication MRR@k (as eval_partition)
+    hit_rate@k mean over publications of the share of bibkeys with the gt in the top k
+    recall@k   share of all labeled bibkeys of the partition with the gt in the top k
+    """
+    if not per_pub_ranks:
+        return {f"{m}@{k}": 0.0 for k in ks for m in ("mrr", "hit_rate", "recall")}
+    per_pub = [rank_metrics(r, ks) for r in per_pub_ranks]
+    pooled = rank_metrics(np.concatenate(per_pub_ranks), ks)
+    out = {}
+    for k in ks:
+        out[f"mrr@{k}"] = float(np.mean([m[f"mrr@{k}"] for m in per_pub]))
+        out[f"hit_rate@{k}"] = float(np.mean([m[f"recall@{k}"] for m in per_pub]))
+        out[f"recall@{k}"] = pooled[f"recall@{k}"]
+    return out
+
+class PredictionLogWriter:
+    """Appends prediction records as JSON lines from a background thread."""
+
+    def __init__(self, path: str, max_pending: int = 64):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.q: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_pending)
+        self.f = open(path, "w", encoding="utf-8")
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            rec = self.q.get()
+            if rec is None:
+                break
+            try:
+                self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            except Exception as e:
+                self.error = e
+
+    def write(self, rec: Dict):
+        self.q.put(rec)
+
+    def close(self):
+        self.q.put(None)
+        self.thread.join()
+        self.f.close()
+        if self.error is not None:
+            raise self.error
+
+def _rank_publication(task: Tuple[str, str, str], state: Dict) -> Dict:
+    name, group, pub_id = task
+    base_dir = state["manual_dir"] if group == "manual" else state["nonmanual_dir"]
+    bib_entries, ref_entries, raw_label = state["store"].load(os.path.join(base_dir, pub_id))
+    rec = {"partition": name, "group": group, "pub_id": pub_id}
+    if not has_usable_label(raw_label):
+        rec.update({"skipped": True, "reason": "empty_label"})
+        return rec
+    label, st = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=True)
+    if not label:
+        rec.update({"skipped": True, "reason": "no_valid_labels_after_filtering", "filter_stats": dict(st),
+                    "parsed_bibkeys": len(bib_entries), "candidates": len(ref_entries)})
+        return rec
+
+    # one scoring pass; with memory_budget_mb the pairs are scored blockwise and only the
+    # running top-k of every bib is kept (never the full #bibs x #refs matrices)
+    prediction, scored = predict_topk_for_publication_with_scores(
+        state["clf"], bib_entries, ref_entries, label, state["vectorizer"], k=state["top_k"],
+        predict_only_labeled=True, memory_budget_mb=state.get("memory_budget_mb"),
+        sim_dtype=state.get("sim_dtype", np.float64), feature_cols=state["feature_cols"],
+    )
+    extra = set(prediction) - set(label)
+    miss = set(label) - set(prediction)
+    if extra or miss:
+        print(f"[SANITY] key mismatch pub={pub_id} extra={len(extra)} missing={len(miss)}")
+    bibkeys = [b.bibkey for b in bib_entries if b.bibkey in label]
+    ranks = topk_ranks([label[key] for key in bibkeys], [prediction.get(key, []) for key in bibkeys])
+
+    stats = dict(st)
+    stats.update({"label_kept": len(label), "pred_keys": len(prediction),
+                  "candidates": len(ref_entries), "parsed_bibkeys": len(bib_entries)})
+    rec.update({
+        "skipped": False,
+        "groundtruth": label,
+        "prediction": prediction,
+        "top_with_score": {key: [[a, float(sc)] for a, sc in v] for key, v in scored.items()},
+        "ranks": {key: int(r) for key, r in zip(bibkeys, ranks)},
+        "metrics": rank_metrics(ranks, state["ks"]),
+        "stats": stats,
+        "filter_stats": dict(st),
+        "sanity": {"extra_keys": len(extra), "missing_keys": len(miss)},
+    })
+    return rec
+
+def evaluate_partition(
+    pubs: List[Tuple[str, str]],
+    name: str,
+    state: Dict,
+    writer: PredictionLogWriter,
+    ks: Sequence[int] = EVAL_KS,
+    n_jobs: int = 1,
+) -> Tuple[Dict[str, float], List[Dict]]:
+    """
+    Loads, scores and ranks every publication of a partition once; all metrics for
+    all k come from the gt position in the top max(ks) list of each bibkey, and the
+    predictions are appended to the consolidated prediction log by the background writer.
+    state: clf, vectorizer, store, manual_dir, nonmanual_dir (+ optional feature_cols,
+    memory_budget_mb / sim_dtype for blockwise scoring as in predict_topk_for_publication_with_scores).
+    Returns (partition metrics, per-publication details).
+    """
+    from model.feature_engineering import FEATURE_COLS
+
+    state = dict(state, ks=tuple(ks), top_k=max(ks), feature_cols=state.get("feature_cols", FEATURE_COLS))
+    per_pub_ranks, details = [], []
+    for rec in parallel_imap(_rank_publication, [(name, g, p) for g, p in pubs], n_jobs=n_jobs,
+                             desc=f"Evaluating {name}", state=state):
+        writer.write(rec)
+        detail = {k: v for k, v in rec.items() if k not in ("groundtruth", "prediction", "top_with_score", "ranks")}
+        if not rec["skipped"]:
+            per_pub_ranks.append(np.fromiter(rec["ranks"].values(), dtype=np.int64))
+            detail["mrr@5"] = rec["metrics"]["mrr@5"]
+            detail.update({k: rec["stats"][k] for k in ("label_kept", "pred_keys", "candidates", "parsed_bibkeys")})
+            print(f"[RESULT] pub={rec['pub_id']} partition={name} MRR@5={detail['mrr@5']:.4f} (label_kept={detail['label_kept']})")
+        else:
+            print(f"[WARN] skip {name} pub {rec['pub_id']}: {rec['reason']}")
+        details.append(detail)
+    return partition_metrics(per_pub_ranks, ks), details
+
+def iter_prediction_log(path: str, partitions: Optional[Iterable[str]] = None,
+                        pub_ids: Optional[Iterable[str]] = None):
+    partitions = set(partitions) if partitions is not None else None
+    pub_ids = set(pub_ids) if pub_ids is not None else None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if partitions is not None and rec["partition"] not in partitions:
+                continue
+            if pub_ids is not None and rec["pub_id"] not in pub_ids:
+                continue
+            yield rec
+
+def derive_pred_files(
+    log_path: str,
+    outputs_dir: str,
+    outputs_dir_score: Optional[str] = None,
+    partitions: Optional[Iterable[str]] = None,
+    pub_ids: Optional[Iterable[str]] = None,
+    k: int = 5,
+) -> List[str]:
+    """
+    Write the per-publication <partition>_<pub_id>_pred.json files (and, with
+    outputs_dir_score, the *_pred_with_scores.json files) from the consolidated log.
+    Run on demand, e.g. `python -m model.eval_engine` after a training run; the lists
+    hold at most the top max(ks) of the evaluation.
+    """
+    os.makedirs(outputs_dir, exist_ok=True)
+    if outputs_dir_score:
+        os.makedirs(outputs_dir_score, exist_ok=True)
+    written = []
+    for rec in iter_prediction_log(log_path, partitions, pub_ids):
+        if rec.get("skipped"):
+            continue
+        name, pub_id = rec["partition"], rec["pub_id"]
+        prediction = {key: ids[:k] for key, ids in rec["prediction"].items()}
+        out_path = os.path.join(outputs_dir, f"{name}_{pub_id}_pred.json")
+        export_pred_json(out_path, name, rec["groundtruth"], prediction)
+        written.append(out_path)
+        if outputs_dir_score:
+            scored = {key: [tuple(x) for x in s[:k]] for key, s in rec["top_with_score"].items()}
+            out_path_score = os.path.join(outputs_dir_score, f"{name}_{pub_id}_pred_with_scores.json")
+            export_pred_json_score(out_path_score, name, pub_id, rec["groundtruth"], prediction, scored, rec["stats"])
+            written.append(out_path_score)
+    return written
+
+if __name__ == "__main__":
+    # per-publication pred.json files of a finished main_train_model run
+    OUTPUTS_DIR = "./outputs"
+    written = derive_pred_files(os.path.join(OUTPUTS_DIR, "predictions.jsonl"), os.path.join(OUTPUTS_DIR, "outputs"),
+                                os.path.join(OUTPUTS_DIR, "outputs_with_scores"))
+    print(f"[INFO] exported {len(written)} prediction files from {OUTPUTS_DIR}/predictions.jsonl")
@@ -2,17 +2,21 @@ import os
 import json
 import re
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 from model.load_data import BibEntry, RefEntry, load_publication
 from model.label_filter import clean_and_filter_labels, has_usable_label
-from model.text_norm import jaccard, tokenize
+from model.parallel import parallel_imap, parallel_map
+from model.publication_frame import PublicationFrame
+from model.publication_store import PublicationStore
+from model.similarity import blockwise_topk, topk_indices
+from model.streaming_tfidf import StreamingTfidfVectorizer
+from model.text_norm import jaccard_sets
 
 FEATURE_COLS = [
     "title_tfidf_cosine",
@@ -24,10 +28,42 @@ FEATURE_COLS = [
 #   "title_len_diff",
 ]
 
-def pair_feature_row(b: BibEntry, r: RefEntry, title_tfidf_cosine: float, y: int) -> Dict:
-    b_tokens = tokenize(b.title_norm)
-    r_tokens = tokenize(r.title_norm)
+# Every feature pair_feature_row computes, in the same order
+ALL_FEATURE_COLS = [
+    "title_tfidf_cosine",
+    "title_jaccard",
+    "year_abs_diff",
+    "year_match",
+    "author_overlap_ratio",
+    "first_author_match",
+    "title_len_diff",
+]
+
+# Features that are 0/1 flags (int64 columns in the pair frames, like the row-wise pair_feature_row)
+INT_FEATURE_COLS = {"year_match", "first_author_match"}
+
+def pair_feature_matrix(
+    bib_list: List[BibEntry],
+    ref_list: List[RefEntry],
+    sim: np.ndarray,
+    feature_cols: List[str] = FEATURE_COLS,
+    rows: np.ndarray = None,
+    cols: np.ndarray = None,
+) -> np.ndarray:
+    """
+    Array version of pair_feature_row for many pairs at once.
+    Pairs are (bib_list[rows[p]], ref_list[cols[p]]); without rows/cols the full
+    grid is used in row-major order (pair p = i * len(ref_list) + j).
+    sim is the (#bibs x #refs) cosine matrix, or a 1-D array holding the cosine of
+    each requested pair.
+    Returns a float64 matrix (#pairs, len(feature_cols)) with the same values as
+    pair_feature_row.
+    """
+    frame = PublicationFrame.from_entries(bib_list, ref_list, {})
+    return frame.pair_features(sim, feature_cols, rows=rows, cols=cols)
 
+def pair_feature_row(b: BibEntry, r: RefEntry, title_tfidf_cosine: float, y: int) -> Dict:
+    # token/author sets are precomputed on the entries (see load_data), no text processing here
     if b.year is None or r.year is None:
         year_abs_diff = 10.0
         year_match = 0
@@ -40,16 +76,16 @@ def pair_feature_row(b: BibEntry, r: RefEntry, title_tfidf_cosine: float, y: int
     if not b_auth:
         author_overlap_ratio = 0.0
     else:
-        author_overlap_ratio = len(set(b_auth) & set(r_auth)) / max(1, len(set(b_auth)))
+        author_overlap_ratio = len(b.author_set & r.author_set) / max(1, len(b.author_set))
     first_author_match = 1 if (b_auth and r_auth and b_auth[0] == r_auth[0]) else 0
-    title_len_diff = float(abs(len(b_tokens) - len(r_tokens)))
+    title_len_diff = float(abs(b.n_title_tokens - r.n_title_tokens))
 
     return {
         "bibkey": b.bibkey,
         "arxiv_id": r.arxiv_id,
         "y": int(y),
         "title_tfidf_cosine": float(title_tfidf_cosine),
-        "title_jaccard": float(jaccard(b_tokens, r_tokens)),
+        "title_jaccard": float(jaccard_sets(b.title_token_set, r.title_token_set)),
         "year_abs_diff": float(year_abs_diff),
         "year_match": int(year_match),
         "author_overlap_ratio": float(author_overlap_ratio),
@@ -57,30 +93,53 @@ def pair_feature_row(b: BibEntry, r: RefEntry, title_tfidf_cosine: float, y: int
         "title_len_diff": float(title_len_diff),
     }
 
+def _train_titles_for_pub(task: Tuple[str, str], state: Dict) -> List[str]:
+    group, pub_id = task
+    base_dir = state["manual_dir"] if group == "manual" else state["nonmanual_dir"]
+    pub_dir = os.path.join(base_dir, pub_id)
+    store = state.get("store")
+    bib_entries, ref_entries, raw_label = store.load(pub_dir) if store is not None else load_publication(pub_dir)
+    if not has_usable_label(raw_label):
+        return []
+    label, _ = clean_and_filter_labels(bib_entries, ref_entries, raw_label)
+    if not label:
+        return []
+
+    # only titles from labeled bibkeys + all candidate refs
+    titles = []
+    labeled_keys = set(label.keys())
+    for b in bib_entries:
+        if b.bibkey in labeled_keys:
+            titles.append(b.title_norm)
+    for r in ref_entries:
+        titles.append(r.title_norm)
+    return titles
+
 def fit_vectorizer_from_train(
     train_pubs: List[Tuple[str, str]],
     manual_dir: str,
     nonmanual_dir: str,
-) -> TfidfVectorizer:
-    # Fit TF-IDF once using TRAIN publications only
-    titles = []
-    for group, pub_id in tqdm(train_pubs, desc="Fitting TF-IDF on train titles"):
-        base_dir = manual_dir if group == "manual" else nonmanual_dir
-        pub_dir = os.path.join(base_dir, pub_id)
-        bib_entries, ref_entries, raw_label = load_publication(pub_dir)
-        if not has_usable_label(raw_label):
-            continue
-        label, _ = clean_and_filter_labels(bib_entries, ref_entries, raw_label)
-        if not label:
-            continue
+    store: Optional[PublicationStore] = None,
+    n_jobs: int = 1,
+    streaming: bool = False,
+    n_features: int = 2 ** 20,
+):
+    """
+    Fit TF-IDF once using TRAIN publications only.
+    streaming=True fits a hashed StreamingTfidfVectorizer one publication at a time,
+    so memory stays fixed instead of holding every train title before the fit.
+    """
+    state = {"manual_dir": manual_dir, "nonmanual_dir": nonmanual_dir, "store": store}
+    if streaming:
+        vec = StreamingTfidfVectorizer(n_features=n_features, ngram_range=(1, 2))
+        for pub_titles in parallel_imap(_train_titles_for_pub, train_pubs, n_jobs=n_jobs,
+                                        desc="Fitting hashed TF-IDF on train titles", state=state):
+            vec.partial_fit(pub_titles)
+        return vec.finalize()
 
-        # only titles from labeled bibkeys + all candidate refs
-        labeled_keys = set(label.keys())
-        for b in bib_entries:
-            if b.bibkey in labeled_keys:
-                titles.append(b.title_norm)
-        for r in ref_entries:
-            titles.append(r.title_norm)
+    per_pub = parallel_map(_train_titles_for_pub, train_pubs, n_jobs=n_jobs,
+                           desc="Fitting TF-IDF on train titles", state=state)
+    titles = [t for pub_titles in per_pub for t in pub_titles]
 
     vec = TfidfVectorizer(ngram_range=(1, 2), min_df=1)
     vec.fit(titles if titles else ["dummy"])
@@ -93,18 +152,22 @@ def build_pairs_hardneg(
     vectorizer: TfidfVectorizer,
     topn_neg: int = 50,
     ensure_pos_in_candidates: bool = True,
+    memory_budget_mb: Optional[float] = None,
+    sim_dtype=np.float64,
 ) -> pd.DataFrame:
     """
     For each labeled bibkey:
       - include (bib, gt) as positive
       - include topN hard negatives by TFIDF cosine (excluding gt)
+    With memory_budget_mb set, the cosine matrix is computed in blocks (see
+    model.similarity.blockwise_topk) and only the top candidates per bib are kept.
     """
     # filter bibs to labeled only
     bib_map = {b.bibkey: b for b in bib_entries}
-    ref_map = {r.arxiv_id: r for r in ref_entries}
-    cand_ids = [r.arxiv_id for r in ref_entries]
-
-    rows = []
+    cand_pos: Dict[str, int] = {}
+    for j, r in enumerate(ref_entries):
+        cand_pos.setdefault(r.arxiv_id, j)
+    cand_ids = np.array([r.arxiv_id for r in ref_entries], dtype=object)
 
     # precompute TF-IDF matrices
     bib_list = [bib_map[k] for k in label.keys() if k in bib_map]
@@ -113,33 +176,108 @@ def build_pairs_hardneg(
 
     X_bib = vectorizer.transform([b.title_norm for b in bib_list])
     X_ref = vectorizer.transform([r.title_norm for r in ref_entries])
-    sim = cosine_similarity(X_bib, X_ref)  # (#bibs, #refs)
+    gt_col = np.array([cand_pos.get(label.get(b.bibkey), -1) for b in bib_list], dtype=np.int64)
+    gt_sim = np.zeros(len(bib_list), dtype=np.float64)
+    if memory_budget_mb is None:
+        sim = cosine_similarity(X_bib, X_ref)  # (#bibs, #refs)
+        tops = [topk_indices(sim[i], topn_neg + 1) for i in range(len(bib_list))]
+        top_sims = [sim[i, top] for i, top in enumerate(tops)]
+        has_gt = np.flatnonzero(gt_col >= 0)
+        gt_sim[has_gt] = sim[has_gt, gt_col[has_gt]]
+        del sim
+    else:
+        # cosine of each (bib, gt) pair is picked up from the block that contains it
+        def keep_gt_sim(block, r0, r1, c0, c1):
+            local = np.flatnonzero((gt_col[r0:r1] >= c0) & (gt_col[r0:r1] < c1))
+            gt_sim[r0 + local] = block[local, gt_col[r0 + local] - c0]
+            return block
 
+        # per pair: sparse cosine product (value + int32 index) and its dense copy, argpartition indices (int64)
+        bytes_per_pair = 2 * np.dtype(sim_dtype).itemsize + 4 + 8
+        tops, _, top_sims, _ = blockwise_topk(X_bib, X_ref, topn_neg + 1, score_block=keep_gt_sim,
+                                              memory_budget_mb=memory_budget_mb, dtype=sim_dtype,
+                                              bytes_per_pair=bytes_per_pair)
+
+    # pick (bib, candidate) pairs: positive first, then the topN negatives by cosine
+    row_parts, col_parts, y_parts, sim_parts = [], [], [], []
     for i, b in enumerate(bib_list):
         gt = label.get(b.bibkey)
 
-        if ensure_pos_in_candidates and (gt not in ref_map):
+        if ensure_pos_in_candidates and (gt not in cand_pos):
             # should not happen if label already filtered
             continue
 
-        # rank candidates by cosine
-        order = np.argsort(-sim[i])  # descending
-
         # positive
-        if gt in ref_map:
-            # find cosine for gt
-            j_gt = cand_ids.index(gt)
-            rows.append(pair_feature_row(b, ref_map[gt], float(sim[i, j_gt]), y=1))
-
-        # negatives: topN excluding gt
-        neg_added = 0
-        for j in order:
-            arxiv_id = cand_ids[j]
-            if arxiv_id == gt:
-                continue
-            rows.append(pair_feature_row(b, ref_map[arxiv_id], float(sim[i, j]), y=0))
-            neg_added += 1
-            if neg_added >= topn_neg:
-                break
-
-    return pd.DataFrame(rows)
\ No newline at end of file
+        if gt in cand_pos:
+            j = cand_pos[gt]
+            row_parts.append(np.array([i], dtype=np.int64))
+            col_parts.append(np.array([j], dtype=np.int64))
+            y_parts.append(np.ones(1, dtype=np.int64))
+            sim_parts.append(gt_sim[i:i + 1])
+
+        # negatives: topN excluding gt (one extra in case gt is among the top)
+        is_neg = cand_ids[tops[i]] != gt
+        neg = tops[i][is_neg][:topn_neg]
+        row_parts.append(np.full(len(neg), i, dtype=np.int64))
+        col_parts.append(neg.astype(np.int64))
+        y_parts.append(np.zeros(len(neg), dtype=np.int64))
+        sim_parts.append(np.asarray(top_sims[i][is_neg][:topn_neg], dtype=np.float64))
+
+    rows = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int64)
+    if not len(rows):
+        return pd.DataFrame(columns=["bibkey", "arxiv_id", "y"] + FEATURE_COLS)
+
+    cols = np.concatenate(col_parts)
+    ys = np.concatenate(y_parts)
+    sims = np.concatenate(sim_parts)
+    # only the chosen pairs are needed from here on
+    del row_parts, col_parts, y_parts, sim_parts, tops, top_sims
+    feats = pair_feature_matrix(bib_list, ref_entries, sims, ALL_FEATURE_COLS, rows=rows, cols=cols)
+
+    bibkeys = np.array([b.bibkey for b in bib_list], dtype=object)
+    data = {
+        "bibkey": bibkeys[rows],
+        "arxiv_id": cand_ids[cols],
+        "y": ys,
+    }
+    for c, name in enumerate(ALL_FEATURE_COLS):
+        col = feats[:, c]
+        data[name] = col.astype(np.int64) if name in INT_FEATURE_COLS else col
+    return pd.DataFrame(data)
+
+def train_pairs_for_pub(task: Tuple[str, str], state: Dict) -> Optional[pd.DataFrame]:
+    """
+    parallel_map worker: hard-negative training pairs of one (group, pub_id), tagged with
+    pub_id/group/partition. state: store, vectorizer, topn_neg, manual_dir, nonmanual_dir
+    (+ optional memory_budget_mb, and pair_store to reuse/persist pairs across runs).
+    """
+    group, pub_id = task
+    base_dir = state["manual_dir"] if group == "manual" else state["nonmanual_dir"]
+    pub_dir = os.path.join(base_dir, pub_id)
+
+    # pairs persisted by an earlier run with the same vectorizer/topn_neg/features
+    pair_store = state.get("pair_store")
+    if pair_store is not None:
+        sig = state["store"].signature(pub_dir)
+        df = pair_store.get(group, pub_id, sig)
+        if df is not None:
+            return df
+
+    bib_entries, ref_entries, raw_label = state["store"].load(pub_dir)
+    if not has_usable_label(raw_label):
+        return None
+    label, st = clean_and_filter_labels(bib_entries, ref_entries, raw_label, verbose=False)
+    if not label:
+        print(f"[WARN] skip train pub {pub_id}: no valid labels after filtering. stats={st}")
+        return None
+
+    df = build_pairs_hardneg(bib_entries, ref_entries, label, state["vectorizer"], topn_neg=state["topn_neg"],
+                             memory_budget_mb=state.get("memory_budget_mb"))
+    if len(df) == 0:
+        return None
+    df["pub_id"] = pub_id
+    df["group"] = group
+    df["partition"] = "train"
+    if pair_store is not None:
+        df = pair_store.put(group, pub_id, df, sig)
+    return df
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from model.feature_engineering import FEATURE_COLS
+
+ID_COLS = ["bibkey", "arxiv_id"]
+
+def feature_store_key(vectorizer_fp: str, topn_neg: int, feature_cols: List[str]) -> str:
+    payload = {"vectorizer": vectorizer_fp, "topn_neg": int(topn_neg), "feature_cols": list(feature_cols)}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def to_compact_frame(df: pd.DataFrame, feature_cols: List[str] = FEATURE_COLS) -> pd.DataFrame:
+    """Pair frame with categorical id columns, int8 labels and float32 features."""
+    out = {col: pd.Categorical(df[col]) for col in ID_COLS + ["pub_id", "group", "partition"] if col in df}
+    out["y"] = df["y"].to_numpy(dtype=np.int8)
+    for col in feature_cols:
+        out[col] = df[col].to_numpy(dtype=np.float32)
+    return pd.DataFrame(out)
+
+def concat_pair_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    # pd.concat turns categoricals with different categories into object; union them instead
+    cat_cols = [c for c in frames[0].columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]
+    out = {}
+    for col in frames[0].columns:
+        if col in cat_cols:
+            out[col] = union_categoricals([f[col] for f in frames])
+        else:
+            out[col] = np.concatenate([f[col].to_numpy() for f in frames])
+    return pd.DataFrame(out)
+
+class PairFeatureStore:
+    """
+    Training pairs of each publication, persisted as one columnar .npz shard per
+    publication under <root>/<key>/<group>/<pub_id>.npz, where key = vectorizer
+    fingerprint + topn_neg + feature columns. Ids are stored as categorical codes,
+    features as float32. A shard is reused only while the publication's source files
+    keep the signature it was built from, so re-training (e.g. with other classifier
+    settings) skips build_pairs_hardneg entirely.
+    """
+
+    def __init__(self, root: str, vectorizer_fp: str, topn_neg: int, feature_cols: List[str] = FEATURE_COLS):
+        self.feature_cols = list(feature_cols)
+        self.key = feature_store_key(vectorizer_fp, topn_neg, self.feature_cols)
+        self.dir = os.path.join(root, self.key)
+        os.makedirs(self.dir, exist_ok=True)
+        manifest = os.path.join(self.dir, "manifest.json")
+        if not os.path.exists(manifest):
+            with open(manifest, "w", encoding="utf-8") as f:
+                json.dump({"vectorizer_fingerprint": vectorizer_fp, "topn_neg": int(topn_neg),
+                           "feature_cols": self.feature_cols}, f, indent=2)
+
+    def _path(self, group: str, pub_id: str) -> str:
+        return os.path.join(self.dir, group, f"{pub_id}.npz")
+
+    def get(self, group: str, pub_id: str, signature) -> Optional[pd.DataFrame]:
+        path = self._path(group, pub_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if str(z["signature"]) != json.dumps(signature):
+                    return None
+                data = {}
+                for col in ID_COLS:
+                    data[col] = pd.Categorical.from_codes(z[f"{col}_codes"], categories=z[f"{col}_categories"])
+                n = len(z["y"])
+                for col, value in (("pub_id", pub_id), ("group", group), ("partition", "train")):
+                    data[col] = pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[value])
+                data["y"] = z["y"]
+                for col in self.feature_cols:
+                    data[col] = z[f"f:{col}"]
+        except Exception as e:
+            print(f"[WARN] ignoring unreadable feature shard {path}: {e}")
+            return None
+        return pd.DataFrame(data)
+
+    def put(self, group: str, pub_id: str, df: pd.DataFrame, signature) -> pd.DataFrame:
+        """Persist the pairs of one publication; returns them in the compact form get() returns."""
+        df = to_compact_frame(df, self.feature_cols)
+        arrays: Dict[str, np.ndarray] = {"signature": np.array(json.dumps(signature)), "y": df["y"].to_numpy()}
+        for col in ID_COLS:
+            cat = df[col].cat
+            arrays[f"{col}_codes"] = cat.codes.to_numpy()
+            arrays[f"{col}_categories"] = np.asarray(cat.categories, dtype=str)
+        for col in self.feature_cols:
+            arrays[f"f:{col}"] = df[col].to_numpy()
+
+        path = self._path(group, pub_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+        return self.get(group, pub_id, signature)
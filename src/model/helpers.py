@@ -4,10 +4,12 @@ import time
 from typing import Dict, List, Tuple, Optional
 
 import joblib
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 
 from model.feature_engineering import FEATURE_COLS
+from model.tfidf_cache import vectorizer_fingerprint
 
 def list_publications(root_dir: str) -> List[str]:
     pubs = []
@@ -38,12 +40,35 @@ def pick_splits(manual_usable: List[str], nonmanual_usable: List[str]) -> Tuple[
 
     return train_pubs, valid_pubs, test_pubs
 
+def make_folds(manual_usable: List[str], nonmanual_usable: List[str], k: int = 5,
+               seed: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+    """
+    Partition all usable publications into k disjoint folds. Manual and non-manual pubs are
+    dealt round-robin (manual first), so every fold gets a share of both groups. seed=None
+    keeps the sorted order; otherwise each group is shuffled with that seed first.
+    """
+    pubs = [("manual", p) for p in manual_usable] + [("non-manual", p) for p in nonmanual_usable]
+    if k < 2:
+        raise ValueError(f"Need k >= 2 folds, got {k}.")
+    if len(pubs) < k:
+        raise ValueError(f"Need >= {k} pubs with label.json non-empty for {k} folds, got {len(pubs)}.")
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        manual = [manual_usable[i] for i in rng.permutation(len(manual_usable))]
+        nonmanual = [nonmanual_usable[i] for i in rng.permutation(len(nonmanual_usable))]
+        pubs = [("manual", p) for p in manual] + [("non-manual", p) for p in nonmanual]
+    folds: List[List[Tuple[str, str]]] = [[] for _ in range(k)]
+    for i, pub in enumerate(pubs):
+        folds[i % k].append(pub)
+    return folds
+
 def save_model_bundle(out_dir: str, clf: LogisticRegression, vectorizer: TfidfVectorizer):
     os.makedirs(out_dir, exist_ok=True)
     joblib.dump(clf, os.path.join(out_dir, "lr_model.joblib"))
     joblib.dump(vectorizer, os.path.join(out_dir, "tfidf_vectorizer.joblib"))
     meta = {
         "feature_cols": FEATURE_COLS,
+        "vectorizer_fingerprint": vectorizer_fingerprint(vectorizer),
         "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
         "note": "TFIDF is fitted on TRAIN and reused for eval/inference. Pairs use hard negatives.",
     }
@@ -51,6 +76,11 @@ def save_model_bundle(out_dir: str, clf: LogisticRegression, vectorizer: TfidfVe
         json.dump(meta, f, ensure_ascii=False, indent=2)
     print(f"[INFO] Saved model bundle to: {out_dir}")
 
+def load_model_bundle(model_dir: str) -> Tuple[LogisticRegression, TfidfVectorizer]:
+    clf = joblib.load(os.path.join(model_dir, "lr_model.joblib"))
+    vectorizer = joblib.load(os.path.join(model_dir, "tfidf_vectorizer.joblib"))
+    return clf, vectorizer
+
 def export_pred_json_score(out_path: str, partition: str, pub_id: str,
                      groundtruth: Dict[str, str],
                      prediction: Dict[str, List[str]],
@@ -115,6 +145,7 @@ def export_summary_results_json(
     train_positives: int,
     topn_neg: int,
     out_filename: str = "summary_results.json",
+    metrics_at_k: Optional[Dict[str, Dict[str, float]]] = None,
 ) -> str:
 
     os.makedirs(outputs_dir, exist_ok=True)
@@ -134,6 +165,9 @@ def export_summary_results_json(
             "test_mrr@5": float(test_mrr),
         },
 
+        # {partition: {"mrr@k" / "recall@k" / "hit_rate@k": value}} from model.eval_engine
+        "metrics_at_k": metrics_at_k or {},
+
         "per_publication": {
             "train": train_details,
             "valid": valid_details,
@@ -1,15 +1,15 @@
 import os
 import json
-import joblib
 from model.label_filter import clean_and_filter_labels
 from model.load_data import load_publication
 from model.build_model import predict_topk_for_publication_with_scores
+from model.helpers import load_model_bundle
 
 DATA_ROOT = "./clean-data"
 MODEL_DIR = os.path.join(DATA_ROOT, "model_ckpt_v2")
 
-clf = joblib.load(os.path.join(MODEL_DIR, "lr_model.joblib"))
-vec = joblib.load(os.path.join(MODEL_DIR, "tfidf_vectorizer.joblib"))
+# for many requests, run model/inference_server.py instead: it loads the bundle once
+clf, vec = load_model_bundle(MODEL_DIR)
 
 PUB_ID = "2212-11481"
 pub_dir = os.path.join(DATA_ROOT, "manual", PUB_ID)
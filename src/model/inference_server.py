@@ -0,0 +1,278 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from model.feature_engineering import FEATURE_COLS, pair_feature_matrix
+from model.helpers import load_model_bundle
+from model.load_data import BibEntry, RefEntry, bib_entries_from_dict, ref_entries_from_dict
+from model.similarity import topk_indices
+
+class LatencyTracker:
+    """Latencies (ms) of the last `window` requests, with p50/p99 over that window."""
+
+    def __init__(self, window: int = 10_000):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+
+    def record(self, latency_ms: float, ok: bool = True):
+        with self.lock:
+            self.samples.append(latency_ms)
+            self.requests += 1
+            self.errors += 0 if ok else 1
+
+    def record_batch(self, size: int):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            lat = np.asarray(self.samples, dtype=np.float64)
+            stats = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            }
+        for q in (50, 90, 99):
+            stats[f"p{q}_ms"] = float(np.percentile(lat, q)) if len(lat) else 0.0
+        stats["mean_ms"] = float(lat.mean()) if len(lat) else 0.0
+        return stats
+
+class _Pending:
+    # One request waiting in the batch queue
+    __slots__ = ("bibs", "refs", "k", "done", "result", "error")
+
+    def __init__(self, bibs: List[BibEntry], refs: List[RefEntry], k: int):
+        self.bibs, self.refs, self.k = bibs, refs, k
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class InferenceService:
+    """
+    Keeps the model_ckpt bundle (LR + TF-IDF) in memory and answers reference-matching
+    requests. Requests are queued; each worker thread takes up to max_batch of them
+    (waiting at most max_wait_ms for the batch to fill) and scores all their
+    (bib, candidate) pairs with one TF-IDF transform and one predict_proba call.
+    Results are the same as predict_topk_for_publication_with_scores.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        k: int = 5,
+        max_batch: int = 16,
+        max_wait_ms: float = 5.0,
+        n_workers: int = 2,
+    ):
+        t0 = time.perf_counter()
+        self.clf, self.vectorizer = load_model_bundle(model_dir)
+        self.load_seconds = time.perf_counter() - t0
+        self.model_dir = model_dir
+        self.k = k
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.latency = LatencyTracker()
+        self.requests: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self.workers = [
+            threading.Thread(target=self._worker, name=f"infer-{i}", daemon=True)
+            for i in range(max(1, n_workers))
+        ]
+        for w in self.workers:
+            w.start()
+        print(f"[INFO] loaded model bundle {model_dir} in {self.load_seconds:.2f}s "
+              f"({len(self.workers)} workers, max_batch={self.max_batch})")
+
+    def predict(self, bibs: List[BibEntry], refs: List[RefEntry], k: Optional[int] = None):
+        """Blocking call used by the HTTP handlers: (top-k ids, top-k (id, score)) per bibkey."""
+        t0 = time.perf_counter()
+        item = _Pending(bibs, refs, k or self.k)
+        self.requests.put(item)
+        item.done.wait()
+        self.latency.record((time.perf_counter() - t0) * 1000, ok=item.error is None)
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def close(self):
+        for _ in self.workers:
+            self.requests.put(None)
+        for w in self.workers:
+            w.join()
+
+    def _next_batch(self) -> Optional[List[_Pending]]:
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # keep the stop signal for this worker's next round
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.latency.record_batch(len(batch))
+            try:
+                results = self._score_batch(batch)
+                for item, res in zip(batch, results):
+                    item.result = res
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            for item in batch:
+                item.done.set()
+
+    def _score_batch(self, batch: List[_Pending]) -> List[Tuple[Dict, Dict]]:
+        bibs = [b for item in batch for b in item.bibs]
+        refs = [r for item in batch for r in item.refs]
+        if not bibs or not refs:
+            return [({}, {}) for _ in batch]
+        X_bib = self.vectorizer.transform([b.title_norm for b in bibs])
+        X_ref = self.vectorizer.transform([r.title_norm for r in refs])
+
+        # every request is the full grid of its own bibs x its own candidates
+        rows, cols, sims, spans = [], [], [], []
+        b0 = r0 = p0 = 0
+        for item in batch:
+            nb, nr = len(item.bibs), len(item.refs)
+            if nb and nr:
+                sim = cosine_similarity(X_bib[b0:b0 + nb], X_ref[r0:r0 + nr])
+                rows.append(np.repeat(np.arange(b0, b0 + nb), nr))
+                cols.append(np.tile(np.arange(r0, r0 + nr), nb))
+                sims.append(sim.ravel())
+            spans.append((p0, nb, nr))
+            b0, r0, p0 = b0 + nb, r0 + nr, p0 + (nb * nr if nb and nr else 0)
+
+        if not sims:
+            return [({}, {}) for _ in batch]
+        X = pair_feature_matrix(bibs, refs, np.concatenate(sims), FEATURE_COLS,
+                                rows=np.concatenate(rows), cols=np.concatenate(cols))
+        proba = self.clf.predict_proba(X)[:, 1]
+
+        results = []
+        for item, (p0, nb, nr) in zip(batch, spans):
+            if not nb or not nr:
+                results.append(({}, {}))
+                continue
+            scores = proba[p0:p0 + nb * nr].reshape(nb, nr)
+            topk_ids, topk_scored = {}, {}
+            for i, b in enumerate(item.bibs):
+                top = topk_indices(scores[i], item.k)
+                ids = [item.refs[j].arxiv_id for j in top]
+                topk_ids[b.bibkey] = ids
+                topk_scored[b.bibkey] = list(zip(ids, scores[i, top].astype(float).tolist()))
+            results.append((topk_ids, topk_scored))
+        return results
+
+class _Handler(BaseHTTPRequestHandler):
+    service: InferenceService = None
+
+    def _send_json(self, status: int, obj: dict):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "model_dir": self.service.model_dir})
+        elif self.path == "/stats":
+            self._send_json(200, self.service.latency.snapshot())
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        """
+        POST /predict with
+          {"bib_entries": {bibkey: {title, authors, year}},
+           "candidates": {arxiv_id: {title, authors, year}}, "k": 5}
+        (the layouts of parsed_reference.json / crawled_reference.json), answers
+          {"pred": {bibkey: [arxiv_id, ...]}, "scores": {bibkey: [[arxiv_id, score], ...]}}
+        """
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            bibs = bib_entries_from_dict(payload.get("bib_entries") or {})
+            refs = ref_entries_from_dict(payload.get("candidates") or {})
+            k = int(payload["k"]) if payload.get("k") else None
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+            return
+        try:
+            pred_ids, pred_scored = self.service.predict(bibs, refs, k)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"pred": pred_ids, "scores": pred_scored})
+
+    def address_string(self):
+        # unix sockets have no (host, port) client address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+def make_server(service: InferenceService, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Optional[str] = None):
+    handler = type("InferenceHandler", (_Handler,), {"service": service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return UnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(model_dir: str, host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None,
+          k: int = 5, max_batch: int = 16, max_wait_ms: float = 5.0, n_workers: int = 2):
+    service = InferenceService(model_dir, k=k, max_batch=max_batch, max_wait_ms=max_wait_ms, n_workers=n_workers)
+    server = make_server(service, host, port, unix_socket)
+    where = unix_socket or f"http://{host}:{port}"
+    print(f"[INFO] serving POST /predict, GET /stats on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print(f"[INFO] latency: {service.latency.snapshot()}")
+
+if __name__ == "__main__":
+    DATA_ROOT = "./clean-data"
+    MODEL_DIR = os.path.join(DATA_ROOT, "model_ckpt_v2")
+    UNIX_SOCKET = None  # e.g. "/tmp/refmatch.sock" to listen on a unix socket instead of TCP
+    serve(MODEL_DIR, host="127.0.0.1", port=8765, unix_socket=UNIX_SOCKET, max_batch=16, n_workers=2)
@@ -1,7 +1,9 @@
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from model.load_data import BibEntry, RefEntry, load_publication
+from model.parallel import parallel_map
+from model.publication_store import PublicationStore
 
 def has_usable_label(label: Dict[str, str]) -> bool:
     return isinstance(label, dict) and len(label) > 0
@@ -49,13 +51,20 @@ def clean_and_filter_labels(
 
     return filtered, stats
 
-def filter_pubs_with_nonempty_label(base_dir: str, pubs: List[str], group_name: str) -> List[str]:
+def _pub_has_usable_label(pub_dir: str, state: Dict) -> bool:
+    store = state.get("store")
+    _, _, raw_label = store.load(pub_dir) if store is not None else load_publication(pub_dir)
+    return has_usable_label(raw_label)
+
+def filter_pubs_with_nonempty_label(base_dir: str, pubs: List[str], group_name: str, store: Optional[PublicationStore] = None, n_jobs: int = 1) -> List[str]:
+    pub_dirs = [os.path.join(base_dir, pub_id) for pub_id in pubs]
+    flags = parallel_map(_pub_has_usable_label, pub_dirs, n_jobs=n_jobs,
+                         desc=f"Checking {group_name} labels", state={"store": store})
+
     usable = []
     skipped = []
-    for pub_id in pubs:
-        pub_dir = os.path.join(base_dir, pub_id)
-        _, _, raw_label = load_publication(pub_dir)
-        if has_usable_label(raw_label):
+    for pub_id, ok in zip(pubs, flags):
+        if ok:
             usable.append(pub_id)
         else:
             skipped.append(pub_id)
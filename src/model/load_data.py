@@ -1,11 +1,18 @@
 import json
 import os
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 from model.author_norm import normalize_author_list
 from model.text_norm import normalize_text, safe_int
 
+def _set_text_features(entry):
+    # title_norm is already normalized, so splitting it gives tokenize(title_norm)
+    entry.title_tokens = entry.title_norm.split()
+    entry.title_token_set = frozenset(entry.title_tokens)
+    entry.n_title_tokens = len(entry.title_tokens)
+    entry.author_set = frozenset(entry.authors_last)
+
 @dataclass
 class BibEntry:
     bibkey: str
@@ -13,6 +20,20 @@ class BibEntry:
     title_norm: str
     authors_last: List[str]
     year: Optional[int]
+    # derived once from title_norm/authors_last, so pair features need no text processing
+    title_tokens: List[str] = field(init=False, repr=False, compare=False)
+    title_token_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    n_title_tokens: int = field(init=False, repr=False, compare=False)
+    author_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        _set_text_features(self)
+
+    def __setstate__(self, state):
+        # entries pickled before the derived fields existed get them on load
+        self.__dict__.update(state)
+        if "n_title_tokens" not in state:
+            _set_text_features(self)
 
 @dataclass
 class RefEntry:
@@ -21,20 +42,27 @@ class RefEntry:
     title_norm: str
     authors_last: List[str]
     year: Optional[int]
+    # derived once from title_norm/authors_last, so pair features need no text processing
+    title_tokens: List[str] = field(init=False, repr=False, compare=False)
+    title_token_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+    n_title_tokens: int = field(init=False, repr=False, compare=False)
+    author_set: FrozenSet[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        _set_text_features(self)
+
+    def __setstate__(self, state):
+        # entries pickled before the derived fields existed get them on load
+        self.__dict__.update(state)
+        if "n_title_tokens" not in state:
+            _set_text_features(self)
 
 def load_json(path: str) -> dict:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_publication(pub_dir: str) -> Tuple[List[BibEntry], List[RefEntry], Dict[str, str]]:
-    parsed_path = os.path.join(pub_dir, "parsed_reference.json")
-    crawled_path = os.path.join(pub_dir, "crawled_reference.json")
-    label_path = os.path.join(pub_dir, "label.json")
-
-    parsed = load_json(parsed_path)
-    crawled = load_json(crawled_path)
-    label = load_json(label_path) if os.path.exists(label_path) else {}
-
+def bib_entries_from_dict(parsed: dict) -> List[BibEntry]:
+    # parsed_reference.json layout: {bibkey: {"title", "authors", "year"}}
     bib_entries: List[BibEntry] = []
     for bibkey, obj in parsed.items():
         title = obj.get("title", "") if isinstance(obj, dict) else ""
@@ -49,7 +77,10 @@ def load_publication(pub_dir: str) -> Tuple[List[BibEntry], List[RefEntry], Dict
                 year=year,
             )
         )
+    return bib_entries
 
+def ref_entries_from_dict(crawled: dict) -> List[RefEntry]:
+    # crawled_reference.json layout: {arxiv_id: {"title", "authors", "year"}}
     ref_entries: List[RefEntry] = []
     for arxiv_id, obj in crawled.items():
         title = obj.get("title", "") if isinstance(obj, dict) else ""
@@ -64,5 +95,15 @@ def load_publication(pub_dir: str) -> Tuple[List[BibEntry], List[RefEntry], Dict
                 year=year,
             )
         )
+    return ref_entries
+
+def load_publication(pub_dir: str) -> Tuple[List[BibEntry], List[RefEntry], Dict[str, str]]:
+    parsed_path = os.path.join(pub_dir, "parsed_reference.json")
+    crawled_path = os.path.join(pub_dir, "crawled_reference.json")
+    label_path = os.path.join(pub_dir, "label.json")
+
+    parsed = load_json(parsed_path)
+    crawled = load_json(crawled_path)
+    label = load_json(label_path) if os.path.exists(label_path) else {}
 
-    return bib_entries, ref_entries, label
\ No newline at end of file
+    return bib_entries_from_dict(parsed), ref_entries_from_dict(crawled), label
@@ -0,0 +1,139 @@
+import glob
+import os
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+
+from model.feature_engineering import FEATURE_COLS
+
+class PairChunkWriter:
+    """
+    Spills training pairs to disk as .npz chunks of about chunk_rows pairs
+    (X = FEATURE_COLS as float64, y as int8), so the full train_df never has to be
+    held in memory. Keeps the global class counts needed for balanced weights.
+    """
+
+    def __init__(self, chunk_dir: str, chunk_rows: int = 200_000, feature_cols: List[str] = FEATURE_COLS):
+        os.makedirs(chunk_dir, exist_ok=True)
+        for old in glob.glob(os.path.join(chunk_dir, "chunk_*.npz")):
+            os.remove(old)
+        self.chunk_dir = chunk_dir
+        self.chunk_rows = chunk_rows
+        self.feature_cols = list(feature_cols)
+        self.paths: List[str] = []
+        self.class_counts = np.zeros(2, dtype=np.int64)
+        self._X: List[np.ndarray] = []
+        self._y: List[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def n_pairs(self) -> int:
+        return int(self.class_counts.sum())
+
+    @property
+    def n_pos(self) -> int:
+        return int(self.class_counts[1])
+
+    def write(self, df: pd.DataFrame):
+        y = df["y"].to_numpy(dtype=np.int8)
+        self._X.append(df[self.feature_cols].to_numpy(dtype=np.float64))
+        self._y.append(y)
+        self._buffered += len(y)
+        self.class_counts += np.bincount(y, minlength=2)[:2]
+        if self._buffered >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        path = os.path.join(self.chunk_dir, f"chunk_{len(self.paths):06d}.npz")
+        np.savez(path, X=np.concatenate(self._X), y=np.concatenate(self._y))
+        self.paths.append(path)
+        self._X, self._y, self._buffered = [], [], 0
+
+def _load_chunk(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    with np.load(path) as z:
+        return z["X"], z["y"]
+
+def train_classifier_out_of_core(
+    chunk_paths: List[str],
+    class_counts: np.ndarray,
+    epochs: int = 5,
+    alpha: float = 1e-4,
+    seed: int = 0,
+    report_memory: bool = False,
+) -> Tuple[SGDClassifier, Dict]:
+    """
+    Logistic regression trained by SGD (log loss) over pair chunks read one at a time.
+
+    - class_weight="balanced" is reproduced with per-sample weights from the global
+      class counts (n / (2 * n_class)); per-chunk counts would weight chunks unevenly.
+    - features are standardized with statistics of a first pass over the chunks; the
+      scaling is folded back into coef_/intercept_, so the returned model takes raw
+      FEATURE_COLS like the LogisticRegression from train_classifier.
+    - chunk order and rows within a chunk are shuffled every epoch with a fixed seed.
+    - report_memory=True traces allocations (tracemalloc, much slower) and adds the peak
+      to the stats; meant for benchmarks, off for normal training runs.
+    """
+    if not chunk_paths:
+        raise ValueError("[ERROR] No pair chunks to train on.")
+    class_counts = np.asarray(class_counts, dtype=np.float64)
+    if np.any(class_counts == 0):
+        raise ValueError(f"[ERROR] Out-of-core training needs both classes, got counts {class_counts.tolist()}")
+    class_weight = class_counts.sum() / (2.0 * class_counts)
+
+    started_tracing = False
+    if report_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    if report_memory:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+
+    # pass 1: feature mean / std
+    n, s1, s2 = 0, None, None
+    for path in chunk_paths:
+        X, _ = _load_chunk(path)
+        s1 = X.sum(axis=0) if s1 is None else s1 + X.sum(axis=0)
+        s2 = (X * X).sum(axis=0) if s2 is None else s2 + (X * X).sum(axis=0)
+        n += len(X)
+    mean = s1 / n
+    scale = np.sqrt(np.maximum(s2 / n - mean * mean, 0.0))
+    scale[scale == 0] = 1.0
+
+    # pass 2..: SGD epochs
+    rng = np.random.default_rng(seed)
+    clf = SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+    seen = 0
+    for _ in range(epochs):
+        for ci in rng.permutation(len(chunk_paths)):
+            X, y = _load_chunk(chunk_paths[ci])
+            order = rng.permutation(len(y))
+            X, y = (X[order] - mean) / scale, y[order]
+            clf.partial_fit(X, y, classes=np.array([0, 1]), sample_weight=class_weight[y])
+            seen += len(y)
+    seconds = time.perf_counter() - t0
+
+    # fold the standardization into the linear model
+    coef = clf.coef_ / scale
+    clf.intercept_ = clf.intercept_ - (coef * mean).sum(axis=1)
+    clf.coef_ = coef
+
+    stats = {
+        "pairs": int(n),
+        "chunks": len(chunk_paths),
+        "epochs": epochs,
+        "seconds": seconds,
+        "pairs_per_sec": seen / seconds if seconds > 0 else float("inf"),
+    }
+    if report_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        stats["traced_peak_mb"] = max(0, peak - base) / (1024 * 1024)
+        if started_tracing:
+            tracemalloc.stop()
+    return clf, stats
@@ -0,0 +1,77 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from tqdm import tqdm
+
+# Shared, read-only state of the current worker process (store, vectorizer, model, ...)
+_WORKER_STATE: Dict[str, Any] = {}
+
+def _init_worker(state: Dict[str, Any]):
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(state)
+
+def _apply_chunk(fn: Callable, chunk: List):
+    return [fn(item, _WORKER_STATE) for item in chunk]
+
+def resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+def parallel_imap(
+    fn: Callable[[Any, Dict[str, Any]], Any],
+    items: Iterable,
+    n_jobs: Optional[int] = 1,
+    desc: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None,
+    chunksize: int = 1,
+    max_in_flight: Optional[int] = None,
+) -> Iterator:
+    """
+    Lazy version of parallel_map: yields fn(item, state) in input order as soon as each
+    result is ready, so callers can stream results instead of holding all of them.
+    At most max_in_flight chunks (default: 2 per worker) are submitted or finished but
+    not yet consumed, so a slow consumer bounds the buffered results instead of the
+    pool running ahead over every item.
+    """
+    items = list(items)
+    state = state or {}
+    n_jobs = resolve_n_jobs(n_jobs)
+    if n_jobs == 1 or len(items) <= 1:
+        for item in tqdm(items, desc=desc):
+            yield fn(item, state)
+        return
+
+    workers = min(n_jobs, len(items))
+    window = max(1, max_in_flight or 2 * workers)
+    chunks = iter([items[i:i + chunksize] for i in range(0, len(items), max(1, chunksize))])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as ex, \
+            tqdm(total=len(items), desc=desc) as bar:
+        pending = deque(ex.submit(_apply_chunk, fn, chunk) for chunk in islice(chunks, window))
+        while pending:
+            results = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(ex.submit(_apply_chunk, fn, chunk))
+            bar.update(len(results))
+            yield from results
+
+def parallel_map(
+    fn: Callable[[Any, Dict[str, Any]], Any],
+    items: Iterable,
+    n_jobs: Optional[int] = 1,
+    desc: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None,
+) -> List:
+    """
+    Run fn(item, state) for every item and return the results in input order.
+    With n_jobs > 1 (or -1 = all cores) items go to a process pool; `state` is sent
+    once per worker instead of once per item. Results are merged in input order,
+    so the output is the same as the serial run.
+    """
+    return list(parallel_imap(fn, items, n_jobs=n_jobs, desc=desc, state=state))
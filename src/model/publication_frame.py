@@ -0,0 +1,266 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from scipy import sparse
+
+from model.load_data import BibEntry, RefEntry, load_publication
+
+# features columnar_pair_features can compute
+PAIR_FEATURES = ("title_tfidf_cosine", "title_jaccard", "year_abs_diff", "year_match",
+                 "author_overlap_ratio", "first_author_match", "title_len_diff")
+
+# pairs whose set intersections are computed at once (bounds the gathered term keys)
+PAIR_CHUNK = 1024
+
+class Vocabulary:
+    """Term -> integer id, grown on demand; share one instance to get corpus-wide ids."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def ids(self, terms: Iterable[str]) -> List[int]:
+        out = []
+        for t in terms:
+            i = self.index.get(t)
+            if i is None:
+                i = self.index[t] = len(self.terms)
+                self.terms.append(t)
+            out.append(i)
+        return out
+
+def _ragged(vocab: Vocabulary, lists: Sequence[Sequence[str]]):
+    # (flat ids, offsets) of a list of token lists, order preserved
+    lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    ids = np.fromiter((i for x in lists for i in vocab.ids(x)), dtype=np.int32, count=int(offsets[-1]))
+    return ids, offsets
+
+def _set_matrix(ids: np.ndarray, offsets: np.ndarray, n_terms: int) -> sparse.csr_matrix:
+    # Binary (entry x term) CSR: which distinct terms every entry contains
+    n = len(offsets) - 1
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+    key = np.unique(rows * max(1, n_terms) + ids)
+    r, c = np.divmod(key, max(1, n_terms))
+    # keys are sorted by (row, term), so the CSR arrays follow directly (no COO round trip)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(r, minlength=n), out=indptr[1:])
+    return sparse.csr_matrix((np.ones(len(key)), c.astype(np.int32), indptr), shape=(n, max(1, n_terms)))
+
+def _pair_set_keys(ids: np.ndarray, offsets: np.ndarray, idx: np.ndarray, width: int) -> np.ndarray:
+    # Sorted distinct (p, term) keys p * width + term of the entries idx[p], gathered from the ragged ids
+    lengths = np.diff(offsets)[idx]
+    seg_start = np.cumsum(lengths) - lengths
+    pos = np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(offsets[:-1][idx] - seg_start, lengths)
+    pair = np.repeat(np.arange(len(idx), dtype=np.int64), lengths)
+    return np.unique(pair * width + ids[pos])
+
+@dataclass
+class EntryColumns:
+    """
+    One side of a publication (bib entries or candidates) as columns:
+      keys            bibkeys / arxiv ids
+      years/has_year  year values and their validity mask (nullable int)
+      token_ids       title tokens as ids, ragged by token_offsets (in title order)
+      author_ids      author last names as ids, ragged by author_offsets (in order), i.e.
+                      the indices/indptr of a CSR author incidence matrix
+    """
+    keys: np.ndarray
+    titles: List[str]
+    title_norms: List[str]
+    years: np.ndarray
+    has_year: np.ndarray
+    token_ids: np.ndarray
+    token_offsets: np.ndarray
+    author_ids: np.ndarray
+    author_offsets: np.ndarray
+
+    @classmethod
+    def from_entries(cls, entries: Sequence[Union[BibEntry, RefEntry]], token_vocab: Vocabulary,
+                     author_vocab: Vocabulary) -> "EntryColumns":
+        keys = np.array([e.bibkey if isinstance(e, BibEntry) else e.arxiv_id for e in entries], dtype=object)
+        has_year = np.array([e.year is not None for e in entries], dtype=bool)
+        years = np.array([e.year if e.year is not None else 0 for e in entries], dtype=np.int64)
+        token_ids, token_offsets = _ragged(token_vocab, [e.title_tokens for e in entries])
+        author_ids, author_offsets = _ragged(author_vocab, [e.authors_last for e in entries])
+        return cls(keys, [e.title for e in entries], [e.title_norm for e in entries], years, has_year,
+                   token_ids, token_offsets, author_ids, author_offsets)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def slice(self, start: int, stop: int) -> "EntryColumns":
+        # entries [start, stop) as views of the same arrays (no re-tokenizing)
+        t0, t1 = self.token_offsets[start], self.token_offsets[stop]
+        a0, a1 = self.author_offsets[start], self.author_offsets[stop]
+        return EntryColumns(self.keys[start:stop], self.titles[start:stop], self.title_norms[start:stop],
+                            self.years[start:stop], self.has_year[start:stop],
+                            self.token_ids[t0:t1], self.token_offsets[start:stop + 1] - t0,
+                            self.author_ids[a0:a1], self.author_offsets[start:stop + 1] - a0)
+
+    def n_tokens(self) -> np.ndarray:
+        return np.diff(self.token_offsets)
+
+    def first_author(self) -> np.ndarray:
+        # id of the first author, -1 when the entry has no authors
+        has = np.diff(self.author_offsets) > 0
+        first = np.full(len(self), -1, dtype=np.int64)
+        first[has] = self.author_ids[self.author_offsets[:-1][has]]
+        return first
+
+    def token_sets(self, n_terms: int) -> sparse.csr_matrix:
+        return _set_matrix(self.token_ids, self.token_offsets, n_terms)
+
+    def author_sets(self, n_terms: int) -> sparse.csr_matrix:
+        return _set_matrix(self.author_ids, self.author_offsets, n_terms)
+
+    def to_entries(self, author_vocab: Vocabulary, kind: type) -> List[Union[BibEntry, RefEntry]]:
+        out = []
+        for i in range(len(self)):
+            authors = [author_vocab.terms[a] for a in self.author_ids[self.author_offsets[i]:self.author_offsets[i + 1]]]
+            year = int(self.years[i]) if self.has_year[i] else None
+            if kind is BibEntry:
+                out.append(BibEntry(bibkey=self.keys[i], title=self.titles[i], title_norm=self.title_norms[i],
+                                    authors_last=authors, year=year))
+            else:
+                out.append(RefEntry(arxiv_id=self.keys[i], title=self.titles[i], title_norm=self.title_norms[i],
+                                    authors_last=authors, year=year))
+        return out
+
+def columnar_pair_features(
+    bibs: EntryColumns,
+    refs: EntryColumns,
+    sim: np.ndarray,
+    feature_cols: List[str],
+    n_token_terms: int,
+    n_author_terms: int,
+    rows: Optional[np.ndarray] = None,
+    cols: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Pair features for (bibs[rows[p]], refs[cols[p]]) with array operations only (the
+    full grid in row-major order without rows/cols). sim is the (#bibs x #refs) cosine
+    matrix or a 1-D array with the cosine of each pair. Same values as pair_feature_row.
+    With rows/cols, set intersections are computed for the requested pairs only, so
+    memory follows the number of pairs, not #bibs x #refs.
+    """
+    nb, nr = len(bibs), len(refs)
+    full_grid = rows is None or cols is None
+    if full_grid:
+        rows = np.repeat(np.arange(nb), nr)
+        cols = np.tile(np.arange(nr), nb)
+
+    def set_stats(ids_b, off_b, ids_r, off_r, n_terms):
+        # per pair: distinct terms of the bib, of the ref, and of both
+        if full_grid:
+            S_bib, S_ref = _set_matrix(ids_b, off_b, n_terms), _set_matrix(ids_r, off_r, n_terms)
+            inter = (S_bib @ S_ref.T).toarray().ravel()
+            return np.diff(S_bib.indptr)[rows], np.diff(S_ref.indptr)[cols], inter
+        n_b, n_r, inter = (np.empty(len(rows), dtype=np.float64) for _ in range(3))
+        width = max(1, n_terms)
+        for p0 in range(0, len(rows), PAIR_CHUNK):
+            r, c = rows[p0:p0 + PAIR_CHUNK], cols[p0:p0 + PAIR_CHUNK]
+            kb, kr = _pair_set_keys(ids_b, off_b, r, width), _pair_set_keys(ids_r, off_r, c, width)
+            both = np.intersect1d(kb, kr, assume_unique=True)
+            n_b[p0:p0 + len(r)] = np.bincount(kb // width, minlength=len(r))
+            n_r[p0:p0 + len(r)] = np.bincount(kr // width, minlength=len(r))
+            inter[p0:p0 + len(r)] = np.bincount(both // width, minlength=len(r))
+        return n_b, n_r, inter
+
+    # every feature is written into its output column as soon as it is computed
+    col_of = {name: c for c, name in enumerate(feature_cols)}
+    for name in feature_cols:
+        if name not in PAIR_FEATURES:
+            raise KeyError(name)
+    out = np.empty((len(rows), len(feature_cols)), dtype=np.float64)
+
+    def put(name: str, values: np.ndarray):
+        if name in col_of:
+            out[:, col_of[name]] = values
+
+    need = set(feature_cols)
+
+    if "title_tfidf_cosine" in need:
+        sim = np.asarray(sim, dtype=np.float64)
+        put("title_tfidf_cosine", sim if sim.ndim == 1 else sim[rows, cols])
+
+    if need & {"year_abs_diff", "year_match"}:
+        diff = np.abs(bibs.years[rows] - refs.years[cols]).astype(np.float64)
+        missing = ~(bibs.has_year[rows] & refs.has_year[cols])
+        put("year_abs_diff", np.where(missing, 10.0, diff))
+        put("year_match", (diff == 0) & ~missing)
+
+    if "author_overlap_ratio" in need:
+        n_auth, _, inter = set_stats(bibs.author_ids, bibs.author_offsets, refs.author_ids, refs.author_offsets,
+                                     n_author_terms)
+        put("author_overlap_ratio", inter / np.maximum(1.0, np.asarray(n_auth, dtype=np.float64)))
+
+    if "first_author_match" in need:
+        fb, fr = bibs.first_author(), refs.first_author()
+        put("first_author_match", (fb[rows] == fr[cols]) & (fb[rows] >= 0))
+
+    if "title_jaccard" in need:
+        nb_tok, nr_tok, inter = set_stats(bibs.token_ids, bibs.token_offsets, refs.token_ids, refs.token_offsets,
+                                          n_token_terms)
+        nb_tok, nr_tok = np.asarray(nb_tok, dtype=np.float64), np.asarray(nr_tok, dtype=np.float64)
+        union = nb_tok + nr_tok - inter
+        with np.errstate(invalid="ignore", divide="ignore"):
+            jac = np.where(union > 0, inter / np.maximum(union, 1.0), 1.0)
+        put("title_jaccard", np.where((nb_tok == 0) ^ (nr_tok == 0), 0.0, jac))
+
+    if "title_len_diff" in need:
+        put("title_len_diff", np.abs(bibs.n_tokens()[rows] - refs.n_tokens()[cols]))
+
+    return out
+
+class PublicationFrame:
+    """
+    Columnar form of one publication (what load_publication returns). Token and author
+    ids come from vocabularies that can be shared across publications, so ids are
+    corpus-wide. to_entries() gives back the BibEntry/RefEntry lists.
+    """
+
+    def __init__(self, bibs: EntryColumns, refs: EntryColumns, label: Dict[str, str],
+                 token_vocab: Vocabulary, author_vocab: Vocabulary):
+        self.bibs = bibs
+        self.refs = refs
+        self.label = label
+        self.token_vocab = token_vocab
+        self.author_vocab = author_vocab
+
+    @classmethod
+    def from_entries(cls, bib_entries: List[BibEntry], ref_entries: List[RefEntry], label: Dict[str, str],
+                     token_vocab: Optional[Vocabulary] = None,
+                     author_vocab: Optional[Vocabulary] = None) -> "PublicationFrame":
+        token_vocab = token_vocab if token_vocab is not None else Vocabulary()
+        author_vocab = author_vocab if author_vocab is not None else Vocabulary()
+        return cls(EntryColumns.from_entries(bib_entries, token_vocab, author_vocab),
+                   EntryColumns.from_entries(ref_entries, token_vocab, author_vocab),
+                   label, token_vocab, author_vocab)
+
+    @classmethod
+    def load(cls, pub_dir: str, token_vocab: Optional[Vocabulary] = None,
+             author_vocab: Optional[Vocabulary] = None) -> "PublicationFrame":
+        return cls.from_entries(*load_publication(pub_dir), token_vocab=token_vocab, author_vocab=author_vocab)
+
+    def to_entries(self):
+        # Same shape as load_publication(pub_dir)
+        return (self.bibs.to_entries(self.author_vocab, BibEntry),
+                self.refs.to_entries(self.author_vocab, RefEntry),
+                dict(self.label))
+
+    def pair_features(self, sim: np.ndarray, feature_cols: List[str],
+                      rows: Optional[np.ndarray] = None, cols: Optional[np.ndarray] = None) -> np.ndarray:
+        return columnar_pair_features(self.bibs, self.refs, sim, feature_cols,
+                                      len(self.token_vocab), len(self.author_vocab), rows=rows, cols=cols)
+
+    def block_pair_features(self, sim: np.ndarray, feature_cols: List[str], r0: int, r1: int,
+                            c0: int, c1: int) -> np.ndarray:
+        # full grid of bibs[r0:r1] x refs[c0:c1]; sim is that (r1-r0, c1-c0) cosine block
+        return columnar_pair_features(self.bibs.slice(r0, r1), self.refs.slice(c0, c1), sim, feature_cols,
+                                      len(self.token_vocab), len(self.author_vocab))
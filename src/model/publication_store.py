@@ -0,0 +1,84 @@
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+from model.load_data import BibEntry, RefEntry, load_publication
+
+SOURCE_FILES = ["parsed_reference.json", "crawled_reference.json", "label.json"]
+
+class PublicationStore:
+    """
+    Loads and normalizes each publication once per run.
+    Results are kept in memory and, when cache_dir is set, pickled to disk so later
+    runs skip JSON parsing and normalization. A cache file is reused only while the
+    source files keep the same mtime/size (or content hash with use_hash=True).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, use_hash: bool = False):
+        self.cache_dir = cache_dir
+        self.use_hash = use_hash
+        self._mem: Dict[str, Tuple[List[BibEntry], List[RefEntry], Dict[str, str]]] = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "loads": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # Only the configuration is pickled (e.g. to worker processes); they share the disk cache
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_mem"] = {}
+        state["stats"] = {"memory_hits": 0, "disk_hits": 0, "loads": 0}
+        return state
+
+    def signature(self, pub_dir: str) -> List:
+        # mtime/size (or content hash) of the source files; changes invalidate cached data
+        sig = []
+        for name in SOURCE_FILES:
+            path = os.path.join(pub_dir, name)
+            if not os.path.exists(path):
+                sig.append((name, None))
+                continue
+            if self.use_hash:
+                with open(path, "rb") as f:
+                    sig.append((name, hashlib.sha1(f.read()).hexdigest()))
+            else:
+                st = os.stat(path)
+                sig.append((name, st.st_mtime_ns, st.st_size))
+        return sig
+
+    def _cache_path(self, pub_dir: str) -> str:
+        key = hashlib.sha1(os.path.abspath(pub_dir).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def load(self, pub_dir: str) -> Tuple[List[BibEntry], List[RefEntry], Dict[str, str]]:
+        # Same return value as load_publication(pub_dir)
+        key = os.path.abspath(pub_dir)
+        if key in self._mem:
+            self.stats["memory_hits"] += 1
+            return self._mem[key]
+
+        data = None
+        if self.cache_dir:
+            sig = self.signature(pub_dir)
+            path = self._cache_path(pub_dir)
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        cached = pickle.load(f)
+                    if cached.get("signature") == sig:
+                        data = cached["data"]
+                        self.stats["disk_hits"] += 1
+                except Exception as e:
+                    print(f"[WARN] ignoring unreadable cache {path}: {e}")
+
+        if data is None:
+            data = load_publication(pub_dir)
+            self.stats["loads"] += 1
+            if self.cache_dir:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    pickle.dump({"signature": sig, "data": data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+
+        self._mem[key] = data
+        return data
@@ -0,0 +1,120 @@
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+
+
+def topk_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k highest scores, best first; ties keep candidate order
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        kth = scores[np.argpartition(scores, len(scores) - k)[len(scores) - k]]
+        cand = np.flatnonzero(scores >= kth)
+    else:
+        cand = np.arange(len(scores))
+    order = np.lexsort((cand, -scores[cand]))
+    return cand[order][:k]
+
+def plan_blocks(n_rows: int, n_cols: int, bytes_per_pair: int, memory_budget_mb: float) -> Tuple[int, int]:
+    # Largest (rows x cols) block whose working set fits in the budget; columns are split first
+    budget_pairs = max(1, int(memory_budget_mb * 1024 * 1024) // max(1, bytes_per_pair))
+    col_block = max(1, min(n_cols, budget_pairs))
+    row_block = max(1, min(n_rows, budget_pairs // col_block))
+    return row_block, col_block
+
+def _nbytes(X) -> int:
+    if hasattr(X, "indptr"):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return np.asarray(X).nbytes
+
+def blockwise_topk(
+    X_bib,
+    X_ref,
+    k: int,
+    score_block: Optional[Callable[[np.ndarray, int, int, int, int], np.ndarray]] = None,
+    memory_budget_mb: float = 256.0,
+    dtype=np.float64,
+    bytes_per_pair: Optional[int] = None,
+    report_memory: bool = False,
+) -> Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray], Dict]:
+    """
+    Top-k per bib row of cosine_similarity(X_bib, X_ref) without building the whole
+    (#bibs x #refs) matrix. Blocks of rows/columns are sized to memory_budget_mb and
+    only the running top-k of every row is kept.
+
+    score_block(sim_block, r0, r1, c0, c1) can turn a cosine block into the scores to
+    rank by (e.g. classifier probabilities); by default the cosine itself is used.
+    Ties keep candidate order, so the result equals ranking the full matrix.
+
+    Returns per row: top column indices, their scores and their cosines (best first),
+    plus a stats dict (blocks, planned peak block size, tracemalloc peak if requested).
+    """
+    n_rows, n_cols = X_bib.shape[0], X_ref.shape[0]
+    itemsize = np.dtype(dtype).itemsize
+    if bytes_per_pair is None:
+        # sparse product (value + int32 index) and its dense copy, + the scores of score_block
+        bytes_per_pair = 2 * itemsize + 4 + (0 if score_block is None else itemsize)
+
+    if dtype != np.float64:
+        X_bib = X_bib.astype(dtype)
+        X_ref = X_ref.astype(dtype)
+    # rows are L2-normalized once here; cosine_similarity would copy and normalize X_ref again
+    # for every block. The block products below are the same operations, so the same values
+    X_bib = normalize(X_bib)
+    X_ref = normalize(X_ref)
+    # the inputs and their normalized copies stay alive next to the blocks, so they come out of the budget
+    fixed_mb = 2 * (_nbytes(X_bib) + _nbytes(X_ref)) / (1024 * 1024)
+    row_block, col_block = plan_blocks(n_rows, n_cols, bytes_per_pair, max(0.0, memory_budget_mb - fixed_mb))
+
+    started_tracing = False
+    if report_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    if report_memory:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+
+    t0 = time.perf_counter()
+    empty_i = np.empty(0, dtype=np.int64)
+    empty_f = np.empty(0, dtype=np.float64)
+    top_idx = [empty_i] * n_rows
+    top_score = [empty_f] * n_rows
+    top_sim = [empty_f] * n_rows
+    n_blocks = 0
+
+    for r0 in range(0, n_rows, row_block):
+        r1 = min(n_rows, r0 + row_block)
+        Xb = X_bib[r0:r1]
+        for c0 in range(0, n_cols, col_block):
+            c1 = min(n_cols, c0 + col_block)
+            Xr = X_ref if (c0, c1) == (0, n_cols) else X_ref[c0:c1]
+            sim = safe_sparse_dot(Xb, Xr.T, dense_output=True)
+            scores = sim if score_block is None else score_block(sim, r0, r1, c0, c1)
+            n_blocks += 1
+
+            for i in range(r1 - r0):
+                cand = topk_indices(scores[i], k)
+                idx = np.concatenate([top_idx[r0 + i], cand + c0])
+                sc = np.concatenate([top_score[r0 + i], scores[i, cand].astype(np.float64)])
+                cs = np.concatenate([top_sim[r0 + i], sim[i, cand].astype(np.float64)])
+                keep = np.lexsort((idx, -sc))[:k]
+                top_idx[r0 + i], top_score[r0 + i], top_sim[r0 + i] = idx[keep], sc[keep], cs[keep]
+
+    stats = {
+        "blocks": n_blocks,
+        "row_block": row_block,
+        "col_block": col_block,
+        "planned_peak_block_mb": row_block * col_block * bytes_per_pair / (1024 * 1024),
+        "seconds": time.perf_counter() - t0,
+    }
+    if report_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        stats["traced_peak_mb"] = max(0, peak - base) / (1024 * 1024)
+        if started_tracing:
+            tracemalloc.stop()
+    return top_idx, top_score, top_sim, stats
@@ -0,0 +1,78 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+class StreamingTfidfVectorizer(BaseEstimator):
+    """
+    TF-IDF over hashed word n-grams that is fitted incrementally:
+      partial_fit(titles)  # any number of times, e.g. one publication at a time
+      finalize()           # turn the accumulated document frequencies into idf_
+      transform(titles)    # same role as TfidfVectorizer.transform
+
+    Memory is fixed by n_features (one document-frequency counter per bucket) instead
+    of growing with the corpus vocabulary. Buckets never seen while fitting get idf 0,
+    so, like an out-of-vocabulary term for TfidfVectorizer, they do not contribute.
+    Weighting follows TfidfVectorizer (smooth idf, optional sublinear tf, l2 norm).
+    """
+
+    def __init__(
+        self,
+        n_features: int = 2 ** 20,
+        ngram_range: Tuple[int, int] = (1, 2),
+        lowercase: bool = True,
+        token_pattern: str = r"(?u)\b\w\w+\b",
+        norm: str = "l2",
+        smooth_idf: bool = True,
+        sublinear_tf: bool = False,
+    ):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self.norm = norm
+        self.smooth_idf = smooth_idf
+        self.sublinear_tf = sublinear_tf
+
+    def _hasher(self) -> HashingVectorizer:
+        return HashingVectorizer(
+            n_features=self.n_features, ngram_range=self.ngram_range, lowercase=self.lowercase,
+            token_pattern=self.token_pattern, alternate_sign=False, norm=None, dtype=np.float64,
+        )
+
+    def partial_fit(self, titles: Iterable[str]) -> "StreamingTfidfVectorizer":
+        if not hasattr(self, "df_"):
+            self.df_ = np.zeros(self.n_features, dtype=np.int64)
+            self.n_docs_ = 0
+        X = self._hasher().transform(list(titles)).tocsr()
+        # every stored entry of a CSR row is a distinct bucket: one document per entry
+        self.df_ += np.bincount(X.indices, minlength=self.n_features)
+        self.n_docs_ += X.shape[0]
+        return self
+
+    def finalize(self) -> "StreamingTfidfVectorizer":
+        if not hasattr(self, "df_"):
+            self.partial_fit([])
+        s = 1 if self.smooth_idf else 0
+        n = self.n_docs_ + s
+        df = self.df_ + s
+        with np.errstate(divide="ignore"):
+            idf = np.log(n / np.maximum(df, 1)) + 1.0
+        self.idf_ = np.where(self.df_ > 0, idf, 0.0)
+        return self
+
+    def fit(self, titles: Iterable[str]) -> "StreamingTfidfVectorizer":
+        return self.partial_fit(titles).finalize()
+
+    def transform(self, titles: Iterable[str]) -> sparse.csr_matrix:
+        if not hasattr(self, "idf_"):
+            raise ValueError("StreamingTfidfVectorizer is not finalized; call finalize() after partial_fit")
+        X = self._hasher().transform(list(titles)).tocsr()
+        if self.sublinear_tf:
+            X.data = np.log(X.data) + 1.0
+        X.data *= self.idf_[X.indices]
+        X.eliminate_zeros()
+        return normalize(X, norm=self.norm, copy=False) if self.norm else X
@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
+from typing import AbstractSet, Dict, List, Tuple, Optional
 
 LATEX_CMD = re.compile(r"\\[a-zA-Z]+\*?(?:\[[^\]]*\])?(?:\{[^}]*\})?")
 PUNCT = re.compile(r"[^a-z0-9\s]+")
@@ -14,7 +15,12 @@ def strip_latex(s: str) -> str:
 def normalize_text(s: str) -> str:
     if s is None:
         return ""
-    s = strip_latex(str(s)).lower()
+    return _normalize_text(str(s))
+
+# The same titles and author names recur across publications: memoize, with a bound
+@lru_cache(maxsize=1 << 18)
+def _normalize_text(s: str) -> str:
+    s = strip_latex(s).lower()
     s = PUNCT.sub(" ", s)
     s = re.sub(r"\s+", " ", s).strip()
     return s
@@ -24,7 +30,9 @@ def tokenize(s: str) -> List[str]:
     return s.split() if s else []
 
 def jaccard(a: List[str], b: List[str]) -> float:
-    sa, sb = set(a), set(b)
+    return jaccard_sets(set(a), set(b))
+
+def jaccard_sets(sa: AbstractSet[str], sb: AbstractSet[str]) -> float:
     if not sa and not sb:
         return 1.0
     if not sa or not sb:
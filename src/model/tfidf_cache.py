@@ -0,0 +1,180 @@
+import hashlib
+import json
+import multiprocessing.util
+import os
+import uuid
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from scipy import sparse
+
+def vectorizer_fingerprint(vectorizer) -> str:
+    """Stable id of a fitted vectorizer: its parameters, vocabulary and idf weights."""
+    h = hashlib.sha1()
+    params = {k: repr(v) for k, v in sorted(vectorizer.get_params().items())}
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    vocab = getattr(vectorizer, "vocabulary_", None)
+    if vocab:
+        for term, idx in sorted(vocab.items()):
+            h.update(f"{term}\t{idx}\n".encode("utf-8"))
+    idf = getattr(vectorizer, "idf_", None)
+    if idf is not None:
+        h.update(np.ascontiguousarray(idf, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+def _title_key(title: str) -> str:
+    return hashlib.sha1(title.encode("utf-8")).hexdigest()[:20]
+
+def _is_segment(name: str) -> bool:
+    return name.startswith("seg-") and name.endswith(".npz") and ".tmp" not in name
+
+def _write_segment(cache_dir: str, rows: Dict[str, sparse.csr_matrix]) -> Optional[str]:
+    # rows as a new immutable segment (written under a temporary name, then renamed); empties rows
+    if not rows:
+        return None
+    keys = list(rows)
+    X = sparse.vstack([rows[k] for k in keys]).tocsr()
+    name = f"seg-{os.getpid()}-{uuid.uuid4().hex[:12]}.npz"
+    path = os.path.join(cache_dir, name)
+    tmp = f"{path}.tmp.npz"
+    try:
+        np.savez(tmp, keys=np.asarray(keys, dtype=str), data=X.data, indices=X.indices, indptr=X.indptr,
+                 shape=np.asarray(X.shape))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[WARN] could not write TF-IDF cache segment {path}: {e}")
+        return None
+    rows.clear()
+    return name
+
+class CachedTfidfVectorizer:
+    """
+    Wraps a fitted TF-IDF vectorizer. transform(titles) returns the same matrix as the
+    wrapped vectorizer (every row depends on its own title only), but rows are cached per
+    unique title, so a title is tokenized once however the lists it appears in are subset
+    or ordered: pair building, evaluation, CV folds and sweeps over the same corpus reuse
+    the bib and candidate rows of every publication.
+
+    Rows are persisted under cache_dir/<vectorizer fingerprint>/ as immutable segment
+    files. New rows are buffered and written as one segment per flush_rows rows, on
+    flush(), and when the object is collected or the process exits. Each segment is written under a temporary name
+    and renamed, and a file is never rewritten, so workers sharing the directory cannot
+    drop each other's rows. Segments of other writers are picked up when a title is not
+    found. Once the segments exceed max_cache_mb, the least recently read ones are deleted
+    at startup and after flushes.
+
+    Not used for inference (model/inference.py, the inference server): requests bring
+    titles that are mostly seen once, so caching them only adds disk writes and lets
+    the cache grow with user input.
+    """
+
+    def __init__(self, vectorizer, cache_dir: str, max_cache_mb: float = 1024.0, flush_rows: int = 4096):
+        self.vectorizer = vectorizer
+        self.fingerprint = vectorizer_fingerprint(vectorizer)
+        self.cache_dir = os.path.join(cache_dir, self.fingerprint)
+        self.max_cache_bytes = int(max_cache_mb * 2**20)
+        self.flush_rows = flush_rows
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._start()
+        self._evict()
+
+    def _start(self):
+        # per-process state: rows read or computed here, segments already read, unsaved rows
+        self._rows: Dict[str, sparse.csr_matrix] = {}
+        self._seen_segments: Set[str] = set()
+        self._pending: Dict[str, sparse.csr_matrix] = {}
+        self._finalizer = None
+        self._finalizer_pid = None
+
+    def _buffer(self) -> Dict[str, sparse.csr_matrix]:
+        # Pending rows of this process. A forked worker starts its own buffer (the parent writes
+        # its own rows) and its own finalizer, which saves the buffer when the object is collected
+        # or the process exits, including multiprocessing workers (where atexit does not run).
+        # The finalizer must not reference self.
+        if self._finalizer_pid != os.getpid():
+            self._pending = {}
+            self._finalizer = multiprocessing.util.Finalize(self, _write_segment, args=(self.cache_dir, self._pending),
+                                                            exitpriority=10)
+            self._finalizer_pid = os.getpid()
+        return self._pending
+
+    # Only the configuration is pickled (e.g. to worker processes); they share the disk cache
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for k in ("_rows", "_seen_segments", "_pending", "_finalizer", "_finalizer_pid"):
+            state.pop(k, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._start()
+
+    def _segments(self) -> List[str]:
+        with os.scandir(self.cache_dir) as it:
+            return [e.name for e in it if _is_segment(e.name)]
+
+    def _load_new_segments(self):
+        for name in sorted(set(self._segments()) - self._seen_segments):
+            self._seen_segments.add(name)
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with np.load(path, allow_pickle=False) as z:
+                    keys = z["keys"].tolist()
+                    X = sparse.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+                os.utime(path)  # recency for eviction
+            except FileNotFoundError:
+                continue  # evicted in between
+            except Exception as e:
+                print(f"[WARN] ignoring unreadable TF-IDF cache segment {path}: {e}")
+                continue
+            for i, k in enumerate(keys):
+                self._rows.setdefault(k, X[i])
+
+    def flush(self):
+        """Write the buffered rows as one new segment."""
+        name = _write_segment(self.cache_dir, self._buffer())
+        if name is not None:
+            self._seen_segments.add(name)
+            self._evict()
+
+    def _evict(self):
+        # every finished .npz counts, including files of older cache layouts (oldest, so first to go)
+        files = []
+        with os.scandir(self.cache_dir) as it:
+            names = [e.name for e in it if e.name.endswith(".npz") and ".tmp" not in e.name]
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime_ns, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+
+    def transform(self, titles: List[str]) -> sparse.csr_matrix:
+        titles = list(titles)
+        if not titles:
+            return self.vectorizer.transform(titles)
+        unique = list(dict.fromkeys(titles))
+        keys = [_title_key(t) for t in unique]
+
+        if any(k not in self._rows for k in keys):
+            self._load_new_segments()  # rows other writers saved since the last look
+        missing = [(t, k) for t, k in zip(unique, keys) if k not in self._rows]
+        if missing:
+            X_new = self.vectorizer.transform([t for t, _ in missing]).tocsr()
+            pending = self._buffer()
+            for i, (_, k) in enumerate(missing):
+                self._rows[k] = pending[k] = X_new[i]
+            if len(pending) >= self.flush_rows:
+                self.flush()
+
+        pos = {t: i for i, t in enumerate(unique)}
+        return sparse.vstack([self._rows[k] for k in keys]).tocsr()[[pos[t] for t in titles]]
@@ -1,4 +1,5 @@
 from utils.post_cleaning import *
+from utils.parsing import extract_cite_keys, remap_cite_keys
 import re
 from typing import Dict, List 
 
@@ -43,14 +44,8 @@ class Node:
         self.children = cleaned
 
     def update_cite_keys(self, key_map: Dict[str, str]):
-        CITE_RE = re.compile(r'\\cite\{([^}]+)\}')
-        
         if self.is_leaf() and self.node_type == "Sentence":
-            def repl(m):
-                old_keys = [k.strip() for k in m.group(1).split(",")]
-                new_keys = [key_map.get(k, k) for k in old_keys]
-                return r"\cite{" + ",".join(new_keys) + "}"
-            self.content = CITE_RE.sub(repl, self.content)
+            self.content = remap_cite_keys(self.content, key_map)
         
         for child in self.children:
             child.update_cite_keys(key_map)
@@ -72,6 +67,12 @@ class Node:
         return f"{self.title}"
     '''
 
+# Remap cite keys only on the sentences recorded in a citation index (node -> cited keys)
+def remap_cite_index(cite_index: Dict[Node, List[str]], key_map: Dict[str, str]):
+    for node, keys in cite_index.items():
+        node.content = remap_cite_keys(node.content, key_map)
+        cite_index[node] = extract_cite_keys(node.content)
+
 # Class for Hierarchy Tree 
 class Hierarchy_Tree:
     def __init__(self):
@@ -14,6 +14,8 @@ class Latex_Parser:
         self.lemma_buffer = []
         self.in_lemma = False
         self.lemma_title = None
+        self.cite_index = {}       # Sentence node -> cited keys
+        self._cite_candidates = []
 
     def parse(self, text: str):
         text = preprocess_text(text)
@@ -109,8 +111,22 @@ class Latex_Parser:
             self._flush_buffer_as_lemma(self.lemma_buffer, self.lemma_title)
 
         self.tree.root.clean_children()
+        self._index_citations()
         return self.tree.root
 
+    # ---------- Citation index ----------
+    def _track_citations(self, node):
+        if node.node_type == "Sentence" and "\\cite" in node.content:
+            self._cite_candidates.append(node)
+
+    # Keys are read after clean_children so the index matches the exported sentence text
+    def _index_citations(self):
+        for node in self._cite_candidates:
+            keys = extract_cite_keys(node.content)
+            if keys:
+                self.cite_index[node] = keys
+        self._cite_candidates = []
+
     # ---------- Flush helpers ----------
     def _flush_buffer_as_paragraph(self, buffer):
         text = "\n".join(buffer).strip()
@@ -119,6 +135,7 @@ class Latex_Parser:
         paragraph_node = Node("Paragraph", title="Paragraph")
         for node_type, content in split_paragraph(text):
             child_node = Node(node_type, content=content)
+            self._track_citations(child_node)
             paragraph_node.add_child(child_node)
         self.tree.stack[-1].add_child(paragraph_node)
 
@@ -129,6 +146,7 @@ class Latex_Parser:
         abstract_node = Node("Abstract", title="Abstract")
         for node_type, content in split_paragraph(text):
             child_node = Node(node_type, content=content)
+            self._track_citations(child_node)
             abstract_node.add_child(child_node)
         self.tree.stack[-1].add_child(abstract_node)
 
@@ -139,6 +157,7 @@ class Latex_Parser:
         theorem_node = Node("Theorem", title=title)
         for node_type, content in split_paragraph(text):
             child_node = Node(node_type, content=content)
+            self._track_citations(child_node)
             theorem_node.add_child(child_node)
         self.tree.stack[-1].add_child(theorem_node)
 
@@ -149,5 +168,6 @@ class Latex_Parser:
         lemma_node = Node("Lemma", title=title)
         for node_type, content in split_paragraph(text):
             child_node = Node(node_type, content=content)
+            self._track_citations(child_node)
             lemma_node.add_child(child_node)
         self.tree.stack[-1].add_child(lemma_node)
@@ -1,7 +1,7 @@
 import json
 from collections import defaultdict
 from parser.Hierarchy_Tree import Node
-from typing import List
+from typing import Dict, List, Optional
 
 class Publication_Graph:
     def __init__(self, pub_id: str):
@@ -10,6 +10,7 @@ class Publication_Graph:
         self.hierarchy = defaultdict(dict) 
         self.content_to_id = {} 
         self.counter = 0
+        self.citations = {}  # element id -> cited keys
 
     def subtree_signature(self, node: Node) -> str:
         if node.is_leaf():
@@ -33,16 +34,18 @@ class Publication_Graph:
         self.content_to_id[key] = element_id
         return element_id
 
-    def _traverse_tree(self, node: Node, version_index: int, parent_id=None, is_root=False):
+    def _traverse_tree(self, node: Node, version_index: int, parent_id=None, is_root=False, cite_index=None):
         element_id = self._generate_element_id(node, is_root=is_root)
         self.elements[element_id] = node.report()
         self.hierarchy[version_index][element_id] = parent_id
+        if cite_index and node in cite_index:
+            self.citations[element_id] = cite_index[node]
 
         for child in node.children:
-            self._traverse_tree(child, version_index, parent_id=element_id)
+            self._traverse_tree(child, version_index, parent_id=element_id, cite_index=cite_index)
 
-    def add_tree(self, root: Node, version_index: int):
-        self._traverse_tree(root, version_index, parent_id=None, is_root=True)
+    def add_tree(self, root: Node, version_index: int, cite_index: Optional[Dict[Node, List[str]]] = None):
+        self._traverse_tree(root, version_index, parent_id=None, is_root=True, cite_index=cite_index)
 
     def merge_graphs(self, graphs: List["Publication_Graph"], version_indices: List[int]):
         for g, v_idx in zip(graphs, version_indices):
@@ -73,3 +76,10 @@ class Publication_Graph:
         with open(path, "w", encoding="utf-8") as f:
             json.dump(out, f, indent=2, ensure_ascii=False)
         print(f"[INFO] Graph saved to {path}")
+
+
+    # Citation index: sentence element id -> cited (canonical) keys
+    def export_citation_index(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.citations, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Citation index saved to {path}")
@@ -1,8 +1,8 @@
 import os
-from parser.Hierarchy_Tree import Node
-from utils.collect_tex_file import collect_tex_file, dfs_collect
+from parser.Hierarchy_Tree import Node, remap_cite_index
+from utils.collect_tex_file import collect_include_graph, find_main_tex
 from parser.Latex_Parser import Latex_Parser
-from utils.reference_extraction import collect_references, Reference_Entry
+from utils.reference_extraction import collect_references_from_sources, read_reference_sources, Reference_Entry
 from parser.Publication_Graph import Publication_Graph
 from utils.deduplicate_reference import *
 
@@ -19,35 +19,58 @@ class Publication_Parser:
         self.pub_id = pub_id
         self.pub_path = pub_path
         self.trees = []          # list of Node (root per version)
+        self.cite_indexes = []   # citation index (Sentence node -> keys) per tree
         self.references = {}     # all references (before dedup)
         self.graph = Publication_Graph(pub_id=pub_id)
 
     def parse_dataset(self):
+        self.parse_sources(self.load_sources())
+
+    # I/O stage: find every version and read the files it needs into memory
+    def load_sources(self):
         tex_root = os.path.join(self.pub_path, "tex")
         if not os.path.exists(tex_root):
             print(f"[WARN] No tex folder in {self.pub_path}")
+            return None
+
+        # Find all versions
+        with os.scandir(tex_root) as it:
+            versions = sorted(e.name for e in it if e.is_dir())
+
+        loaded = []
+        for v in versions:
+            version_path = os.path.join(tex_root, v)
+
+            # DFS collect tex files (and the bib files they reference)
+            try:
+                main_tex = find_main_tex(version_path)
+            except RuntimeError:
+                print(f"[WARN] No main tex in {version_path}")
+                loaded.append({"version": v, "tex_files": None, "contents": {}})
+                continue
+            contents = {}
+            tex_files, bib_files = collect_include_graph(main_tex, contents=contents)
+            contents.update(read_reference_sources(bib_files))
+            loaded.append({"version": v, "tex_files": tex_files, "contents": contents})
+        return loaded
+
+    # CPU stage: build trees and references from the loaded sources
+    def parse_sources(self, loaded):
+        if loaded is None:
             self.success_rate = 0.0
             self.version_success_rates = []
             return
 
-        # Find all versions
-        versions = [f for f in os.listdir(tex_root) if os.path.isdir(os.path.join(tex_root, f))]
-        versions.sort()
-
         self.version_success_rates = []
 
         # Build the tree and collect references
-        for idx, v in enumerate(versions, start=1):
-            version_path = os.path.join(tex_root, v)
+        for item in loaded:
+            v = item["version"]
+            tex_files = item["tex_files"]
             print(f"[INFO] Processing version {v}")
-
-            # DFS collect tex files
-            main_tex, _ = collect_tex_file(version_path)
-            if not main_tex:
-                print(f"[WARN] No main tex in {version_path}")
+            if tex_files is None:
                 self.version_success_rates.append(0.0)
                 continue
-            tex_files = dfs_collect(main_tex)
 
             total_tex = len(tex_files)
             success_tex = 0
@@ -56,22 +79,17 @@ class Publication_Parser:
             parser = Latex_Parser()
             for f in tex_files:
                 try:
-                    with open(f, encoding="utf-8", errors="ignore") as fp:
-                        parser.parse(fp.read())
+                    parser.parse(item["contents"][f])
                     success_tex += 1
                 except Exception as e:
                     print(f"[ERROR] Failed to parse {f}: {e}")
 
             tree_root = parser.tree.root
             self.trees.append(tree_root)
+            self.cite_indexes.append(parser.cite_index)
 
-            # Collect references from all .tex/.bib in this version
-            all_files = []
-            for root, _, files in os.walk(version_path):
-                for file in files:
-                    if file.endswith(".tex") or file.endswith(".bib"):
-                        all_files.append(os.path.join(root, file))
-            refs = collect_references(all_files)
+            # Collect references only from the included .tex files and their \bibliography targets
+            refs = collect_references_from_sources(item["contents"])
             self.references.update(refs)
 
             # Success rate of this version
@@ -83,13 +101,13 @@ class Publication_Parser:
         canonical_refs, key_map, _ = deduplicate_references(self.references)
         self.references = canonical_refs
 
-        # Update \cite{} in all trees according to canonical references
-        for tree_root in self.trees:
-            tree_root.update_cite_keys(key_map)
+        # Update citations according to canonical references (only the indexed sentences)
+        for cite_index in self.cite_indexes:
+            remap_cite_index(cite_index, key_map)
 
         # Add all trees to graph
-        for idx, tree_root in enumerate(self.trees, start=1):
-            self.graph.add_tree(tree_root, version_index=idx)
+        for idx, (tree_root, cite_index) in enumerate(zip(self.trees, self.cite_indexes), start=1):
+            self.graph.add_tree(tree_root, version_index=idx, cite_index=cite_index)
 
         # Overall success rate = trung bình cộng success rate từng version
         self.success_rate = sum(self.version_success_rates) / len(self.version_success_rates) if self.version_success_rates else 0.0
@@ -99,6 +117,10 @@ class Publication_Parser:
     def export_json(self, path: str):
         self.graph.export_json(path)
 
+    # Export the citation index (sentence element id -> cited keys)
+    def export_citations(self, path: str):
+        self.graph.export_citation_index(path)
+
     # Export all references (canonical) to .bib
     def export_bib(self, path: str):
         with open(path, "w", encoding="utf-8") as f:
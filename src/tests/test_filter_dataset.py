@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data-helper"))
+
+from filter_dataset import materialize
+
+class MaterializeModeSwitchTest(unittest.TestCase):
+    """Re-materializing one DST_DIR in another mode must replace, never write through, the old entry."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.pub = os.path.join(root, "src", "pub1")
+        os.makedirs(os.path.join(self.pub, "tex"))
+        self.files = {"references.json": '{"a": 1}', "refs.bib": "@article{a,}\n", os.path.join("tex", "main.tex"): "x"}
+        for rel, text in self.files.items():
+            with open(os.path.join(self.pub, rel), "w", encoding="utf-8") as f:
+                f.write(text)
+        self.dst = os.path.join(root, "dst", "pub1")
+        os.makedirs(os.path.dirname(self.dst))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertSourceIntact(self):
+        for rel, text in self.files.items():
+            with open(os.path.join(self.pub, rel), encoding="utf-8") as f:
+                self.assertEqual(f.read(), text)
+
+    def assertRealCopy(self):
+        self.assertFalse(os.path.islink(self.dst))
+        self.assertTrue(os.path.isdir(self.dst))
+        for rel, text in self.files.items():
+            with open(os.path.join(self.dst, rel), encoding="utf-8") as f:
+                self.assertEqual(f.read(), text)
+
+    def test_symlink_then_hardlink(self):
+        materialize(self.pub, self.dst, "symlink")
+        self.assertTrue(os.path.islink(self.dst))
+        materialize(self.pub, self.dst, "hardlink")
+        self.assertSourceIntact()
+        self.assertRealCopy()
+
+    def test_symlink_then_copy(self):
+        materialize(self.pub, self.dst, "symlink")
+        materialize(self.pub, self.dst, "copy")
+        self.assertSourceIntact()
+        self.assertRealCopy()
+
+    def test_hardlink_then_symlink(self):
+        materialize(self.pub, self.dst, "hardlink")
+        materialize(self.pub, self.dst, "symlink")
+        self.assertSourceIntact()
+        self.assertTrue(os.path.islink(self.dst))
+        self.assertEqual(os.path.realpath(self.dst), os.path.realpath(self.pub))
+
+    def test_hardlink_then_copy(self):
+        materialize(self.pub, self.dst, "hardlink")
+        materialize(self.pub, self.dst, "copy")
+        self.assertSourceIntact()
+        self.assertRealCopy()
+        self.assertFalse(os.path.samefile(os.path.join(self.dst, "refs.bib"), os.path.join(self.pub, "refs.bib")))
+
+    def test_same_mode_twice(self):
+        for mode in ("symlink", "symlink", "hardlink", "hardlink"):
+            materialize(self.pub, self.dst, mode)
+        self.assertSourceIntact()
+        self.assertRealCopy()
+
+if __name__ == "__main__":
+    unittest.main()
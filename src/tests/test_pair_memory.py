@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from model.build_model import predict_topk_for_publication_with_scores, train_classifier
+from model.feature_engineering import ALL_FEATURE_COLS, build_pairs_hardneg
+from model.load_data import BibEntry, RefEntry
+
+WORDS = [f"w{i}" for i in range(40)]
+NAMES = [f"n{i}" for i in range(15)]
+
+def _publication(n_bibs: int, n_refs: int, seed: int = 0):
+    # few distinct words/authors, so almost every bib x ref pair shares tokens and authors
+    rng = random.Random(seed)
+
+    def title():
+        return " ".join(rng.sample(WORDS, 8))
+
+    refs = [RefEntry(arxiv_id=f"r{j}", title=t, title_norm=t, authors_last=rng.sample(NAMES, 4),
+                     year=2000 + rng.randrange(20)) for j, t in ((j, title()) for j in range(n_refs))]
+    bibs = [BibEntry(bibkey=f"b{i}", title=t, title_norm=t, authors_last=rng.sample(NAMES, 4),
+                     year=2000 + rng.randrange(20)) for i, t in ((i, title()) for i in range(n_bibs))]
+    label = {b.bibkey: refs[rng.randrange(n_refs)].arxiv_id for b in bibs}
+    return bibs, refs, label
+
+class BlockwisePairMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.bibs, self.refs, self.label = _publication(400, 4000)
+        self.vectorizer = TfidfVectorizer().fit([r.title_norm for r in self.refs])
+
+    def test_same_pairs_as_full_matrix(self):
+        full = build_pairs_hardneg(self.bibs, self.refs, self.label, self.vectorizer, topn_neg=20)
+        blocked = build_pairs_hardneg(self.bibs, self.refs, self.label, self.vectorizer, topn_neg=20,
+                                      memory_budget_mb=4.0)
+        self.assertTrue(full.equals(blocked))
+        for col in ("y", "year_match", "first_author_match"):
+            self.assertEqual(full[col].dtype, np.int64)
+
+    def test_peak_allocation_within_budget(self):
+        budget_mb = 4.0
+        # the dense cosine matrix alone would be 400 x 4000 x 8 bytes = 12.2 MB
+        self.assertGreater(len(self.bibs) * len(self.refs) * 8 / 2**20, 2 * budget_mb)
+        tracemalloc.start()
+        try:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            df = build_pairs_hardneg(self.bibs, self.refs, self.label, self.vectorizer, topn_neg=20,
+                                     memory_budget_mb=budget_mb)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(df), len(self.bibs) * 21)
+        self.assertLess((peak - base) / 2**20, budget_mb)
+
+class BlockwisePredictionTest(unittest.TestCase):
+    def test_same_topk_as_full_matrix(self):
+        bibs, refs, label = _publication(60, 900, seed=1)
+        vectorizer = TfidfVectorizer().fit([r.title_norm for r in refs])
+        clf = train_classifier(build_pairs_hardneg(bibs, refs, label, vectorizer, topn_neg=20), ALL_FEATURE_COLS)
+        full = predict_topk_for_publication_with_scores(clf, bibs, refs, label, vectorizer, k=10,
+                                                        feature_cols=ALL_FEATURE_COLS)
+        blocked = predict_topk_for_publication_with_scores(clf, bibs, refs, label, vectorizer, k=10,
+                                                           memory_budget_mb=0.5, feature_cols=ALL_FEATURE_COLS)
+        self.assertEqual(full[0], blocked[0])
+        for key, scored in full[1].items():
+            np.testing.assert_allclose([s for _, s in scored], [s for _, s in blocked[1][key]], rtol=1e-12)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.profiling import profile_run
+
+# The entry point does all its work in a worker thread; the main thread only joins it
+TARGET = textwrap.dedent("""
+    import threading
+    import time
+
+    def busy_work(seconds):
+        end = time.perf_counter() + seconds
+        n = 0
+        while time.perf_counter() < end:
+            n += sum(i * i for i in range(200))
+        return n
+
+    worker = threading.Thread(target=busy_work, args=(0.5,), name="busy-worker")
+    worker.start()
+    worker.join()
+""")
+
+class ProfileWorkerThreadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.target = os.path.join(self.tmp.name, "threaded_target.py")
+        with open(self.target, "w", encoding="utf-8") as f:
+            f.write(TARGET)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def profile(self, mode):
+        out_dir = os.path.join(self.tmp.name, mode)
+        report = profile_run(self.target, mode=mode, out_dir=out_dir, interval=0.002)
+        with open(os.path.join(out_dir, "profile.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["error"], None)
+        with open(os.path.join(out_dir, "profile.collapsed"), encoding="utf-8") as f:
+            collapsed = f.read()
+        return report, collapsed
+
+    def test_cprofile_sees_worker_thread(self):
+        report, collapsed = self.profile("cprofile")
+        busy = [r for r in report["top_functions"] if r["function"].endswith(":busy_work")]
+        self.assertEqual(len(busy), 1)
+        self.assertGreater(busy[0]["cumulative_s"], 0.3)
+        self.assertIn(":busy_work", collapsed)
+
+    def test_sampler_sees_worker_thread(self):
+        report, collapsed = self.profile("sample")
+        busy = [r for r in report["top_functions"] if r["function"] == "threaded_target.py:busy_work"]
+        self.assertEqual(len(busy), 1)
+        # the worker runs for the whole target, so it is on (nearly) every sample
+        self.assertGreater(busy[0]["total_samples"], 0.8 * report["samples"])
+        self.assertIn("[busy-worker];", collapsed)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from model.tfidf_cache import CachedTfidfVectorizer
+
+TITLES = [f"title {i} about topic {i % 7} and method {i % 5}" for i in range(200)]
+
+class CountingVectorizer:
+    """Fitted vectorizer stand-in that counts the titles it transforms."""
+
+    def __init__(self, vectorizer):
+        self.vectorizer = vectorizer
+        self.n_transformed = 0
+
+    def get_params(self):
+        return self.vectorizer.get_params()
+
+    @property
+    def vocabulary_(self):
+        return self.vectorizer.vocabulary_
+
+    @property
+    def idf_(self):
+        return self.vectorizer.idf_
+
+    def transform(self, titles):
+        self.n_transformed += len(titles)
+        return self.vectorizer.transform(titles)
+
+def _transform_in_worker(cache, titles):
+    cache.transform(titles)  # no explicit flush: the rows are saved when the worker exits
+
+class CachedTfidfVectorizerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.vectorizer = TfidfVectorizer().fit(TITLES)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cache(self, **kwargs):
+        return CachedTfidfVectorizer(CountingVectorizer(self.vectorizer), self.tmp.name, **kwargs)
+
+    def segments(self, cache):
+        return [n for n in os.listdir(cache.cache_dir) if n.startswith("seg-") and ".tmp" not in n]
+
+    def assertSameRows(self, cache, titles):
+        expected = self.vectorizer.transform(titles)
+        got = cache.transform(titles)
+        self.assertEqual(got.shape, expected.shape)
+        self.assertEqual((got != expected).nnz, 0)
+
+    def test_same_matrix_for_subsets_orders_and_duplicates(self):
+        cache = self.cache()
+        for titles in (TITLES[:50], TITLES[40:10:-1], TITLES[:5] * 3, [TITLES[7]], TITLES):
+            self.assertSameRows(cache, titles)
+
+    def test_titles_are_transformed_once_and_reused_from_disk(self):
+        cache = self.cache()
+        cache.transform(TITLES[:100])
+        cache.transform(TITLES[50:150])
+        self.assertEqual(cache.vectorizer.n_transformed, 150)
+        cache.flush()
+
+        other = self.cache()
+        self.assertSameRows(other, TITLES[:150])
+        self.assertEqual(other.vectorizer.n_transformed, 0)
+
+    def test_rows_are_buffered_until_flush_rows(self):
+        cache = self.cache(flush_rows=64)
+        for i in range(0, 200, 10):
+            cache.transform(TITLES[i:i + 10])
+        # one segment per 64+ new rows (at 70 and 140), not one write per call
+        self.assertEqual(len(self.segments(cache)), 2)
+        cache.flush()
+        self.assertEqual(len(self.segments(cache)), 3)
+
+    def test_concurrent_writers_keep_each_others_rows(self):
+        a, b = self.cache(), self.cache()
+        a.transform(TITLES[:100])
+        b.transform(TITLES[100:])
+        b.flush()
+        a.flush()
+        reader = self.cache()
+        self.assertSameRows(reader, TITLES)
+        self.assertEqual(reader.vectorizer.n_transformed, 0)
+
+    def test_worker_process_flushes_at_exit(self):
+        for method in multiprocessing.get_all_start_methods():
+            with self.subTest(start_method=method):
+                cache = self.cache()
+                titles = TITLES[:30] if method == "spawn" else TITLES[30:60]
+                p = multiprocessing.get_context(method).Process(target=_transform_in_worker, args=(cache, titles))
+                p.start()
+                p.join()
+                self.assertEqual(p.exitcode, 0)
+                reader = self.cache()
+                self.assertSameRows(reader, titles)
+                self.assertEqual(reader.vectorizer.n_transformed, 0)
+
+    def test_eviction_keeps_the_cache_under_its_cap(self):
+        cache = self.cache(flush_rows=10, max_cache_mb=0.01)
+        for i in range(0, 200, 10):
+            cache.transform(TITLES[i:i + 10])
+        total = sum(os.path.getsize(os.path.join(cache.cache_dir, n)) for n in self.segments(cache))
+        self.assertLessEqual(total, 0.01 * 2**20)
+        self.assertSameRows(cache, TITLES)
+
+if __name__ == "__main__":
+    unittest.main()
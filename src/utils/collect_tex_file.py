@@ -3,20 +3,39 @@ import re
 
 INPUT_RE = re.compile(r'\\(?:input|include)\{([^}]+)\}')
 DOC_RE = re.compile(r'\\documentclass')
+BIB_RE = re.compile(r'\\(?:bibliography|addbibresource)(?:\[[^\]]*\])?\{([^}]+)\}')
 
 
+# Enumerate files with the given extensions using os.scandir (top-down, like os.walk)
+def scan_files(tex_dir, exts):
+    stack = [tex_dir]
+    while stack:
+        current = stack.pop(0)
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(exts):
+                    yield entry.path
+            except OSError:
+                continue
+        stack[0:0] = subdirs
+
 # Function to determine the main tex file
 def find_main_tex(tex_dir):
-    for root, _, files in os.walk(tex_dir):
-        for f in files:
-            if f.endswith(".tex"):
-                path = os.path.join(root, f)
-                try:
-                    with open(path, encoding="utf-8", errors="ignore") as fp:
-                        if DOC_RE.search(fp.read()):
-                            return path
-                except:
-                    pass
+    for path in scan_files(tex_dir, (".tex",)):
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as fp:
+                if DOC_RE.search(fp.read()):
+                    return path
+        except:
+            pass
     raise RuntimeError("No main tex file found")
 
 # Resolve tex path
@@ -25,10 +44,24 @@ def resolve_tex_path(base_file, inc):
         inc += ".tex"
     return os.path.normpath(os.path.join(os.path.dirname(base_file), inc))
 
-# Using DFS to collect tex files
-def dfs_collect(main_tex):
+# Resolve \bibliography{a,b} / \addbibresource{a.bib} targets (relative to the main tex)
+def resolve_bib_paths(main_tex, target):
+    paths = []
+    for name in target.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if not name.endswith(".bib"):
+            name += ".bib"
+        paths.append(os.path.normpath(os.path.join(os.path.dirname(main_tex), name)))
+    return paths
+
+# Using DFS to collect tex files and the bib files they point to.
+# If a dict is passed as `contents`, the text of every visited tex file is kept there.
+def collect_include_graph(main_tex, contents=None):
     visited = set()
     ordered_files = []
+    bib_files = []
 
     def dfs(tex_file):
         if tex_file in visited:
@@ -44,11 +77,22 @@ def dfs_collect(main_tex):
                 content = f.read()
         except:
             return
+        if contents is not None:
+            contents[tex_file] = content
+
+        for target in BIB_RE.findall(content):
+            for bib in resolve_bib_paths(main_tex, target):
+                if bib not in bib_files and os.path.exists(bib):
+                    bib_files.append(bib)
 
         for inc in INPUT_RE.findall(content):
             dfs(resolve_tex_path(tex_file, inc))
 
     dfs(main_tex)
+    return ordered_files, bib_files
+
+def dfs_collect(main_tex):
+    ordered_files, _ = collect_include_graph(main_tex)
     return ordered_files
 
 # The entire pipeline to collect tex files
@@ -34,10 +34,31 @@ THEOREM_END_RE = re.compile(r'\\end\{theorem\}')
 LEMMA_BEGIN_RE = re.compile(r'\\begin\{lemma\}(\[(.*?)\])?')
 LEMMA_END_RE = re.compile(r'\\end\{lemma\}')
 
+# Citation commands (\cite, \citep, \citet, \citealp, ...) with optional [..] arguments
+CITE_RE = re.compile(r'(\\cite[a-zA-Z]*\*?(?:\[[^\]]*\]){0,2}\{)([^}]+)(\})')
+
 # Begin and end of the document
 BEGIN_DOCUMENT_RE = re.compile(r"\\begin\{document\}")
 END_DOCUMENT_RE = re.compile(r"\\end\{document\}")
 
+# Keys cited in a piece of text, in order of appearance
+def extract_cite_keys(text: str):
+    keys = []
+    for m in CITE_RE.finditer(text):
+        for k in m.group(2).split(","):
+            k = k.strip()
+            if k and k not in keys:
+                keys.append(k)
+    return keys
+
+# Rewrite the keys of every citation command according to key_map
+def remap_cite_keys(text: str, key_map) -> str:
+    def repl(m):
+        old_keys = [k.strip() for k in m.group(2).split(",")]
+        new_keys = [key_map.get(k, k) for k in old_keys]
+        return m.group(1) + ",".join(new_keys) + m.group(3)
+    return CITE_RE.sub(repl, text)
+
 # Split the text into paragraphs
 def split_into_paragraphs(text):
     lines = text.splitlines()
@@ -73,8 +73,8 @@ INLINE_MATH_RE = re.compile(
 # This is labeling and reference should not be cleaned
 SEMANTIC_COMMAND_RE = re.compile(
     r"""
-    \\(label|ref|eqref|cite|citep|citet)
-    (\[[^\]]*\])?
+    \\(label|ref|eqref|cite[a-zA-Z]*\*?)
+    (\[[^\]]*\]){0,2}
     \{[^}]*\}
     """,
     re.VERBOSE
@@ -0,0 +1,302 @@
+"""
+Profile any entry point without editing it:
+
+    python -m utils.profiling [options] main_train_model.py [script args...]
+    python -m utils.profiling [options] -m model.inference [module args...]
+    python -m utils.profiling --mode sample --stage model.build_model:train_classifier \\
+        --tracemalloc data-helper/automatic_label.py
+
+Modes: cprofile (deterministic), sample (periodic stack samples of every thread),
+none (stage timers / tracemalloc only). Reports go to --out:
+    profile.json       wall/CPU time, per-stage timers, top functions, tracemalloc tops
+    profile.collapsed  collapsed stacks ("a;b;c count"), input for flamegraph tools
+    profile.prof       raw cProfile stats (cprofile mode, for pstats/snakeviz)
+All threads of the calling process are profiled (e.g. main_parser's pipeline stages);
+parallel_map worker processes are not.
+--stage only reaches functions of imported modules: the entry point runs in a fresh
+__main__ namespace, so its own functions (e.g. main_train_model:main) are rejected.
+"""
+import argparse
+import cProfile
+import functools
+import importlib
+import json
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# name -> {"calls", "wall_s", "cpu_s"(, "peak_mb")}; filled by stage() and the --stage wrappers
+STAGES: Dict[str, Dict[str, float]] = {}
+# stage() resets the tracemalloc peak; the run-wide peak is kept here across resets
+_RUN_PEAK = [0]
+
+@contextmanager
+def stage(name: str):
+    """Accumulate wall and CPU time of a block under `name` (plus peak memory when tracemalloc runs)."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        _RUN_PEAK[0] = max(_RUN_PEAK[0], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    w0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        rec = STAGES.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+        rec["calls"] += 1
+        rec["wall_s"] += time.perf_counter() - w0
+        rec["cpu_s"] += time.process_time() - c0
+        if tracing:
+            rec["peak_mb"] = max(rec.get("peak_mb", 0.0), tracemalloc.get_traced_memory()[1] / 2**20)
+
+def timed(fn, name: Optional[str] = None):
+    name = name or f"{fn.__module__}:{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with stage(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def install_stage_timers(targets: List[str]):
+    # "package.module:func" or "package.module:Class.method"; patched before the entry point
+    # runs, so `from package.module import func` in the profiled code picks up the wrapper
+    for target in targets:
+        mod_name, _, qualname = target.partition(":")
+        if not qualname:
+            raise ValueError(f"--stage expects module:function, got {target!r}")
+        owner = importlib.import_module(mod_name)
+        *path, attr = qualname.split(".")
+        for part in path:
+            owner = getattr(owner, part)
+        setattr(owner, attr, timed(getattr(owner, attr), target))
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+# innermost frames of a thread that is blocked waiting (Condition/Event.wait, Thread.join)
+_IDLE_FRAMES = {"threading.py:wait", "threading.py:_wait_for_tstate_lock"}
+
+class StackSampler:
+    """
+    Samples the stacks of all threads (or of one, with thread_id) every `interval` seconds
+    from a daemon thread. Stacks of threads other than the main one start with a
+    "[thread name]" frame; their samples while blocked in a threading wait (idle pool or
+    monitor threads, empty queues) are left out unless idle=True.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, root=None, idle: bool = False):
+        self.interval = interval
+        self.idle = idle
+        # frames at and above the root function (the profiler's own) are left out of the stacks
+        self.root = root
+        self.thread_id = thread_id
+        self.main_id = threading.main_thread().ident
+        self.stacks: Counter = Counter()
+        self.n_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            names = {t.ident: t.name for t in threading.enumerate()}
+            sampled = False
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and frame.f_code is not self.root:
+                    if "runpy" not in frame.f_code.co_filename:
+                        stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if ident != self.main_id:
+                    if not self.idle and stack and stack[0] in _IDLE_FRAMES:
+                        continue
+                    stack.append(f"[{names.get(ident, ident)}]")
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    sampled = True
+            self.n_samples += sampled
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top_functions(self, n: int = 30) -> List[Dict]:
+        # self = samples with the function on top of the stack, total = samples with it anywhere
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for f in set(frames):
+                if not f.startswith("["):  # thread-name frames are not functions
+                    total_counts[f] += count
+        return [{"function": f, "self_samples": self_counts[f], "total_samples": c,
+                 "total_s": c * self.interval} for f, c in total_counts.most_common(n)]
+
+def _pstats_collapsed(stats: pstats.Stats) -> Counter:
+    # cProfile keeps caller->callee edges only, so stacks are one level deep ("caller;callee")
+    out = Counter()
+    for (file, _, func), (_, _, tt, _, callers) in stats.stats.items():
+        callee = f"{os.path.basename(file)}:{func}"
+        if not callers:
+            out[callee] += int(tt * 1e6)
+        for (c_file, _, c_func), (_, _, c_tt, _) in callers.items():
+            out[f"{os.path.basename(c_file)}:{c_func};{callee}"] += int(c_tt * 1e6)
+    return out
+
+def _pstats_top(stats: pstats.Stats, n: int = 30) -> List[Dict]:
+    rows = []
+    for (file, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{file}:{line}:{func}", "calls": nc, "primitive_calls": cc,
+                     "self_s": tt, "cumulative_s": ct})
+    return sorted(rows, key=lambda r: -r["cumulative_s"])[:n]
+
+def _tracemalloc_top(snapshot, n: int = 30) -> List[Dict]:
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [{"location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size_mb": s.size / 2**20,
+             "count": s.count} for s in snapshot.statistics("lineno")[:n]]
+
+def run_target(target: str, args: List[str], as_module: bool):
+    # Execute the entry point as `python target args` / `python -m target args` would
+    sys.argv = [target] + list(args)
+    if as_module:
+        runpy.run_module(target, run_name="__main__", alter_sys=True)
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+        runpy.run_path(target, run_name="__main__")
+
+def profile_run(
+    target: str,
+    args: List[str] = (),
+    as_module: bool = False,
+    mode: str = "cprofile",
+    out_dir: str = "./outputs/profile",
+    stages: List[str] = (),
+    trace_memory: bool = False,
+    interval: float = 0.005,
+    top: int = 30,
+) -> Dict:
+    if mode not in ("cprofile", "sample", "none"):
+        raise ValueError(f"unknown profiling mode: {mode!r}")
+    # the target runs in a fresh __main__ namespace, so patching its own functions would not reach it
+    target_module = target if as_module else os.path.splitext(os.path.basename(target))[0]
+    for s in stages:
+        if s.partition(":")[0] == target_module:
+            raise ValueError(f"--stage {s}: functions of the profiled entry point itself cannot be timed; "
+                             f"use functions of the modules it imports (e.g. model.*)")
+    os.makedirs(out_dir, exist_ok=True)
+    STAGES.clear()
+    _RUN_PEAK[0] = 0
+    install_stage_timers(list(stages))
+
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    thread_profilers: List[cProfile.Profile] = []
+    if profiler is not None and sys.version_info < (3, 12):
+        # cProfile hooks only the thread that enables it (from 3.12 on it sees every thread):
+        # each thread started by the target gets its own profiler, merged into the report
+        def _profile_thread(frame, event, arg):
+            p = cProfile.Profile()
+            thread_profilers.append(p)
+            p.enable()  # replaces this hook for the calling thread
+
+        threading.setprofile(_profile_thread)
+    sampler = StackSampler(interval, root=run_target.__code__) if mode == "sample" else None
+    if sampler is not None:
+        sampler.start()
+
+    error = None
+    w0, c0 = time.perf_counter(), time.process_time()
+    try:
+        if profiler is not None:
+            profiler.runcall(run_target, target, args, as_module)
+        else:
+            run_target(target, args, as_module)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"SystemExit({e.code})"
+        raise  # after the reports below, with the target's exit status
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - w0, time.process_time() - c0
+        threading.setprofile(None)
+        if sampler is not None:
+            sampler.stop()
+        report = {
+            "target": target, "args": list(args), "mode": mode, "error": error,
+            "wall_s": wall, "cpu_s": cpu, "stages": dict(STAGES),
+        }
+        collapsed = None
+        if profiler is not None:
+            stats = pstats.Stats(profiler)
+            for p in thread_profilers:
+                try:
+                    stats.add(p)
+                except TypeError:
+                    pass  # the thread made no profiled calls
+            stats.dump_stats(os.path.join(out_dir, "profile.prof"))
+            report["top_functions"] = _pstats_top(stats, top)
+            collapsed = _pstats_collapsed(stats)
+        if sampler is not None:
+            report["samples"] = sampler.n_samples
+            report["sample_interval_s"] = interval
+            report["top_functions"] = sampler.top_functions(top)
+            collapsed = sampler.stacks
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, _RUN_PEAK[0])
+            report["tracemalloc"] = {"current_mb": current / 2**20, "peak_mb": peak / 2**20,
+                                     "top": _tracemalloc_top(tracemalloc.take_snapshot(), top)}
+            tracemalloc.stop()
+
+        if collapsed is not None:
+            with open(os.path.join(out_dir, "profile.collapsed"), "w", encoding="utf-8") as f:
+                for stack, count in collapsed.most_common():
+                    if count > 0:
+                        f.write(f"{stack} {count}\n")
+        with open(os.path.join(out_dir, "profile.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[PROFILE] {target}: wall={wall:.2f}s cpu={cpu:.2f}s mode={mode} -> {out_dir}", file=sys.stderr)
+        for name, rec in STAGES.items():
+            print(f"[PROFILE]   {name}: calls={rec['calls']} wall={rec['wall_s']:.3f}s cpu={rec['cpu_s']:.3f}s",
+                  file=sys.stderr)
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Run an entry point under the profiler.",
+                                 usage="python -m utils.profiling [options] (script.py | -m module) [args ...]")
+    ap.add_argument("--mode", choices=["cprofile", "sample", "none"], default="cprofile")
+    ap.add_argument("--out", default="./outputs/profile", help="report directory")
+    ap.add_argument("--stage", action="append", default=[], metavar="MODULE:FUNC",
+                    help="time every call of this function as a stage (repeatable)")
+    ap.add_argument("--tracemalloc", action="store_true", help="trace allocations (slow; adds peak/top allocations)")
+    ap.add_argument("--interval", type=float, default=0.005, help="sampling interval in seconds (sample mode)")
+    ap.add_argument("--top", type=int, default=30, help="rows in the top-functions/allocations tables")
+    ap.add_argument("-m", dest="module", action="store_true", help="target is a module name")
+    ap.add_argument("target")
+    ap.add_argument("args", nargs=argparse.REMAINDER)
+    opts = ap.parse_args(argv)
+    profile_run(opts.target, opts.args, as_module=opts.module, mode=opts.mode, out_dir=opts.out,
+                stages=opts.stage, trace_memory=opts.tracemalloc, interval=opts.interval, top=opts.top)
+
+if __name__ == "__main__":
+    # go through the importable module so code calling utils.profiling.stage() shares STAGES
+    from utils.profiling import main as _main
+    _main()
@@ -132,31 +132,37 @@ def parse_bibitem_block(content: str) -> Dict[str, Reference_Entry]:
         refs[key] = parse_single_bibitem(key, text)
     return refs
 
-# Collect references
-def collect_references(tex_files) -> Dict[str, Reference_Entry]:
+# Read the contents of every reference source (.bib files that are too large are skipped)
+def read_reference_sources(tex_files) -> Dict[str, str]:
+    sources = {}
+    for f in tex_files:
+        if not os.path.exists(f):
+            continue
+        if f.endswith(".bib") and skip_bib_file(f):
+            continue
+        try:
+            with open(f, encoding="utf-8", errors="ignore") as fp:
+                sources[f] = fp.read()
+        except Exception as e:
+            print(f"[WARN] Failed reading {f}: {e}")
+    return sources
+
+# Collect references from already-read sources (path -> content)
+def collect_references_from_sources(sources: Dict[str, str]) -> Dict[str, Reference_Entry]:
     references = {}
 
     # 1. Parse .bib files 
-    for f in tex_files:
-        if f.endswith(".bib") and os.path.exists(f):
-
-            if skip_bib_file(f):
-                continue
-
+    for f, content in sources.items():
+        if f.endswith(".bib"):
             try:
-                with open(f, encoding="utf-8", errors="ignore") as fp:
-                    content = fp.read()
                 references.update(parse_bibtex(content))
             except Exception as e:
                 print(f"[WARN] Failed parsing bib file {f}: {e}")
 
     # 2. Parse \bibitem in .tex files 
-    for f in tex_files:
-        if f.endswith(".tex") and os.path.exists(f):
+    for f, content in sources.items():
+        if f.endswith(".tex"):
             try:
-                with open(f, encoding="utf-8", errors="ignore") as fp:
-                    content = fp.read()
-
                 if "\\bibitem" in content:
                     print(f"Parsing bibitems in {f}")
                     references.update(parse_bibitem_block(content))
@@ -165,6 +171,10 @@ def collect_references(tex_files) -> Dict[str, Reference_Entry]:
 
     return references
 
+# Collect references
+def collect_references(tex_files) -> Dict[str, Reference_Entry]:
+    return collect_references_from_sources(read_reference_sources(tex_files))
+
 if __name__ == "__main__":
     tex_path = [
         "../../demo-data/2212-11479/tex/2212.11479v1/DifferentialPrivate_Social_network.tex"